@@ -1,9 +1,26 @@
 from http.server import BaseHTTPRequestHandler
+import re
 import json
-from datetime import datetime
-import urllib.request
+import time
+import bisect
+import unicodedata
+import io
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from urllib.parse import urlparse, parse_qs
 
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional - gzip is always available
+    brotli = None
+
 # IMPORTANT: Update this with your GitHub username
 GITHUB_USER = "sfarje-alt"
 GITHUB_REPO = "tm-eu"
@@ -13,6 +30,536 @@ GITHUB_RAW_URL = f"https://raw.githubusercontent.com/{GITHUB_USER}/{GITHUB_REPO}
 # ADD YOUR GITHUB TOKEN HERE (get it from https://github.com/settings/tokens)
 GITHUB_TOKEN = "YOUR_GITHUB_TOKEN_HERE"  # <-- REPLACE THIS!
 
+# Upstream HTTP - one keep-alive pool per host, reused across warm invocations
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 10
+POOL_HOSTS = 4           # raw.githubusercontent.com, api.github.com, ...
+POOL_MAXSIZE = 8         # connections kept open per host
+
+
+def build_http_session():
+    """Session with bounded keep-alive pools for every upstream fetch"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=1)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': f"{GITHUB_REPO}-api"})
+    return session
+
+
+http_session = build_http_session()
+
+# Manifest cache - lives as long as the warm function instance
+MANIFEST_CACHE_SIZE = 128
+TODAY_TTL = 60           # today's manifest changes when the scrape lands
+MISSING_TODAY_TTL = 30   # today's data may appear any minute
+MISSING_PAST_TTL = 600   # a past date can still be backfilled
+
+
+class ManifestCache:
+    """Bounded LRU of parsed manifests (or another per-date JSON file) keyed by date
+
+    Past dates never change, so a fetched manifest is kept until evicted.
+    Today's manifest expires after TODAY_TTL and is then revalidated with
+    If-None-Match, so an unchanged file costs a 304 instead of a download.
+    404s are cached too (None), briefly, so unknown dates don't hit GitHub
+    on every request.
+    """
+
+    def __init__(self, max_entries=MANIFEST_CACHE_SIZE, filename='manifest.json', loader=None):
+        self.max_entries = max_entries
+        self.filename = filename
+        self.loader = loader          # turns the parsed JSON into what get() returns
+        self.entries = OrderedDict()  # date -> (manifest or None, etag, expires_at or None)
+        self.lock = threading.Lock()
+
+    def get(self, date_str):
+        """Return the manifest for date_str, or None if it doesn't exist"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(date_str)
+            if entry is not None:
+                self.entries.move_to_end(date_str)
+        
+        if entry is not None:
+            manifest, etag, expires_at = entry
+            if expires_at is None or now < expires_at:
+                return manifest
+        else:
+            manifest = etag = None
+        
+        manifest, etag = self.fetch(date_str, manifest, etag)
+        self.put(date_str, manifest, etag, now)
+        return manifest
+
+    def fetch(self, date_str, cached_manifest, etag):
+        """Conditional GET; returns (manifest, etag), reusing the cached copy on 304
+        
+        A missing manifest comes back as (None, None); other failures raise.
+        """
+        headers = {}
+        if etag and cached_manifest is not None:
+            headers['If-None-Match'] = etag
+        response = http_session.get(self.url(date_str), headers=headers,
+                                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        if response.status_code == 304:
+            return cached_manifest, etag
+        if response.status_code == 404:
+            return None, None
+        response.raise_for_status()
+        data = self.parse(response)
+        if self.loader is not None:
+            data = self.loader(data)
+        return data, response.headers.get('ETag')
+
+    def url(self, date_str):
+        return f"{GITHUB_RAW_URL}/data/{date_str}/{self.filename}"
+
+    def parse(self, response):
+        return response.json()
+
+    def put(self, date_str, manifest, etag, now):
+        """Store an entry with the TTL its date deserves"""
+        if is_mutable_date(date_str):
+            ttl = TODAY_TTL if manifest is not None else MISSING_TODAY_TTL
+        else:
+            ttl = None if manifest is not None else MISSING_PAST_TTL
+        expires_at = None if ttl is None else now + ttl
+        
+        with self.lock:
+            self.entries[date_str] = (manifest, etag, expires_at)
+            self.entries.move_to_end(date_str)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+def is_mutable_date(date_str):
+    """Today (or anything not a plain past YYYYMMDD) may still change"""
+    if len(date_str) != 8 or not date_str.isdigit():
+        return True
+    return date_str >= datetime.now().strftime('%Y%m%d')
+
+
+manifest_cache = ManifestCache()
+
+# Record search - served from search_index.json, prebuilt by the scraper
+# (see search_index.py for the layout)
+SEARCH_INDEX_CACHE_SIZE = 32    # each day's index is ~0.5 MB parsed
+SEARCH_MAX_DAYS = 31
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 500
+
+
+def tokenize(text):
+    """Same normalisation as trademark_schema.fold_words, applied to queries"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+
+class DayIndex:
+    """One day's search index, with the lookups the endpoint needs"""
+
+    def __init__(self, data):
+        self.date = data['date']
+        self.fields = data['fields']
+        self.records = data['records']
+        self.tokens = data['tokens']
+        self.sorted_tokens = {key: sorted(postings) for key, postings in self.tokens.items()}
+        self.country = data['country']
+        self.status = data['status']
+        self.classes = data['classes']
+        self.filing_dates = [d for d, _ in data['dates']]
+        self.filing_ids = [i for _, i in data['dates']]
+
+    def token_matches(self, key, word):
+        """Ids of records with a token starting with word"""
+        tokens = self.sorted_tokens.get(key, [])
+        ids = set()
+        i = bisect.bisect_left(tokens, word)
+        while i < len(tokens) and tokens[i].startswith(word):
+            ids.update(self.tokens[key][tokens[i]])
+            i += 1
+        return ids
+
+    def search(self, query):
+        """Sorted ids of records matching every filter in query"""
+        candidates = None
+        
+        def narrow(ids):
+            nonlocal candidates
+            candidates = set(ids) if candidates is None else candidates & set(ids)
+        
+        for key in ('name', 'owner'):
+            for word in tokenize(query.get(key)):
+                narrow(self.token_matches(key, word))
+        if query.get('country'):
+            narrow(self.country.get(query['country'].upper(), []))
+        if query.get('status'):
+            narrow(self.status.get(query['status'].lower(), []))
+        if query.get('class'):
+            narrow(self.classes.get(query['class'], []))
+        if query.get('filed_from') or query.get('filed_to'):
+            lo = bisect.bisect_left(self.filing_dates, query['filed_from']) if query.get('filed_from') else 0
+            hi = bisect.bisect_right(self.filing_dates, query['filed_to']) if query.get('filed_to') else len(self.filing_dates)
+            narrow(self.filing_ids[lo:hi])
+        
+        if candidates is None:
+            return list(range(len(self.records)))
+        return sorted(candidates)
+
+    def record(self, record_id):
+        """Record as a dict, tagged with its publication date"""
+        record = dict(zip(self.fields, self.records[record_id]))
+        record['Publication date'] = self.date
+        if record.get('Graphic representation'):
+            # Content-addressed path under data/ (see image_store.py)
+            record['image_url'] = f"{GITHUB_RAW_URL}/data/{record['Graphic representation']}"
+        return record
+
+
+search_index_cache = ManifestCache(SEARCH_INDEX_CACHE_SIZE, 'search_index.json', DayIndex)
+
+
+# Similar-name search - served from data/name_index.npz, which the scraper
+# extends with every merged day (see name_index.py for the layout)
+NAME_INDEX_FILENAME = 'name_index.npz'
+SIMILAR_THRESHOLD = 0.3
+SIMILAR_LIMIT = 20
+SIMILAR_MAX_LIMIT = 100
+
+
+def normalize_name(name):
+    """Same normalisation as trademark_schema.fold_text"""
+    return ' '.join(tokenize(name))
+
+
+def name_trigrams(normalized):
+    """Same trigrams as name_index.trigrams"""
+    grams = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class NameIndex:
+    """Cross-day trigram index of mark names, ranked by trigram Jaccard similarity"""
+
+    def __init__(self, data):
+        self.gram_rows = {gram: i for i, gram in enumerate(data['grams'].tolist())}
+        self.gram_offsets = data['gram_offsets']
+        self.postings = data['postings']
+        self.name_blob = data['name_blob'].tobytes()
+        self.name_offsets = data['name_offsets']
+        self.trigram_counts = data['trigram_counts'].astype(np.int32)
+        
+        # Occurrences grouped by name id for lookups
+        order = np.argsort(data['occ_name'], kind='stable')
+        self.occ_name = data['occ_name'][order]
+        self.occ_date = data['occ_date'][order]
+        self.occ_filing = data['occ_filing'][order]
+        self.occ_classes = data['occ_classes'][order]
+        display_offsets = data['occ_display_offsets']
+        self.occ_display_blob = data['occ_display_blob'].tobytes()
+        self.occ_display_start = display_offsets[:-1][order]
+        self.occ_display_end = display_offsets[1:][order]
+        self.dates = np.unique(data['occ_date'])
+
+    def name(self, name_id):
+        return self.name_blob[self.name_offsets[name_id]:self.name_offsets[name_id + 1]].decode('utf-8')
+
+    def similar(self, query, threshold=SIMILAR_THRESHOLD):
+        """[(similarity, name id)] for names at or above threshold, best first
+        
+        Overlaps for every candidate come from counting ids across the query's
+        posting lists in one vectorized pass, so the cost follows the lists'
+        length rather than the index size.
+        """
+        grams = name_trigrams(normalize_name(query))
+        rows = [self.gram_rows[gram] for gram in grams if gram in self.gram_rows]
+        if not rows:
+            return []
+        n = len(grams)
+        ids = np.concatenate([self.postings[self.gram_offsets[r]:self.gram_offsets[r + 1]] for r in rows])
+        candidates, overlap = np.unique(ids, return_counts=True)
+        m = self.trigram_counts[candidates]
+        similarity = overlap / (n + m - overlap)
+        keep = similarity >= threshold
+        candidates, similarity = candidates[keep], similarity[keep]
+        order = np.lexsort((candidates, -similarity))
+        return list(zip(similarity[order].tolist(), candidates[order].tolist()))
+
+    def marks(self, name_id, date_from=None, date_to=None, nice_class=None):
+        """Published marks for a name id, optionally filtered by day and class"""
+        key = np.uint32(name_id)  # a plain int would upcast the whole column per call
+        lo = np.searchsorted(self.occ_name, key, side='left')
+        hi = np.searchsorted(self.occ_name, key, side='right')
+        dates = self.occ_date[lo:hi]
+        keep = np.ones(hi - lo, dtype=bool)
+        if date_from:
+            keep &= dates >= int(date_from)
+        if date_to:
+            keep &= dates <= int(date_to)
+        if nice_class:
+            keep &= (self.occ_classes[lo:hi] >> np.uint64(nice_class - 1)) & np.uint64(1) == 1
+        
+        marks = []
+        for i in (lo + np.flatnonzero(keep)).tolist():
+            mask = int(self.occ_classes[i])
+            marks.append({
+                'date': str(int(self.occ_date[i])),
+                'filing_number': self.occ_filing[i].decode(),
+                'name': self.occ_display_blob[self.occ_display_start[i]:self.occ_display_end[i]].decode('utf-8'),
+                'nice_classes': [c + 1 for c in range(64) if mask >> c & 1]
+            })
+        return marks
+
+
+class NpzIndexCache(ManifestCache):
+    """A single cross-day .npz index under data/, revalidated like today's manifest"""
+
+    def url(self, key):
+        return f"{GITHUB_RAW_URL}/data/{self.filename}"
+
+    def parse(self, response):
+        with np.load(io.BytesIO(response.content)) as data:
+            return {key: data[key] for key in data.files}
+
+
+name_index_cache = NpzIndexCache(1, NAME_INDEX_FILENAME, NameIndex)
+
+
+# Visually similar marks - served from data/image_hash_index.npz, which the
+# scraper extends with each day's new images (see image_hash.py for the layout)
+IMAGE_HASH_INDEX_FILENAME = 'image_hash_index.npz'
+HASH_CHUNKS = 4
+HASH_CHUNK_BITS = 16
+VISUAL_MAX_DISTANCE = 10
+VISUAL_MAX_DISTANCE_LIMIT = 20
+VISUAL_LIMIT = 20
+VISUAL_MAX_LIMIT = 100
+VISUAL_MARKS_PER_IMAGE = 50  # a logo republished for years can carry many marks
+
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def chunk_values(hashes, chunk):
+    """Same 16-bit slices as image_hash.chunk_values"""
+    return ((hashes >> np.uint64(chunk * HASH_CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.int64)
+
+
+class ImageHashIndex:
+    """Cross-day pHash index of mark images, searched by multi-index hashing (see image_hash.py)"""
+
+    def __init__(self, data):
+        self.hashes = data['hashes']
+        self.ref_blob = data['ref_blob'].tobytes()
+        self.ref_offsets = data['ref_offsets']
+        self.flip_masks = {}
+        
+        # Image ids grouped by each 16-bit chunk value
+        self.tables = []
+        for chunk in range(HASH_CHUNKS):
+            values = chunk_values(self.hashes, chunk)
+            offsets = np.zeros((1 << HASH_CHUNK_BITS) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(values, minlength=1 << HASH_CHUNK_BITS), out=offsets[1:])
+            self.tables.append((offsets, np.argsort(values, kind='stable').astype(np.uint32)))
+        
+        # Occurrences grouped by image id for lookups
+        order = np.argsort(data['occ_image'], kind='stable')
+        self.occ_image = data['occ_image'][order]
+        self.occ_date = data['occ_date'][order]
+        self.occ_filing = data['occ_filing'][order]
+        self.dates = np.unique(data['occ_date'])
+
+    def ref(self, image_id):
+        return self.ref_blob[self.ref_offsets[image_id]:self.ref_offsets[image_id + 1]].decode('utf-8')
+
+    def image_of(self, filing_number):
+        """Image id of a mark's most recent publication, or None"""
+        rows = np.flatnonzero(self.occ_filing == filing_number.encode())
+        if not len(rows):
+            return None
+        return int(self.occ_image[rows[np.argmax(self.occ_date[rows])]])
+
+    def masks(self, radius):
+        if radius not in self.flip_masks:
+            values = np.arange(1 << HASH_CHUNK_BITS)
+            self.flip_masks[radius] = values[POPCOUNT[values & 0xFF] + POPCOUNT[values >> 8] <= radius]
+        return self.flip_masks[radius]
+
+    def search(self, query, max_distance=VISUAL_MAX_DISTANCE):
+        """[(distance, image id)] within max_distance of query, closest first
+        
+        A hash within d of the query is within d // 4 bits of it on at least
+        one 16-bit chunk, so only those buckets are compared in full.
+        """
+        query = np.array([query], dtype=np.uint64)
+        masks = self.masks(max_distance // HASH_CHUNKS)
+        found = []
+        for chunk, (offsets, ids) in enumerate(self.tables):
+            probes = chunk_values(query, chunk)[0] ^ masks
+            starts, ends = offsets[probes], offsets[probes + 1]
+            sizes = ends - starts
+            if sizes.sum():
+                positions = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+                found.append(ids[positions])
+        if not found:
+            return []
+        candidates = np.unique(np.concatenate(found))
+        diff = np.bitwise_xor(self.hashes[candidates], query[0])
+        distances = POPCOUNT[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+        keep = distances <= max_distance
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.lexsort((candidates, distances))
+        return list(zip(distances[order].tolist(), candidates[order].tolist()))
+
+    def marks(self, image_id, date_from=None, date_to=None):
+        """Marks published with an image, newest first, optionally filtered by day"""
+        key = np.uint32(image_id)
+        lo = np.searchsorted(self.occ_image, key, side='left')
+        hi = np.searchsorted(self.occ_image, key, side='right')
+        dates = self.occ_date[lo:hi]
+        keep = np.ones(hi - lo, dtype=bool)
+        if date_from:
+            keep &= dates >= int(date_from)
+        if date_to:
+            keep &= dates <= int(date_to)
+        marks = [{'date': str(int(self.occ_date[i])), 'filing_number': self.occ_filing[i].decode()}
+                 for i in (lo + np.flatnonzero(keep)).tolist()]
+        return sorted(marks, key=lambda mark: mark['date'], reverse=True)
+
+
+image_hash_index_cache = NpzIndexCache(1, IMAGE_HASH_INDEX_FILENAME, ImageHashIndex)
+
+
+def parse_day(value):
+    """YYYYMMDD or YYYY-MM-DD -> datetime, None if invalid"""
+    for fmt in ('%Y%m%d', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+# Cache-Control policies for API responses
+CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_TODAY = f'public, max-age={TODAY_TTL}, stale-while-revalidate={TODAY_TTL}'
+CACHE_REVALIDATE = 'no-cache'   # may be stored, but must be revalidated (cheap with ETag)
+CACHE_NONE = 'no-store'
+
+
+def cache_control_for(date_str):
+    """Policy for a response built from date_str's manifest"""
+    return CACHE_TODAY if is_mutable_date(date_str) else CACHE_IMMUTABLE
+
+
+def missing_cache_control(date_str):
+    """Policy for a 404 on date_str, matching how long the manifest cache remembers it"""
+    ttl = MISSING_TODAY_TTL if is_mutable_date(date_str) else MISSING_PAST_TTL
+    return f'public, max-age={ttl}'
+
+
+# Response compression
+COMPRESS_MIN_BYTES = 1024         # smaller bodies aren't worth the CPU or headers
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5                # per-request responses
+BROTLI_QUALITY_IMMUTABLE = 11     # compressed once, then served from the cache
+PRECOMPRESSED_CACHE_SIZE = 256
+
+
+class CompressedCache:
+    """LRU of compressed bodies for immutable responses, keyed by (etag, encoding)"""
+
+    def __init__(self, max_entries=PRECOMPRESSED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self.lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+compressed_cache = CompressedCache()
+
+
+def choose_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, None for identity"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress_body(body, encoding, immutable=False):
+    """Compress body with encoding; immutable bodies get max effort and are cached"""
+    if immutable:
+        key = (hashlib.sha256(body).digest(), encoding)
+        cached = compressed_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY_IMMUTABLE if immutable else BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    
+    if immutable:
+        compressed_cache.put(key, compressed)
+    return compressed
+
+
+def compute_etag(body, encoding=None):
+    """Strong ETag from the exact response bytes (one per content encoding)"""
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    if encoding:
+        digest += '-' + encoding
+    return '"' + digest + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header lists etag (or is *)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate == etag or candidate == 'W/' + etag:
+            return True
+    return False
+
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         # Parse the URL path
@@ -27,6 +574,12 @@ class handler(BaseHTTPRequestHandler):
             self.send_status()
         elif path == '/api/trigger-scrape':
             self.trigger_scrape()  # NEW ENDPOINT
+        elif path == '/api/trademarks/search':
+            self.send_search_results(query_params)
+        elif path == '/api/trademarks/similar':
+            self.send_similar_names(query_params)
+        elif path == '/api/trademarks/visually-similar':
+            self.send_visually_similar(query_params)
         elif path == '/api/trademarks/today/pages':
             self.send_today_pages()
         elif path.startswith('/api/trademarks/today/page/'):
@@ -54,17 +607,41 @@ class handler(BaseHTTPRequestHandler):
         else:
             self.send_error_response(404, "Endpoint not found")
     
-    def send_json_response(self, data, status_code=200):
-        """Send JSON response"""
+    def send_json_response(self, data, status_code=200, cache_control=CACHE_REVALIDATE):
+        """Send JSON response with an ETag, answering If-None-Match with 304
+        
+        Bodies over COMPRESS_MIN_BYTES are sent with br or gzip when the
+        client accepts it.
+        """
+        body = json.dumps(data).encode()
+        encoding = None
+        if len(body) >= COMPRESS_MIN_BYTES:
+            encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        etag = compute_etag(body, encoding)
+        
+        if status_code == 200 and etag_matches(self.headers.get('If-None-Match'), etag):
+            status_code, body = 304, b''
+        elif encoding:
+            body = compress_body(body, encoding, immutable=cache_control == CACHE_IMMUTABLE)
+        
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if status_code in (200, 304):
+            self.send_header('ETag', etag)
+        if status_code != 304:
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
     
-    def send_error_response(self, status_code, message):
-        """Send error response"""
-        self.send_json_response({'error': message}, status_code)
+    def send_error_response(self, status_code, message, cache_control=CACHE_NONE):
+        """Send error response (not cached unless cache_control says so)"""
+        self.send_json_response({'error': message}, status_code, cache_control)
     
     def send_home(self):
         """API documentation"""
@@ -78,11 +655,18 @@ class handler(BaseHTTPRequestHandler):
                 'GET /api/trademarks/today/pages': 'List all page files from today\'s scrape',
                 'GET /api/trademarks/today/page/{N}': 'Get download URL for specific page from today',
                 'GET /api/trademarks/{YYYYMMDD}/pages': 'List all page files for specific date',
-                'GET /api/trademarks/{YYYYMMDD}/page/{N}': 'Get download URL for specific page and date'
+                'GET /api/trademarks/{YYYYMMDD}/page/{N}': 'Get download URL for specific page and date',
+                'GET /api/trademarks/search': 'Search records: date or date_from/date_to, name, owner (or applicant), '
+                                              'country, class, status, filed_from/filed_to, page, page_size',
+                'GET /api/trademarks/similar': 'Names similar to ?name= across all days, ranked: '
+                                               'threshold, limit, class, date_from/date_to',
+                'GET /api/trademarks/visually-similar': 'Marks whose image looks like that of ?filing_number= '
+                                                        '(or a 16-hex-digit ?hash= pHash) across all days: '
+                                                        'max_distance, limit, date_from/date_to'
             },
             'github_repo': f"https://github.com/{GITHUB_USER}/{GITHUB_REPO}",
             'note': 'Excel files contain embedded images in Graphic representation column'
-        })
+        }, cache_control='public, max-age=3600')
     
     def trigger_scrape(self):
         """Trigger GitHub Actions to run the scraper NOW"""
@@ -92,23 +676,19 @@ class handler(BaseHTTPRequestHandler):
         
         url = f"https://api.github.com/repos/{GITHUB_USER}/{GITHUB_REPO}/dispatches"
         
-        data = json.dumps({"event_type": "scrape_now"}).encode()
-        
-        req = urllib.request.Request(url, data=data, headers={
-            'Authorization': f'token {GITHUB_TOKEN}',
-            'Accept': 'application/vnd.github.v3+json',
-            'Content-Type': 'application/json'
-        })
-        
         try:
-            urllib.request.urlopen(req)
+            response = http_session.post(url, json={"event_type": "scrape_now"}, headers={
+                'Authorization': f'token {GITHUB_TOKEN}',
+                'Accept': 'application/vnd.github.v3+json'
+            }, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            response.raise_for_status()
             self.send_json_response({
                 'success': True,
                 'message': 'Scraping job started successfully!',
                 'estimated_time': '10-15 minutes',
                 'check_status': '/api/status',
                 'check_results': '/api/trademarks/today/pages'
-            })
+            }, cache_control=CACHE_NONE)
         except Exception as e:
             self.send_error_response(500, f"Failed to trigger scrape: {str(e)}")
     
@@ -117,16 +697,12 @@ class handler(BaseHTTPRequestHandler):
         today = datetime.now().strftime('%Y%m%d')
         
         # Check if today's manifest exists
-        manifest_url = f"{GITHUB_RAW_URL}/data/{today}/manifest.json"
-        
         try:
-            with urllib.request.urlopen(manifest_url) as response:
-                manifest = json.loads(response.read().decode())
-                data_available = True
-                total_pages = manifest.get('total_pages', 0)
-        except:
-            data_available = False
-            total_pages = 0
+            manifest = manifest_cache.get(today)
+        except Exception:
+            manifest = None
+        data_available = manifest is not None
+        total_pages = manifest.get('total_pages', 0) if manifest else 0
         
         self.send_json_response({
             'api_status': 'online',
@@ -143,47 +719,44 @@ class handler(BaseHTTPRequestHandler):
     
     def send_date_pages(self, date_str):
         """Get list of all page files for specific date"""
-        manifest_url = f"{GITHUB_RAW_URL}/data/{date_str}/manifest.json"
-        
         try:
-            with urllib.request.urlopen(manifest_url) as response:
-                manifest = json.loads(response.read().decode())
-                
-                # Build response with download URLs for each page
-                pages = []
-                for filename in manifest.get('files', []):
-                    # Extract page number from filename
-                    try:
-                        page_num = int(filename.split('_page_')[1].split('.')[0])
-                    except:
-                        page_num = 0
-                    
-                    pages.append({
-                        'page_number': page_num,
-                        'filename': filename,
-                        'download_url': f"{GITHUB_RAW_URL}/data/{date_str}/{filename}",
-                        'has_images': True  # Excel files contain embedded images
-                    })
-                
-                # Sort by page number
-                pages.sort(key=lambda x: x['page_number'])
-                
-                self.send_json_response({
-                    'success': True,
-                    'date': date_str,
-                    'total_pages': manifest.get('total_pages', len(pages)),
-                    'scraped_at': manifest.get('scraped_at', ''),
-                    'pages': pages,
-                    'note': 'Download Excel files directly to preserve embedded images'
-                })
-                
-        except urllib.error.HTTPError as e:
-            if e.code == 404:
-                self.send_error_response(404, f'No data available for date {date_str}')
-            else:
-                self.send_error_response(500, f'Error fetching data: {str(e)}')
+            manifest = manifest_cache.get(date_str)
         except Exception as e:
-            self.send_error_response(500, f'Server error: {str(e)}')
+            self.send_error_response(500, f'Error fetching data: {str(e)}')
+            return
+        
+        if manifest is None:
+            self.send_error_response(404, f'No data available for date {date_str}',
+                                     missing_cache_control(date_str))
+            return
+        
+        # Build response with download URLs for each page
+        pages = []
+        for filename in manifest.get('files', []):
+            # Extract page number from filename
+            try:
+                page_num = int(filename.split('_page_')[1].split('.')[0])
+            except:
+                page_num = 0
+            
+            pages.append({
+                'page_number': page_num,
+                'filename': filename,
+                'download_url': f"{GITHUB_RAW_URL}/data/{date_str}/{filename}",
+                'has_images': True  # Excel files contain embedded images
+            })
+        
+        # Sort by page number
+        pages.sort(key=lambda x: x['page_number'])
+        
+        self.send_json_response({
+            'success': True,
+            'date': date_str,
+            'total_pages': manifest.get('total_pages', len(pages)),
+            'scraped_at': manifest.get('scraped_at', ''),
+            'pages': pages,
+            'note': 'Download Excel files directly to preserve embedded images'
+        }, cache_control=cache_control_for(date_str))
     
     def send_page_url(self, date_str, page_num):
         """Get direct download URL for a specific page"""
@@ -197,27 +770,229 @@ class handler(BaseHTTPRequestHandler):
         filename = f"eu_trademarks_{date_str}_page_{page_num:03d}.xlsx"
         file_url = f"{GITHUB_RAW_URL}/data/{date_str}/{filename}"
         
-        # Check if file exists by trying to fetch manifest
-        manifest_url = f"{GITHUB_RAW_URL}/data/{date_str}/manifest.json"
-        
+        # Check if file exists by looking it up in the manifest
         try:
-            with urllib.request.urlopen(manifest_url) as response:
-                manifest = json.loads(response.read().decode())
-                
-                # Check if this page exists in manifest
-                if filename in manifest.get('files', []):
-                    self.send_json_response({
-                        'success': True,
-                        'page_number': page_num,
-                        'filename': filename,
-                        'download_url': file_url,
-                        'date': date_str,
-                        'has_images': True
-                    })
-                else:
-                    self.send_error_response(404, f'Page {page_num} not found for date {date_str}')
-                    
-        except urllib.error.HTTPError:
-            self.send_error_response(404, f'No data available for date {date_str}')
+            manifest = manifest_cache.get(date_str)
         except Exception as e:
             self.send_error_response(500, f'Server error: {str(e)}')
+            return
+        
+        if manifest is None:
+            self.send_error_response(404, f'No data available for date {date_str}',
+                                     missing_cache_control(date_str))
+        elif filename in manifest.get('files', []):
+            self.send_json_response({
+                'success': True,
+                'page_number': page_num,
+                'filename': filename,
+                'download_url': file_url,
+                'date': date_str,
+                'has_images': True
+            }, cache_control=cache_control_for(date_str))
+        else:
+            self.send_error_response(404, f'Page {page_num} not found for date {date_str}',
+                                     cache_control_for(date_str))
+    
+    def send_search_results(self, query_params):
+        """Search records across one or more publication days"""
+        params = {key: values[0].strip() for key, values in query_params.items() if values and values[0].strip()}
+        
+        # Publication days to search (default: today)
+        if 'date_from' in params or 'date_to' in params:
+            start = parse_day(params.get('date_from', params.get('date_to')))
+            end = parse_day(params.get('date_to', params.get('date_from')))
+        else:
+            start = end = parse_day(params.get('date', datetime.now().strftime('%Y%m%d')))
+        if start is None or end is None or start > end:
+            self.send_error_response(400, 'Invalid date range - use YYYYMMDD')
+            return
+        days = (end - start).days + 1
+        if days > SEARCH_MAX_DAYS:
+            self.send_error_response(400, f'Date range too long - at most {SEARCH_MAX_DAYS} days')
+            return
+        dates = [(start + timedelta(days=i)).strftime('%Y%m%d') for i in range(days)]
+        
+        query = {
+            'name': params.get('name'),
+            'owner': params.get('owner', params.get('applicant')),
+            'country': params.get('country'),
+            'status': params.get('status'),
+            'class': params.get('class'),
+        }
+        for key in ('filed_from', 'filed_to'):
+            if key in params:
+                filed = parse_day(params[key])
+                if filed is None:
+                    self.send_error_response(400, f'Invalid {key} - use YYYYMMDD')
+                    return
+                query[key] = filed.strftime('%Y-%m-%d')
+        if query['class'] and not query['class'].isdigit():
+            self.send_error_response(400, 'Invalid class - use a Nice class number')
+            return
+        if query['class']:
+            query['class'] = str(int(query['class']))
+        
+        try:
+            page = max(1, int(params.get('page', 1)))
+            page_size = min(SEARCH_MAX_PAGE_SIZE, max(1, int(params.get('page_size', SEARCH_PAGE_SIZE))))
+        except ValueError:
+            self.send_error_response(400, 'Invalid page or page_size')
+            return
+        
+        # Stable order: publication date, then filing number (index order)
+        matches = []
+        missing_dates = []
+        try:
+            for date_str in dates:
+                index = search_index_cache.get(date_str)
+                if index is None:
+                    missing_dates.append(date_str)
+                    continue
+                matches.extend((index, record_id) for record_id in index.search(query))
+        except Exception as e:
+            self.send_error_response(500, f'Error fetching search index: {str(e)}')
+            return
+        
+        if len(missing_dates) == len(dates):
+            self.send_error_response(404, f'No search index available for {dates[0]}'
+                                     + (f' to {dates[-1]}' if len(dates) > 1 else ''),
+                                     missing_cache_control(dates[-1]))
+            return
+        
+        # A missing past day may still be backfilled, so don't pin the answer
+        if missing_dates:
+            cache_control = missing_cache_control(dates[-1])
+        else:
+            cache_control = cache_control_for(dates[-1])
+        
+        total = len(matches)
+        first = (page - 1) * page_size
+        data = [index.record(record_id) for index, record_id in matches[first:first + page_size]]
+        
+        self.send_json_response({
+            'success': True,
+            'data': data,
+            'total_records': total,
+            'page': page,
+            'page_size': page_size,
+            'total_pages': (total + page_size - 1) // page_size,
+            'dates': dates,
+            'missing_dates': missing_dates
+        }, cache_control=cache_control)
+    
+    def send_similar_names(self, query_params):
+        """Rank indexed names by similarity to ?name= for clearance searches"""
+        params = {key: values[0].strip() for key, values in query_params.items() if values and values[0].strip()}
+        name = params.get('name')
+        if not name or not normalize_name(name):
+            self.send_error_response(400, 'Missing name')
+            return
+        try:
+            threshold = min(1.0, max(0.05, float(params.get('threshold', SIMILAR_THRESHOLD))))
+            limit = min(SIMILAR_MAX_LIMIT, max(1, int(params.get('limit', SIMILAR_LIMIT))))
+        except ValueError:
+            self.send_error_response(400, 'Invalid threshold or limit')
+            return
+        nice_class = params.get('class')
+        if nice_class and not nice_class.isdigit():
+            self.send_error_response(400, 'Invalid class - use a Nice class number')
+            return
+        date_from = parse_day(params['date_from']) if 'date_from' in params else None
+        date_to = parse_day(params['date_to']) if 'date_to' in params else None
+        if ('date_from' in params and date_from is None) or ('date_to' in params and date_to is None):
+            self.send_error_response(400, 'Invalid date range - use YYYYMMDD')
+            return
+        date_from = date_from.strftime('%Y%m%d') if date_from else None
+        date_to = date_to.strftime('%Y%m%d') if date_to else None
+        
+        try:
+            index = name_index_cache.get('all')
+        except Exception as e:
+            self.send_error_response(500, f'Error fetching name index: {str(e)}')
+            return
+        if index is None:
+            self.send_error_response(404, 'Name index not built yet', missing_cache_control('all'))
+            return
+        
+        results = []
+        nice_class = int(nice_class) if nice_class else None
+        for similarity, name_id in index.similar(name, threshold):
+            marks = index.marks(name_id, date_from, date_to, nice_class)
+            if marks:
+                results.append({'name': index.name(name_id), 'similarity': round(similarity, 3), 'marks': marks})
+                if len(results) == limit:
+                    break
+        
+        self.send_json_response({
+            'success': True,
+            'query': name,
+            'threshold': threshold,
+            'data': results,
+            'total_records': len(results),
+            'indexed_dates': len(index.dates)
+        }, cache_control=CACHE_TODAY)
+    
+    def send_visually_similar(self, query_params):
+        """Rank indexed mark images by pHash distance to a mark's image (or a given hash)"""
+        params = {key: values[0].strip() for key, values in query_params.items() if values and values[0].strip()}
+        filing_number = params.get('filing_number')
+        query_hash = params.get('hash')
+        if not filing_number and not query_hash:
+            self.send_error_response(400, 'Missing filing_number or hash')
+            return
+        try:
+            max_distance = min(VISUAL_MAX_DISTANCE_LIMIT, max(0, int(params.get('max_distance', VISUAL_MAX_DISTANCE))))
+            limit = min(VISUAL_MAX_LIMIT, max(1, int(params.get('limit', VISUAL_LIMIT))))
+            query = int(query_hash, 16) if query_hash else None
+        except ValueError:
+            self.send_error_response(400, 'Invalid max_distance, limit or hash')
+            return
+        if query is not None and not 0 <= query < 1 << 64:
+            self.send_error_response(400, 'Invalid hash - use 16 hex digits')
+            return
+        date_from = parse_day(params['date_from']) if 'date_from' in params else None
+        date_to = parse_day(params['date_to']) if 'date_to' in params else None
+        if ('date_from' in params and date_from is None) or ('date_to' in params and date_to is None):
+            self.send_error_response(400, 'Invalid date range - use YYYYMMDD')
+            return
+        date_from = date_from.strftime('%Y%m%d') if date_from else None
+        date_to = date_to.strftime('%Y%m%d') if date_to else None
+        
+        try:
+            index = image_hash_index_cache.get('all')
+        except Exception as e:
+            self.send_error_response(500, f'Error fetching image index: {str(e)}')
+            return
+        if index is None:
+            self.send_error_response(404, 'Image index not built yet', missing_cache_control('all'))
+            return
+        
+        if query is None:
+            image_id = index.image_of(filing_number)
+            if image_id is None:
+                # Word marks (and others with only the placeholder picture) have no image
+                self.send_error_response(404, f'No indexed image for filing number {filing_number}',
+                                         CACHE_TODAY)
+                return
+            query = int(index.hashes[image_id])
+        
+        results = []
+        for distance, image_id in index.search(query, max_distance):
+            marks = index.marks(image_id, date_from, date_to)
+            if marks:
+                ref = index.ref(image_id)
+                results.append({'distance': distance, 'image': ref,
+                                'image_url': f"{GITHUB_RAW_URL}/data/{ref}",
+                                'total_marks': len(marks), 'marks': marks[:VISUAL_MARKS_PER_IMAGE]})
+                if len(results) == limit:
+                    break
+        
+        self.send_json_response({
+            'success': True,
+            'query': filing_number or query_hash,
+            'hash': f'{query:016x}',
+            'max_distance': max_distance,
+            'data': results,
+            'total_records': len(results),
+            'indexed_dates': len(index.dates)
+        }, cache_control=CACHE_TODAY)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark the native BIFF reader against pd.read_excel
+
+Runs both readers over the checked-in sample pages, checks they produce the
+same DataFrame and prints per-page timings.
+
+Usage: python benchmark_readers.py [data/20251210] [repeats]
+"""
+
+import os
+import sys
+import glob
+import time
+
+import pandas as pd
+
+import biff_reader
+from trademark_schema import EXPECTED_COLUMNS
+
+
+def read_with_pandas(file):
+    """The original merge_excel_files path"""
+    df = pd.read_excel(file, header=1)
+    df = df[df['Filing number'].notna()]
+    return df[[col for col in df.columns if any(exp in str(col) for exp in EXPECTED_COLUMNS)]]
+
+
+def read_with_native(file):
+    """The native BIFF path"""
+    df = biff_reader.read_page(file, EXPECTED_COLUMNS, header_row=1)
+    return df[df['Filing number'].notna()]
+
+
+def time_reader(reader, files, repeats):
+    """Best-of-N total time for reading every file"""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for file in files:
+            reader(file)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join('data', '20251210')
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    files = sorted(glob.glob(os.path.join(folder, '*_page_*.xlsx')))
+    if not files:
+        print(f"❌ No page files in {folder}")
+        return 1
+
+    print(f"📊 {len(files)} pages in {folder}, best of {repeats}")
+    print(f"   Format: {biff_reader.sniff_format(files[0])}")
+
+    # Same output or the timing is meaningless
+    for file in files:
+        expected = read_with_pandas(file).reset_index(drop=True)
+        actual = read_with_native(file).reset_index(drop=True)
+        if not expected.equals(actual):
+            print(f"❌ Output differs for {os.path.basename(file)}")
+            return 1
+    print("✅ Both readers produce identical DataFrames")
+
+    pandas_time = time_reader(read_with_pandas, files, repeats)
+    native_time = time_reader(read_with_native, files, repeats)
+    print(f"pd.read_excel : {pandas_time:.3f}s ({pandas_time / len(files) * 1000:.1f} ms/page)")
+    print(f"native BIFF   : {native_time:.3f}s ({native_time / len(files) * 1000:.1f} ms/page)")
+    print(f"⚡ Speedup: {pandas_time / native_time:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,614 @@
+"""
+Native reader for EUIPO eSearch exports
+
+The "page_NNN.xlsx" files eSearch hands out are really legacy OLE2/BIFF8
+.xls workbooks. This reader sniffs the real format from the magic bytes,
+memory-maps the file, walks the Workbook stream record by record and only
+decodes the cells of the columns we keep. The embedded mark images (the
+MSODRAWINGGROUP record and its CONTINUEs, most of each file) are skipped
+without being read unless include_images is set; read_page_images pairs
+them with the rows they are anchored to.
+"""
+
+import mmap
+import zlib
+import struct
+from bisect import bisect_right
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from download_watcher import OLE2_MAGIC, ZIP_MAGIC
+
+# Compound file constants
+MAX_REGSECT = 0xFFFFFFFA
+
+# BIFF8 record types
+EOF = 0x000A
+BOUNDSHEET = 0x0085
+SST = 0x00FC
+CONTINUE = 0x003C
+MSODRAWINGGROUP = 0x00EB
+MSODRAWING = 0x00EC
+OBJ = 0x005D
+LABELSST = 0x00FD
+LABEL = 0x0204
+NUMBER = 0x0203
+RK = 0x027E
+MULRK = 0x00BD
+BOOLERR = 0x0205
+FORMULA = 0x0006
+STRING = 0x0207
+
+CELL_RECORDS = {LABELSST, LABEL, NUMBER, RK, MULRK, BOOLERR, FORMULA}
+
+RECORD_HEADER = struct.Struct('<HH')
+CELL_HEADER = struct.Struct('<HH')
+LABELSST_BODY = struct.Struct('<HHHI')
+STRING_HEADER = struct.Struct('<HB')
+UINT32 = struct.Struct('<I')
+DOUBLE = struct.Struct('<d')
+
+# OfficeArt (drawing) records inside MSODRAWINGGROUP / MSODRAWING
+OFFICEART_HEADER = struct.Struct('<HHI')
+BSTORE_CONTAINER = 0xF001
+BSE = 0xF007
+SP_CONTAINER = 0xF004
+FOPT = 0xF00B
+CLIENT_ANCHOR = 0xF010
+PROP_PIB = 0x0104
+FBSE_SIZE = 36
+CLIENT_ANCHOR_BODY = struct.Struct('<HHHHHHHHH')
+
+# Blip record type -> (file extension, bytes of metafile header after the UIDs, or None for bitmaps)
+BLIP_TYPES = {
+    0xF01A: ('emf', 34),
+    0xF01B: ('wmf', 34),
+    0xF01C: ('pict', 34),
+    0xF01D: ('jpg', None),
+    0xF01E: ('png', None),
+    0xF01F: ('bmp', None),
+    0xF029: ('tiff', None),
+    0xF02A: ('jpg', None),
+}
+IMAGE_MAGIC = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF8', 'gif'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'BM', 'bmp'),
+]
+
+
+class BiffFormatError(Exception):
+    """The file is not a BIFF8 workbook this reader understands"""
+
+
+def sniff_format(path):
+    """Return 'biff', 'xlsx' or 'unknown' from the file's magic bytes"""
+    with open(path, 'rb') as f:
+        header = f.read(len(OLE2_MAGIC))
+    if header.startswith(OLE2_MAGIC):
+        return 'biff'
+    if header.startswith(ZIP_MAGIC):
+        return 'xlsx'
+    return 'unknown'
+
+
+class CompoundStream:
+    """Random access to one stream of an OLE2 compound file without copying it"""
+
+    def __init__(self, buf, runs, size):
+        # runs: (stream_offset, file_offset, length) for contiguous sector runs
+        self.buf = buf
+        self.runs = runs
+        self.starts = [r[0] for r in runs]
+        self.size = size
+        self.current = runs[0]
+
+    def locate(self, offset, n):
+        """File offset of stream bytes [offset, offset + n) if they sit in one run, else None"""
+        run = self.current
+        if not run[0] <= offset < run[0] + run[2]:
+            run = self.current = self.runs[bisect_right(self.starts, offset) - 1]
+        skip = offset - run[0]
+        if skip + n <= run[2]:
+            return run[1] + skip
+        return None
+
+    def body(self, offset, n):
+        """(buffer, position) of a record body - only copies when it spans runs"""
+        position = self.locate(offset, n)
+        if position is not None:
+            return self.buf, position
+        return self.read(offset, n), 0
+
+    def read(self, offset, n):
+        """Read n bytes at stream offset (may span sector runs)"""
+        parts = []
+        while n > 0:
+            i = bisect_right(self.starts, offset) - 1
+            run_start, file_offset, length = self.runs[i]
+            skip = offset - run_start
+            take = min(n, length - skip)
+            parts.append(self.buf[file_offset + skip:file_offset + skip + take])
+            offset += take
+            n -= take
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+
+def open_workbook_stream(buf):
+    """Locate the Workbook stream inside an OLE2 compound file"""
+    if buf[:8] != OLE2_MAGIC:
+        raise BiffFormatError("Not an OLE2 compound file")
+
+    sector_size = 1 << struct.unpack_from('<H', buf, 0x1E)[0]
+    num_fat_sectors, first_dir_sector = struct.unpack_from('<II', buf, 0x2C)
+    first_difat_sector, num_difat_sectors = struct.unpack_from('<II', buf, 0x44)
+
+    def sector_offset(sector):
+        return (sector + 1) * sector_size
+
+    # FAT sector list: 109 entries in the header, the rest in DIFAT sectors
+    fat_sectors = list(struct.unpack_from('<109I', buf, 0x4C))
+    sector = first_difat_sector
+    per_difat = sector_size // 4 - 1
+    for _ in range(num_difat_sectors):
+        if sector >= MAX_REGSECT:
+            break
+        entries = struct.unpack_from(f'<{per_difat + 1}I', buf, sector_offset(sector))
+        fat_sectors.extend(entries[:per_difat])
+        sector = entries[per_difat]
+    fat_sectors = [s for s in fat_sectors if s < MAX_REGSECT][:num_fat_sectors]
+
+    fat = []
+    per_sector = sector_size // 4
+    for s in fat_sectors:
+        fat.extend(struct.unpack_from(f'<{per_sector}I', buf, sector_offset(s)))
+
+    def chain(start):
+        sectors = []
+        while start < MAX_REGSECT:
+            sectors.append(start)
+            start = fat[start]
+        return sectors
+
+    # Directory: 128-byte entries
+    for dir_sector in chain(first_dir_sector):
+        base = sector_offset(dir_sector)
+        for i in range(sector_size // 128):
+            entry = base + i * 128
+            name_len = struct.unpack_from('<H', buf, entry + 0x40)[0]
+            name = bytes(buf[entry:entry + max(name_len - 2, 0)]).decode('utf-16-le', errors='replace')
+            if name not in ('Workbook', 'Book') or buf[entry + 0x42] != 2:
+                continue
+            start, size = struct.unpack_from('<II', buf, entry + 0x74)
+            if size < 4096:
+                raise BiffFormatError("Workbook stream in the mini stream is not supported")
+
+            # Merge consecutive sectors into runs so most reads are one slice
+            runs = []
+            for i_sector, s in enumerate(chain(start)):
+                stream_offset = i_sector * sector_size
+                if runs and runs[-1][1] + runs[-1][2] == sector_offset(s):
+                    runs[-1][2] += sector_size
+                else:
+                    runs.append([stream_offset, sector_offset(s), sector_size])
+            return CompoundStream(buf, [tuple(r) for r in runs], size)
+
+    raise BiffFormatError("No Workbook stream found")
+
+
+def iter_records(stream, offset=0):
+    """Yield (type, body_offset, length) without reading record bodies"""
+    buf = stream.buf
+    unpack_from = RECORD_HEADER.unpack_from
+    while offset + 4 <= stream.size:
+        position = stream.locate(offset, 4)
+        if position is None:
+            record_type, length = RECORD_HEADER.unpack(stream.read(offset, 4))
+        else:
+            record_type, length = unpack_from(buf, position)
+        yield record_type, offset + 4, length
+        offset += 4 + length
+
+
+def parse_sst(segments, count):
+    """Decode the shared string table from the SST record and its CONTINUEs"""
+    strings = []
+    append = strings.append
+    unpack_string_header = STRING_HEADER.unpack_from
+    seg_index = 0
+    data = segments[0]
+    pos = 8  # skip total / unique counts
+
+    def advance(nbytes):
+        """Skip bytes that may run into following segments"""
+        nonlocal seg_index, data, pos
+        while nbytes > 0:
+            avail = len(data) - pos
+            if nbytes < avail:
+                pos += nbytes
+                return
+            nbytes -= avail
+            seg_index += 1
+            if seg_index >= len(segments):
+                return
+            data = segments[seg_index]
+            pos = 0
+
+    for _ in range(count):
+        if pos >= len(data):
+            seg_index += 1
+            if seg_index >= len(segments):
+                break
+            data = segments[seg_index]
+            pos = 0
+
+        num_chars, flags = unpack_string_header(data, pos)
+        pos += 3
+
+        # Fast path: plain string that fits in the current segment
+        if not flags & 0x0C:
+            nbytes = num_chars * 2 if flags & 0x01 else num_chars
+            if pos + nbytes <= len(data):
+                raw = data[pos:pos + nbytes]
+                append(raw.decode('utf-16-le') if flags & 0x01 else raw.decode('latin-1'))
+                pos += nbytes
+                continue
+
+        rich_runs = ext_size = 0
+        if flags & 0x08:
+            rich_runs = struct.unpack_from('<H', data, pos)[0]
+            pos += 2
+        if flags & 0x04:
+            ext_size = struct.unpack_from('<I', data, pos)[0]
+            pos += 4
+
+        wide = flags & 0x01
+        parts = []
+        remaining = num_chars
+        while True:
+            char_size = 2 if wide else 1
+            take = min(remaining, (len(data) - pos) // char_size)
+            raw = data[pos:pos + take * char_size]
+            parts.append(raw.decode('utf-16-le') if wide else raw.decode('latin-1'))
+            pos += take * char_size
+            remaining -= take
+            if not remaining:
+                break
+            # Characters continue in the next CONTINUE, behind a fresh flags byte
+            seg_index += 1
+            data = segments[seg_index]
+            wide = data[0] & 0x01
+            pos = 1
+        append(''.join(parts))
+
+        advance(rich_runs * 4 + ext_size)
+    return strings
+
+
+def read_unicode_string(body, pos, length_size=2):
+    """Decode a BIFF8 XLUnicodeString (LABEL / STRING records)"""
+    if length_size == 2:
+        num_chars = struct.unpack_from('<H', body, pos)[0]
+    else:
+        num_chars = body[pos]
+    pos += length_size
+    flags = body[pos]
+    pos += 1
+    if flags & 0x08:
+        pos += 2
+    if flags & 0x04:
+        pos += 4
+    if flags & 0x01:
+        return bytes(body[pos:pos + num_chars * 2]).decode('utf-16-le')
+    return bytes(body[pos:pos + num_chars]).decode('latin-1')
+
+
+def decode_rk(rk):
+    """Decode an RK-encoded number"""
+    if rk & 0x02:
+        value = float(rk >> 2 if rk < 0x80000000 else (rk >> 2) - (1 << 30))
+    else:
+        value = struct.unpack('<d', struct.pack('<Q', (rk & 0xFFFFFFFC) << 32))[0]
+    if rk & 0x01:
+        value /= 100
+    return value
+
+
+def read_biff_sheet(path, header_row=1, column_filter=None, include_images=False):
+    """Read the first worksheet of a BIFF8 workbook
+
+    Returns {'header': [...], 'rows': [[...], ...], 'row_numbers': [...],
+    'images': bytes or None, 'drawing': bytes or None}. images is the
+    workbook's drawing group (the pictures), drawing the sheet's shapes.
+    Only columns whose header passes column_filter(name) are decoded; rows
+    above header_row are dropped. Numbers come back as floats and text as
+    str - eSearch writes dates as text, so no XF/number-format handling is
+    needed.
+    """
+    with open(path, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        stream = open_workbook_stream(buf)
+
+        # Workbook globals: shared strings, sheet offsets, optional drawing group
+        sst = []
+        sheet_offsets = []
+        drawing_group = []
+        records = iter_records(stream)
+        for record_type, offset, length in records:
+            if record_type == EOF:
+                break
+            if record_type == BOUNDSHEET:
+                body = stream.read(offset, length)
+                if body[5] == 0:  # worksheet
+                    sheet_offsets.append(struct.unpack_from('<I', body, 0)[0])
+            elif record_type == SST:
+                segments = [stream.read(offset, length)]
+                count = struct.unpack_from('<I', segments[0], 4)[0]
+                next_offset = offset + length
+                for next_type, next_body, next_length in iter_records(stream, next_offset):
+                    if next_type != CONTINUE:
+                        break
+                    segments.append(stream.read(next_body, next_length))
+                sst = parse_sst(segments, count)
+            elif record_type == MSODRAWINGGROUP and include_images:
+                drawing_group.append(stream.read(offset, length))
+                for next_type, next_body, next_length in iter_records(stream, offset + length):
+                    if next_type != CONTINUE:
+                        break
+                    drawing_group.append(stream.read(next_body, next_length))
+
+        if not sheet_offsets:
+            raise BiffFormatError("Workbook has no worksheet")
+
+        # First worksheet. Its substream is small (the images live in the
+        # globals), so copy it once and walk it with a tight loop
+        sheet_offset = sheet_offsets[0]
+        data = stream.read(sheet_offset, stream.size - sheet_offset)
+    finally:
+        buf.close()
+
+    cells = {}
+    wanted = None
+    header = {}
+    pending_formula = None
+    unpack_header = RECORD_HEADER.unpack_from
+    unpack_labelsst = LABELSST_BODY.unpack_from
+    pos = 0
+    end = len(data)
+    while pos + 4 <= end:
+        record_type, length = unpack_header(data, pos)
+        body = pos + 4
+        pos = body + length
+
+        # Fast path: eSearch writes every cell as a shared string
+        if record_type == LABELSST:
+            row, col, _, index = unpack_labelsst(data, body)
+            if row > header_row:
+                if wanted is None:
+                    wanted = {c for c, name in header.items()
+                              if column_filter is None or column_filter(name)}
+                if col in wanted:
+                    row_cells = cells.get(row)
+                    if row_cells is None:
+                        row_cells = cells[row] = {}
+                    row_cells[col] = sst[index]
+            elif row == header_row:
+                header[col] = sst[index]
+            continue
+
+        if record_type not in CELL_RECORDS:
+            if record_type == EOF:
+                break
+            if record_type == STRING and pending_formula is not None:
+                cells.setdefault(pending_formula[0], {})[pending_formula[1]] = read_unicode_string(data, body)
+                pending_formula = None
+            continue
+
+        row, col = CELL_HEADER.unpack_from(data, body)
+        if row < header_row:
+            continue
+        if row > header_row:
+            if wanted is None:
+                wanted = {c for c, name in header.items()
+                          if column_filter is None or column_filter(name)}
+            if record_type != MULRK and col not in wanted:
+                continue
+
+        if record_type == LABEL:
+            value = read_unicode_string(data, body + 6)
+        elif record_type == NUMBER:
+            value = DOUBLE.unpack_from(data, body + 6)[0]
+        elif record_type == RK:
+            value = decode_rk(UINT32.unpack_from(data, body + 6)[0])
+        elif record_type == BOOLERR:
+            value = bool(data[body + 6]) if data[body + 7] == 0 else None
+        elif record_type == FORMULA:
+            result = data[body + 6:body + 14]
+            if result[6:8] == b'\xff\xff':
+                if result[0] == 0:  # string result follows in a STRING record
+                    pending_formula = (row, col)
+                    continue
+                value = bool(result[2]) if result[0] == 1 else None
+            else:
+                value = DOUBLE.unpack(result)[0]
+        else:  # MULRK
+            last_col = struct.unpack_from('<H', data, body + length - 2)[0]
+            row_cells = header if row == header_row else cells.setdefault(row, {})
+            for i, c in enumerate(range(col, last_col + 1)):
+                if row == header_row or c in wanted:
+                    row_cells[c] = decode_rk(UINT32.unpack_from(data, body + 6 + i * 6)[0])
+            continue
+
+        if row == header_row:
+            header[col] = value
+        else:
+            cells.setdefault(row, {})[col] = value
+
+
+    if wanted is None:
+        wanted = {c for c, name in header.items() if column_filter is None or column_filter(name)}
+    columns = sorted(wanted)
+    row_numbers = [r for r in sorted(cells) if r != header_row]
+    return {
+        'header': [header[c] for c in columns],
+        'rows': [[cells[r].get(c) for c in columns] for r in row_numbers],
+        'row_numbers': row_numbers,
+        'images': b''.join(bytes(p) for p in drawing_group) if include_images else None,
+        'drawing': sheet_drawing(data) if include_images else None,
+    }
+
+
+def iter_officeart(data, pos=0, end=None):
+    """Yield (type, instance, body_offset, length) for the OfficeArt records in data[pos:end]"""
+    end = len(data) if end is None else end
+    while pos + 8 <= end:
+        ver_instance, record_type, length = OFFICEART_HEADER.unpack_from(data, pos)
+        yield record_type, ver_instance >> 4, pos + 8, length
+        pos += 8 + length
+
+
+def find_officeart(data, wanted, pos=0, end=None):
+    """Yield (instance, body_offset, length) of every wanted record, descending into containers"""
+    end = len(data) if end is None else end
+    for record_type, instance, body, length in iter_officeart(data, pos, end):
+        if record_type == wanted:
+            yield instance, body, length
+        elif data[body - 8] & 0x0F == 0x0F:  # container
+            yield from find_officeart(data, wanted, body, min(body + length, end))
+
+
+def decode_blip(data, pos):
+    """(extension, image bytes) of the blip record at pos, or None for unknown kinds"""
+    blip_type, instance, body, length = next(iter_officeart(data, pos), (None, 0, 0, 0))
+    if blip_type not in BLIP_TYPES:
+        return None
+    extension, metafile_header = BLIP_TYPES[blip_type]
+    uid_size = 32 if instance & 1 else 16
+    if metafile_header is None:
+        image = bytes(data[body + uid_size + 1:body + length])  # UIDs, then a tag byte
+    else:
+        compressed = data[body + uid_size + 32] == 0x00
+        image = bytes(data[body + uid_size + metafile_header:body + length])
+        if compressed:
+            image = zlib.decompress(image)
+    if extension == 'bmp':
+        image = bmp_from_dib(image)
+    # eSearch files PNGs under JPEG blips too, so trust the bytes over the record type
+    for magic, sniffed in IMAGE_MAGIC:
+        if image.startswith(magic):
+            return sniffed, image
+    return extension, image
+
+
+def bmp_from_dib(dib):
+    """Prefix a packed DIB with the BITMAPFILEHEADER a .bmp file needs"""
+    header_size, = UINT32.unpack_from(dib, 0)
+    bit_count, = struct.unpack_from('<H', dib, 14)
+    compression, colors_used = struct.unpack_from('<I12xI', dib, 16) if header_size >= 36 else (0, 0)
+    palette = colors_used or (1 << bit_count if bit_count <= 8 else 0)
+    masks = 12 if compression == 3 and header_size == 40 else 0
+    offset = 14 + header_size + masks + palette * 4
+    return b'BM' + struct.pack('<IHHI', 14 + len(dib), 0, 0, offset) + dib
+
+
+def parse_blip_store(drawing_group):
+    """Images of a MSODRAWINGGROUP, in blip store order (BSE index 1 is item 0; None if not embedded)"""
+    images = []
+    for _, body, length in find_officeart(drawing_group, BSTORE_CONTAINER):
+        for record_type, _, bse, bse_length in iter_officeart(drawing_group, body, body + length):
+            if record_type != BSE:
+                continue
+            name_size = drawing_group[bse + 33]
+            blip = bse + FBSE_SIZE + name_size
+            embedded = bse_length > FBSE_SIZE + name_size + 8
+            images.append(decode_blip(drawing_group, blip) if embedded else None)
+    return images
+
+
+def parse_picture_anchors(drawing):
+    """[(row, col, BSE index)] for every picture shape in a sheet's MSODRAWING stream"""
+    anchors = []
+    for _, body, length in find_officeart(drawing, SP_CONTAINER):
+        pib = anchor = None
+        for record_type, instance, child, child_length in iter_officeart(drawing, body, body + length):
+            if record_type == FOPT:
+                # instance = number of properties, each (id with flags, value)
+                for i in range(instance):
+                    prop_id, value = struct.unpack_from('<HI', drawing, child + i * 6)
+                    if prop_id & 0x3FFF == PROP_PIB:
+                        pib = value
+            elif record_type == CLIENT_ANCHOR and child_length >= CLIENT_ANCHOR_BODY.size:
+                _, col, _, row, *_ = CLIENT_ANCHOR_BODY.unpack_from(drawing, child)
+                anchor = (row, col)
+        if pib and anchor:
+            anchors.append((anchor[0], anchor[1], pib))
+    return anchors
+
+
+def sheet_drawing(data):
+    """Join a worksheet substream's MSODRAWING records into one OfficeArt stream
+
+    Once the drawing outgrows a record, Excel carries each further shape in
+    a CONTINUE after the previous shape's OBJ record, so those count too.
+    """
+    parts = []
+    in_drawing = False
+    pos = 0
+    end = len(data)
+    while pos + 4 <= end:
+        record_type, length = RECORD_HEADER.unpack_from(data, pos)
+        body = pos + 4
+        pos = body + length
+        if record_type == MSODRAWING or (record_type == CONTINUE and in_drawing):
+            parts.append(data[body:pos])
+            in_drawing = True
+        elif record_type == OBJ:
+            in_drawing = True
+        elif record_type != CONTINUE:
+            in_drawing = False
+            if record_type == EOF:
+                break
+    return b''.join(parts)
+
+
+def read_page_images(path, key_column='Filing number', header_row=1):
+    """[(key, extension, image bytes)] for every picture anchored to a data row
+
+    key is the row's key_column cell. Rows without a picture are left out;
+    a row with several pictures (rare) yields each of them.
+    """
+    sheet = read_biff_sheet(path, header_row, column_filter=lambda name: name == key_column,
+                            include_images=True)
+    if not sheet['header'] or not sheet['images']:
+        return []
+    images = parse_blip_store(sheet['images'])
+    keys = {row_number: row[0] for row_number, row in zip(sheet['row_numbers'], sheet['rows'])}
+    found = []
+    for row, _, pib in parse_picture_anchors(sheet['drawing']):
+        key = keys.get(row)
+        image = images[pib - 1] if 0 < pib <= len(images) else None
+        if row > header_row and key is not None and image is not None:
+            found.append((key, image[0], image[1]))
+    return found
+
+
+def read_page(path, expected_columns, header_row=1):
+    """Read an eSearch page export into a DataFrame like pd.read_excel(path, header=1)
+
+    Keeps the columns whose header contains one of expected_columns, with the
+    same type inference pandas applies. Non-BIFF files go through
+    pd.read_excel.
+    """
+    if sniff_format(path) != 'biff':
+        df = pd.read_excel(path, header=header_row)
+        return df[[c for c in df.columns if any(exp in str(c) for exp in expected_columns)]]
+
+    sheet = read_biff_sheet(path, header_row,
+                            column_filter=lambda name: any(exp in str(name) for exp in expected_columns))
+    # Same parser read_excel feeds its cell grid through, so dtypes match
+    return TextParser([sheet['header']] + sheet['rows'], header=0).read()
@@ -0,0 +1,146 @@
+"""
+Download completion watcher for Chrome exports
+
+Watches a private download directory and reports a finished Excel file as
+soon as Chrome renames its .crdownload into place. Uses inotify on Linux and
+falls back to stat polling everywhere else (e.g. macOS).
+"""
+
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+EXCEL_EXTENSIONS = ('.xls', '.xlsx')
+PARTIAL_EXTENSIONS = ('.crdownload', '.tmp', '.part')
+
+# Legacy BIFF exports are OLE2 compound files, real .xlsx files are ZIPs
+OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ZIP_MAGIC = b'PK\x03\x04'
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def has_excel_signature(path):
+    """True if the file starts with an OLE2 or ZIP header"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(len(OLE2_MAGIC))
+    except OSError:
+        return False
+    return header.startswith(OLE2_MAGIC) or header.startswith(ZIP_MAGIC)
+
+
+def open_inotify(directory):
+    """Return an inotify fd watching directory, or None if unavailable"""
+    if not hasattr(os, 'uname') or os.uname().sysname != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class DownloadWatcher:
+    """Wait for a new, fully written Excel file to appear in a directory
+
+    Create the watcher before triggering the download so the rename event
+    cannot be missed.
+    """
+
+    def __init__(self, directory, ignore_existing=True, poll_interval=0.2, stable_interval=0.05):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.stable_interval = stable_interval
+        os.makedirs(directory, exist_ok=True)
+
+        # Files already present are never reported
+        self.ignored = set(os.listdir(directory)) if ignore_existing else set()
+
+        self.fd = open_inotify(directory)
+        self.mode = 'inotify' if self.fd is not None else 'polling'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release the inotify descriptor"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def drain_events(self):
+        """Read pending inotify events; returns the file names they mention"""
+        names = []
+        while True:
+            try:
+                buf = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(buf):
+                _, _, _, name_len = INOTIFY_EVENT.unpack_from(buf, offset)
+                offset += INOTIFY_EVENT.size
+                names.append(buf[offset:offset + name_len].rstrip(b'\0').decode(errors='replace'))
+                offset += name_len
+
+    def is_complete(self, path):
+        """A download is complete when its size is stable and the header is valid"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        if size == 0 or not has_excel_signature(path):
+            return False
+        time.sleep(self.stable_interval)
+        try:
+            return os.path.getsize(path) == size
+        except OSError:
+            return False
+
+    def find_complete(self):
+        """Return the first new, complete Excel file in the directory, or None"""
+        for name in sorted(os.listdir(self.directory)):
+            if name in self.ignored or name.endswith(PARTIAL_EXTENSIONS):
+                continue
+            if not name.lower().endswith(EXCEL_EXTENSIONS):
+                continue
+            path = os.path.join(self.directory, name)
+            if self.is_complete(path):
+                self.ignored.add(name)
+                return path
+        return None
+
+    def wait(self, timeout=60):
+        """Block until a download completes; returns its path or None on timeout"""
+        deadline = time.time() + timeout
+        while True:
+            path = self.find_complete()
+            if path:
+                return path
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+
+            if self.fd is not None:
+                ready, _, _ = select.select([self.fd], [], [], min(remaining, 1.0))
+                if ready:
+                    self.drain_events()
+            else:
+                time.sleep(min(remaining, self.poll_interval))
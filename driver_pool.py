@@ -0,0 +1,220 @@
+"""
+Pool of warm Chrome sessions shared across pages, dates and backfill runs
+
+Starting Chrome (and loading the eSearch app into it) costs seconds, so
+sessions are kept alive and lent out one page at a time:
+
+    pool = DriverPool(start_driver)
+    with pool.driver(download_dir) as driver:
+        ...
+
+On checkout an idle session is health-checked (a trivial script round
+trip), pointed at the caller's download folder through CDP and reset to a
+blank page. A session is retired instead of returned when the page raised
+and it no longer answers, after max_pages pages, or once Chrome's process
+tree uses more than max_rss_mb. Parallel workers share one pool; it keeps
+as many idle sessions as were ever lent out at once (the worker count), or
+max_idle if given.
+
+A download_dir of None means downloads are denied (exports are captured
+from network events instead, see export_capture.py).
+"""
+
+import os
+import atexit
+import threading
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # RSS falls back to /proc on Linux
+    psutil = None
+
+DEFAULT_MAX_PAGES = 50
+DEFAULT_MAX_RSS_MB = 1500
+
+
+def process_tree_rss(pid):
+    """Resident memory (bytes) of pid and all its descendants, None if unknown"""
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            tree = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in tree if p.is_running())
+        except psutil.Error:
+            return None
+    if not os.path.isdir('/proc'):
+        return None
+
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after its closing paren
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/statm') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+        pending.extend(children.get(current, []))
+    return total
+
+
+class PooledDriver:
+    """A live session plus the bookkeeping used to decide when to recycle it"""
+
+    def __init__(self, driver, download_dir):
+        self.driver = driver
+        self.download_dir = download_dir
+        self.pages = 0
+
+
+class DriverPool:
+    def __init__(self, start_driver, max_pages=DEFAULT_MAX_PAGES, max_rss_mb=DEFAULT_MAX_RSS_MB,
+                 max_idle=None):
+        """start_driver(download_dir) returns a new WebDriver downloading into download_dir"""
+        self.start_driver = start_driver
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.max_idle = max_idle
+        self.idle = []
+        self.lock = threading.Lock()
+        self.lent = 0
+        self.peak_lent = 0      # most sessions out at once, the idle limit without max_idle
+        self.started = 0
+        self.retired = 0
+        self.closed = False
+        atexit.register(self.close)
+
+    @contextmanager
+    def driver(self, download_dir):
+        """Lend a healthy session downloading into download_dir for one page"""
+        entry = self.checkout(download_dir)
+        failed = False
+        try:
+            yield entry.driver
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            entry.pages += 1
+            self.release(entry, failed)
+
+    def checkout(self, download_dir):
+        if download_dir is not None:
+            os.makedirs(download_dir, exist_ok=True)
+        while True:
+            with self.lock:
+                entry = self.idle.pop() if self.idle else None
+            if entry is None:
+                break
+            if self.is_healthy(entry) and self.point_downloads(entry, download_dir) and self.reset(entry):
+                self.lend()
+                return entry
+            self.retire(entry, 'failed health check')
+
+        driver = self.start_driver(download_dir)
+        with self.lock:
+            self.started += 1
+        self.lend()
+        return PooledDriver(driver, download_dir)
+
+    def lend(self):
+        with self.lock:
+            self.lent += 1
+            self.peak_lent = max(self.peak_lent, self.lent)
+
+    def release(self, entry, failed=False):
+        """Return a session to the pool, or retire it"""
+        with self.lock:
+            self.lent -= 1
+        if failed and not self.is_healthy(entry):
+            self.retire(entry, 'unresponsive after an error')
+            return
+        if entry.pages >= self.max_pages:
+            self.retire(entry, f'{entry.pages} pages served')
+            return
+        rss = self.rss(entry)
+        if rss is not None and rss > self.max_rss_mb * 1024 * 1024:
+            self.retire(entry, f'{rss / 1024 / 1024:.0f} MB resident')
+            return
+        with self.lock:
+            max_idle = self.peak_lent if self.max_idle is None else self.max_idle
+            if not self.closed and len(self.idle) < max_idle:
+                self.idle.append(entry)
+                return
+        self.retire(entry)
+
+    def is_healthy(self, entry):
+        """True if the browser still answers a script round trip"""
+        try:
+            return entry.driver.execute_script('return 1') == 1 and bool(entry.driver.window_handles)
+        except Exception:
+            return False
+
+    def point_downloads(self, entry, download_dir):
+        """Send the session's downloads to download_dir (None denies them); False if that cannot be done"""
+        if entry.download_dir == download_dir:
+            return True
+        if download_dir is None:
+            behavior = {'behavior': 'deny'}
+        else:
+            behavior = {'behavior': 'allow', 'downloadPath': download_dir, 'eventsEnabled': False}
+        try:
+            entry.driver.execute_cdp_cmd('Browser.setDownloadBehavior', behavior)
+        except Exception:
+            return False
+        entry.download_dir = download_dir
+        return True
+
+    def reset(self, entry):
+        """Leave one tab on a blank page so the next get() loads the app from scratch"""
+        driver = entry.driver
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get('about:blank')
+            return True
+        except Exception:
+            return False
+
+    def rss(self, entry):
+        """Memory of the chromedriver process and the browser it started"""
+        service = getattr(entry.driver, 'service', None)
+        process = getattr(service, 'process', None)
+        if process is None:
+            return None
+        return process_tree_rss(process.pid)
+
+    def retire(self, entry, reason=None):
+        if reason:
+            print(f"♻️ Recycling browser: {reason}")
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass  # already gone
+        with self.lock:
+            self.retired += 1
+
+    def close(self):
+        """Quit every idle session (sessions still lent out are retired on release)"""
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for entry in idle:
+            self.retire(entry)
@@ -0,0 +1,245 @@
+"""
+Direct HTTP export client for EUIPO eSearch
+
+Replays the request the eSearch UI makes when "Export XLSX" is clicked,
+using one pooled requests.Session so cookies and connections are reused
+across pages. The export body is streamed straight to disk.
+
+The export endpoint is not documented, so nothing here guesses it: every
+Selenium run records the export request Chrome actually sent (see
+record_export_request) and the client replays that recording with the
+page number and publication date swapped in. Until a recording exists the
+client raises ExportError and the scraper uses Selenium.
+
+Point base_url at esearch_standin.py, which serves recorded page exports,
+to test without hitting EUIPO.
+"""
+
+import os
+import json
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qsl
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from download_watcher import has_excel_signature
+
+DEFAULT_BASE_URL = "https://euipo.europa.eu"
+
+# Landing page - visiting it sets the session cookies the export needs
+LANDING_PATH = "/eSearch/"
+
+RECORDING_FILENAME = 'esearch_export_request.json'
+
+EXCEL_MIME_TYPES = (
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+)
+
+# Formats the publication date may take inside the export request
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%Y%m%d')
+
+# Headers requests sets itself, or that belong to the recorded session
+SKIPPED_HEADERS = ('content-length', 'host', 'cookie', 'accept-encoding', 'connection')
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class ExportError(Exception):
+    """The HTTP export failed and the caller should fall back to Selenium"""
+
+
+def header(headers, name):
+    """Case-insensitive header lookup in a CDP headers dict"""
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return ''
+
+
+def is_export_response(mime_type, headers):
+    """True if a response's MIME type or Content-Disposition marks it as a spreadsheet export"""
+    if (mime_type or '').split(';')[0].strip().lower() in EXCEL_MIME_TYPES:
+        return True
+    disposition = header(headers, 'content-disposition').lower()
+    return 'attachment' in disposition and '.xls' in disposition
+
+
+def find_export_request(events):
+    """The Request (CDP Network.Request dict) behind the export response in a page's Network events, or None"""
+    requests_by_id = {}
+    for method, params in events:
+        if method == 'Network.requestWillBeSent':
+            requests_by_id[params.get('requestId')] = params.get('request', {})
+        elif method == 'Network.responseReceived':
+            response = params.get('response', {})
+            if is_export_response(response.get('mimeType'), response.get('headers')):
+                request = requests_by_id.get(params.get('requestId'))
+                if request and request.get('url', '').startswith('http'):
+                    return request
+    return None
+
+
+def record_export_request(path, request, page_number, date):
+    """Store the export request seen for page_number of date; returns True if the file changed
+
+    A recording from a later page replaces one from page 1, where the page
+    number is too easily confused with other parameters.
+    """
+    recording = {
+        'url': request['url'],
+        'method': request.get('method', 'GET'),
+        'headers': {key: value for key, value in (request.get('headers') or {}).items()
+                    if not key.startswith(':') and key.lower() not in SKIPPED_HEADERS},
+        'post_data': request.get('postData'),
+        'page': page_number,
+        'date': date.strftime('%Y%m%d'),
+    }
+    existing = load_recording(path)
+    if existing:
+        if existing['page'] > 1 and page_number == 1:
+            return False
+        if {k: existing.get(k) for k in recording} == recording:
+            return False
+    recording['recorded_at'] = datetime.now().isoformat()
+    tmp_path = f'{path}.{os.getpid()}.{id(recording)}.tmp'  # parallel workers may record at once
+    with open(tmp_path, 'w') as f:
+        json.dump(recording, f, indent=2)
+    os.replace(tmp_path, path)
+    return True
+
+
+def load_recording(path):
+    """A stored export request, or None"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def substitute(fields, recording, page_number, date):
+    """Copy of [(name, value)] with the recorded page number and date replaced"""
+    page_fields = [i for i, (_, value) in enumerate(fields) if value == str(recording['page'])]
+    if len(page_fields) != 1 and page_number != recording['page']:
+        raise ExportError("cannot tell which field of the recorded export request is the page number "
+                          f"(recorded on page {recording['page']})")
+    recorded_date = datetime.strptime(recording['date'], '%Y%m%d')
+    result = []
+    for i, (name, value) in enumerate(fields):
+        if i in page_fields:
+            value = str(page_number)
+        elif isinstance(value, str):
+            for date_format in DATE_FORMATS:
+                value = value.replace(recorded_date.strftime(date_format), date.strftime(date_format))
+        result.append((name, value))
+    return result
+
+
+class ESearchHttpClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, landing_path=LANDING_PATH, recording_path=None,
+                 timeout=60, pool_size=4, results_per_page=100):
+        """Create a pooled session; nothing is fetched until the first export
+
+        recording_path is the file record_export_request writes; it is read
+        on every export, so a recording made by a Selenium fallback is picked
+        up by the next run.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.landing_path = landing_path
+        self.recording_path = recording_path
+        self.timeout = timeout
+        self.results_per_page = results_per_page
+        self.primed = False
+
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'application/vnd.ms-excel, application/vnd.openxmlformats-officedocument.spreadsheetml.sheet, */*',
+        })
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+    def prime(self):
+        """Visit the landing page once to pick up session cookies"""
+        try:
+            response = self.session.get(self.base_url + self.landing_path, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise ExportError(f"Could not open eSearch session: {e}")
+        self.primed = True
+
+    def build_export_request(self, page_number, date):
+        """requests.request keyword arguments for one page, from the recorded export request"""
+        recording = load_recording(self.recording_path)
+        if recording is None:
+            raise ExportError("no recorded export request yet - a Selenium run records one")
+
+        url = urlsplit(recording['url'])
+        query = substitute(parse_qsl(url.query, keep_blank_values=True), recording, page_number, date)
+        kwargs = {
+            'method': recording['method'],
+            'url': self.base_url + url.path,
+            'params': query,
+            'headers': recording['headers'],
+        }
+        post_data = recording.get('post_data')
+        if post_data:
+            content_type = header(recording['headers'], 'content-type')
+            if 'json' in content_type:
+                body = json.loads(post_data)
+                if not isinstance(body, dict):
+                    raise ExportError("recorded export request has a JSON body the client cannot replay")
+                fields = substitute(list(body.items()), recording, page_number, date)
+                kwargs['data'] = json.dumps(dict(fields))
+            elif 'x-www-form-urlencoded' in content_type:
+                kwargs['data'] = substitute(parse_qsl(post_data, keep_blank_values=True),
+                                            recording, page_number, date)
+            else:
+                raise ExportError(f"recorded export request has a {content_type or 'raw'} body "
+                                  "the client cannot replay")
+        return kwargs
+
+    def export_page(self, page_number, date, dest_path):
+        """Stream one page's export to dest_path
+
+        Returns dest_path, or None when the page has no results.
+        Raises ExportError on anything that needs the browser fallback.
+        """
+        request = self.build_export_request(page_number, date)
+        if not self.primed:
+            self.prime()
+
+        partial_path = dest_path + '.part'
+        try:
+            with self.session.request(**request, stream=True, timeout=self.timeout) as response:
+                if response.status_code in (204, 404):
+                    return None
+                response.raise_for_status()
+                with open(partial_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+        except requests.RequestException as e:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            # Session may have expired - re-prime on the next call
+            self.primed = False
+            raise ExportError(f"Export request failed for page {page_number}: {e}")
+
+        if not has_excel_signature(partial_path):
+            os.remove(partial_path)
+            self.primed = False
+            raise ExportError(f"Export for page {page_number} is not an Excel file")
+
+        os.replace(partial_path, dest_path)
+        return dest_path
@@ -0,0 +1,171 @@
+"""
+Local stand-in for eSearch that serves recorded page exports
+
+Lets the HTTP backend (esearch_http.py) run end to end without EUIPO:
+
+    python esearch_standin.py data/20251210 --recording downloads/esearch_export_request.json
+    python eu_trademark_scraper.py --backend http --esearch-url http://127.0.0.1:8765 --dates 20251210
+
+The landing page sets a session cookie. The export path and the name of
+the page field come from the recorded export request; page N gets the
+recorded export *_page_NNN.xlsx from the directory, and pages past the last
+one get a header-only sheet (or 404 with --past-end 404). Exports without
+the session cookie get 403.
+"""
+
+import os
+import glob
+import json
+import argparse
+import threading
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+from esearch_http import LANDING_PATH, header, load_recording
+from trademark_schema import EXPECTED_COLUMNS
+
+SESSION_COOKIE = 'JSESSIONID'
+
+
+def page_field(recording):
+    """(where, name) of the page number in a recorded request: where is 'query', 'form' or 'json'"""
+    page = str(recording['page'])
+    for name, value in parse_qsl(urlsplit(recording['url']).query, keep_blank_values=True):
+        if value == page:
+            return 'query', name
+    post_data = recording.get('post_data') or ''
+    if 'json' in header(recording['headers'], 'content-type'):
+        for name, value in json.loads(post_data).items():
+            if str(value) == page:
+                return 'json', name
+    for name, value in parse_qsl(post_data, keep_blank_values=True):
+        if value == page:
+            return 'form', name
+    raise ValueError(f"no field of the recorded request holds its page number ({page})")
+
+
+def empty_export():
+    """An export with the title and header rows but no marks"""
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Search results'])
+    sheet.append(EXPECTED_COLUMNS)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+class StandIn:
+    def __init__(self, pages_dir, recording, host='127.0.0.1', port=0, past_end='empty'):
+        """Serve the page exports in pages_dir for requests shaped like recording (a dict)"""
+        self.pages = {}
+        for path in glob.glob(os.path.join(pages_dir, '*_page_*.xls*')):
+            self.pages[int(path.rsplit('_page_', 1)[1].split('.')[0])] = path
+        self.export_path = urlsplit(recording['url']).path
+        self.page_where, self.page_name = page_field(recording)
+        self.past_end = past_end
+        self.requests = []      # (method, path, page or None) of every request served
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def requested_page(self, query, body):
+        """Page number asked for, or None if the request does not carry one"""
+        if self.page_where == 'query':
+            fields = dict(parse_qsl(query, keep_blank_values=True))
+        elif self.page_where == 'json':
+            fields = json.loads(body or b'{}')
+        else:
+            fields = dict(parse_qsl(body.decode(), keep_blank_values=True))
+        try:
+            return int(fields[self.page_name])
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    def handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.respond()
+
+            def do_POST(self):
+                self.respond()
+
+            def respond(self):
+                url = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                page = None
+                if url.path == LANDING_PATH:
+                    self.send(200, b'<html><body>eSearch stand-in</body></html>', 'text/html',
+                              {'Set-Cookie': f'{SESSION_COOKIE}=standin; Path=/'})
+                elif url.path != standin.export_path:
+                    self.send(404, b'not found', 'text/plain')
+                elif f'{SESSION_COOKIE}=' not in (self.headers.get('Cookie') or ''):
+                    self.send(403, b'no session', 'text/plain')
+                else:
+                    page = standin.requested_page(url.query, body)
+                    if page is None:
+                        self.send(400, b'no page number', 'text/plain')
+                    elif page in standin.pages:
+                        with open(standin.pages[page], 'rb') as f:
+                            self.send(200, f.read(), 'application/vnd.ms-excel')
+                    elif standin.past_end == '404':
+                        self.send(404, b'no such page', 'text/plain')
+                    else:
+                        self.send(200, empty_export(),
+                                  'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                with standin.lock:
+                    standin.requests.append((self.command, url.path, page))
+
+            def send(self, status, body, content_type, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve recorded eSearch page exports locally')
+    parser.add_argument('pages_dir', help='Folder of recorded exports named *_page_NNN.xlsx')
+    parser.add_argument('--recording', default=os.path.join('downloads', 'esearch_export_request.json'),
+                        help='Export request recorded by a Selenium run')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--past-end', choices=['empty', '404'], default='empty',
+                        help='Answer for pages after the last recorded one')
+    args = parser.parse_args()
+
+    recording = load_recording(args.recording)
+    if recording is None:
+        parser.error(f"no recorded export request at {args.recording} - run the Selenium scraper once")
+    with StandIn(args.pages_dir, recording, port=args.port, past_end=args.past_end) as standin:
+        print(f"🧪 eSearch stand-in serving {len(standin.pages)} pages at {standin.url}")
+        try:
+            standin.thread.join()
+        except KeyboardInterrupt:
+            pass
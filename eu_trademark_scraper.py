@@ -1,4 +1,7 @@
 import os
+import re
+import copy
+import math
 import time
 import pandas as pd
 from datetime import datetime
@@ -7,39 +10,259 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException
 import glob
 import shutil
 import json  # ADD THIS LINE!
+import hashlib
+import tempfile
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from download_watcher import DownloadWatcher
+from driver_pool import DriverPool
+import export_capture
+from request_policy import RequestPolicy, RESOURCE_TYPES, DEFAULT_ALLOW, NetworkLog, summarize_traffic
+from esearch_http import (ESearchHttpClient, ExportError, RECORDING_FILENAME, find_export_request,
+                          record_export_request)
+from scrape_checkpoint import ScrapeCheckpoint
+from scrape_timing import Timings
+from trademark_schema import EXPECTED_COLUMNS
+import parquet_store
+import search_index
+import name_index
+import image_store
+import image_hash
+from warehouse import Warehouse, DATABASE_FILENAME
+from watch_list import WatchList, WatchScanner, WATCHLIST_FILENAME, REPORT_FILENAME
+import biff_reader
+from streaming_merge import JsonArrayWriter, XlsxRowWriter, compact_key
+
+# eSearch always returns 100 results per page (see build_url)
+RESULTS_PER_PAGE = 100
+
+# Page controls the readiness waits look for
+HIT_LIST_SELECTOR = '.hit-list-item, .no-results'
+SELECT_ALL_SELECTORS = [
+    (By.XPATH, '/html/body/div[1]/div/div/div/section[2]/div/div/div/div[4]/div[1]/div[3]/label/span'),
+    (By.XPATH, '/html/body/div[1]/div/div/div/section[2]/div/div/div/div[4]/div[1]/div[3]/label'),
+    (By.ID, 'selectAll_view145_top'),
+    (By.CSS_SELECTOR, 'input[name="selectAll"]'),
+]
+SELECT_ALL_CHECKBOX_SELECTOR = '#selectAll_view145_top, input[name="selectAll"]'
+EXPORT_BUTTON_SELECTOR = 'a.btn.exportXLSX'
+
+
+class PageScrapeError(Exception):
+    """A page failed for a transient reason (browser crash, timeout, missing download)
+
+    Distinct from the end of results, which scrape_page reports by returning None.
+    """
+
+
+class NoPagesLoaded(Exception):
+    """Not one page of a merge could be read, so every output is left as it was"""
+
+
+def read_page_file(file):
+    """Read one page export, keeping only trademark rows and the standard columns"""
+    # The native reader only decodes the standard columns (skipping the
+    # search criteria columns and embedded images); header is in row 2
+    try:
+        df = biff_reader.read_page(file, EXPECTED_COLUMNS, header_row=1)
+    except Exception as e:
+        # Anything the native reader cannot decode still gets pandas' chance;
+        # other formats were already read by pandas inside read_page
+        if biff_reader.sniff_format(file) != 'biff':
+            raise
+        if not isinstance(e, biff_reader.BiffFormatError):
+            print(f"⚠️ Native reader failed on {os.path.basename(file)} ({type(e).__name__}: {e}) - using pandas")
+        df = pd.read_excel(file, header=1)  # Header is in row 2 (index 1)
+        valid_cols = [col for col in df.columns if any(exp in str(col) for exp in EXPECTED_COLUMNS)]
+        df = df[valid_cols]
+    
+    # Remove the metadata rows at the top
+    # The actual data starts after the header row
+    return df[df['Filing number'].notna()]  # Remove rows where Filing number is NaN
+
+
+def parse_page_for_pool(file):
+    """Process-pool task: parse a page and return (arrow_ipc_bytes_or_df, error)
+
+    Frames travel back as Arrow IPC buffers, which are much cheaper to send
+    between processes than pickled DataFrames. Falls back to the DataFrame
+    when pyarrow is missing or cannot type a column.
+    """
+    try:
+        df = read_page_file(file)
+    except Exception as e:
+        return None, str(e)
+    
+    if not parquet_store.is_available():
+        return df, None
+    try:
+        table = parquet_store.pa.Table.from_pandas(df, preserve_index=False)
+        sink = parquet_store.pa.BufferOutputStream()
+        with parquet_store.pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), None
+    except (parquet_store.pa.ArrowInvalid, parquet_store.pa.ArrowTypeError):
+        return df, None
+
+
+def frame_from_pool(payload):
+    """Turn a parse_page_for_pool payload back into a DataFrame"""
+    if isinstance(payload, bytes):
+        return parquet_store.pa.ipc.open_stream(payload).read_all().to_pandas()
+    return payload
+
+
+def iter_page_frames(excel_files, workers=1):
+    """Yield (file, df, error) in input order, parsing across processes if workers > 1"""
+    if workers <= 1:
+        for file in excel_files:
+            try:
+                yield file, read_page_file(file), None
+            except Exception as e:
+                yield file, None, str(e)
+        return
+    
+    # Keep a bounded window of pages in flight so streaming merges stay flat
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        files = iter(excel_files)
+        for file in files:
+            pending.append((file, pool.submit(parse_page_for_pool, file)))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            file, future = pending.popleft()
+            payload, error = future.result()
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append((next_file, pool.submit(parse_page_for_pool, next_file)))
+            yield file, (frame_from_pool(payload) if error is None else None), error
 
 
 class EUTrademarkScraper:
-    def __init__(self, download_dir=None, headless=True):
-        """Initialize the scraper with Chrome WebDriver"""
-        # Use Mac's default Downloads folder for Chrome downloads
-        self.temp_download_dir = os.path.expanduser('~/Downloads')
+    def __init__(self, download_dir=None, headless=True, temp_download_dir=None, wait_timeout=30,
+                 backend='selenium', http_client=None, metrics_textfile=None, driver_pool=None,
+                 request_policy=None, capture_exports=False):
+        """Initialize the scraper with Chrome WebDriver
+        
+        backend='http' exports pages with a pooled HTTP session first and only
+        starts Chrome if that fails. It replays the export request recorded
+        by an earlier Selenium run (downloads/esearch_export_request.json), so
+        the first run always goes through Chrome. metrics_textfile, if given, receives each
+        run's phase timings in Prometheus text format.
+        
+        Chrome sessions come from driver_pool (a DriverPool of warm sessions,
+        created on first use if not given) and stay alive across runs until
+        close() - use the scraper as a context manager to scrape many dates.
+        A driver_pool passed in is left open for its owner to close.
+        
+        request_policy (a RequestPolicy) decides which resource types Chrome
+        may load; the default blocks images, fonts, media and analytics.
+        
+        capture_exports=True intercepts each export response in Chrome and
+        streams its body to the page path, with downloads denied (see
+        export_capture.py), instead of going through a download folder.
+        """
+        self.headless = headless
+        self.request_policy = request_policy or RequestPolicy()
+        self.capture_exports = capture_exports
+        if capture_exports and not export_capture.is_available():
+            print("⚠️ websocket-client not installed - exports go through the download folder")
+            self.capture_exports = False
+        
+        # Upper bound (seconds) for each readiness wait in scrape_page
+        self.wait_timeout = wait_timeout
         
         # Project downloads folder for final files
         self.project_dir = os.getcwd()
         self.download_dir = download_dir or os.path.join(self.project_dir, 'downloads')
         os.makedirs(self.download_dir, exist_ok=True)
         
-        # Setup Chrome options
-        self.chrome_options = Options()
-        if headless:
-            self.chrome_options.add_argument('--headless')
-        self.chrome_options.add_argument('--no-sandbox')
-        self.chrome_options.add_argument('--disable-dev-shm-usage')
+        # Export request seen by Selenium, replayed by the HTTP backend
+        self.export_recording_path = os.path.join(self.download_dir, RECORDING_FILENAME)
+        self.http_client = None
+        if backend == 'http':
+            self.http_client = http_client or ESearchHttpClient(results_per_page=RESULTS_PER_PAGE)
+            if self.http_client.recording_path is None:
+                self.http_client.recording_path = self.export_recording_path
+        
+        # Chrome downloads into a private per-run folder so nothing else
+        # (other runs, other browser downloads) can be mistaken for our export
+        self.owns_temp_download_dir = temp_download_dir is None
+        self.temp_download_dir = temp_download_dir or tempfile.mkdtemp(prefix='.incoming_', dir=self.download_dir)
+        
+        self.chrome_options = self.build_chrome_options(self.temp_download_dir)
+        # A pool passed in may be shared with other scrapers, so only close our own
+        self.owns_driver_pool = driver_pool is None
+        self.driver_pool = driver_pool or DriverPool(self.start_driver)
+        
+        # Result count of the current date, read from page 1 when available
+        self.total_results = None
+        self.checkpoint = None
+        # Phase timings, drained by each timing report; workers share it (see make_worker)
+        self.timings = Timings()
+        self.worker_id = None
+        self.metrics_textfile = metrics_textfile
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        """Quit the pooled Chrome sessions (if this scraper created the pool) and remove the private download folder"""
+        if self.owns_driver_pool:
+            self.driver_pool.close()
+        self.cleanup_temp_download_dir()
+    
+    def start_driver(self, download_dir):
+        """Start a Chrome session downloading into download_dir, or denying downloads if None (the pool's factory)"""
+        with self.timings.span('start_browser'):
+            driver = webdriver.Chrome(options=self.build_chrome_options(download_dir))
+            # Blocked URL patterns stay on the tab the pool keeps reusing
+            self.request_policy.apply(driver)
+            if download_dir is None:
+                try:
+                    export_capture.prepare_session(driver)
+                except Exception:
+                    driver.quit()
+                    raise
+            return driver
+    
+    def pooled_driver(self):
+        """Borrow a warm session downloading into this scraper's folder, for one page"""
+        return self.driver_pool.driver(None if self.capture_exports else self.temp_download_dir)
+    
+    def build_chrome_options(self, temp_download_dir):
+        """Build Chrome options that download into temp_download_dir (if not None)"""
+        chrome_options = Options()
+        if self.headless:
+            chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
         
         # Configure download directory
         prefs = {
-            'download.default_directory': self.temp_download_dir,
             'download.prompt_for_download': False,
             'download.directory_upgrade': True,
             'safebrowsing.enabled': True,
-            'safebrowsing.disable_download_protection': True
+            'safebrowsing.disable_download_protection': True,
+            **self.request_policy.chrome_prefs()
         }
-        self.chrome_options.add_experimental_option('prefs', prefs)
-        self.chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
+        if temp_download_dir is not None:
+            prefs['download.default_directory'] = temp_download_dir
+        chrome_options.add_experimental_option('prefs', prefs)
+        # Network events for the per-page byte counts (see report_page_traffic)
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
+        return chrome_options
         
     def get_date_range(self, date=None):
         """Format date range for URL (default: today)"""
@@ -55,48 +278,80 @@ class EUTrademarkScraper:
         base_url = "https://euipo.europa.eu/eSearch/#advanced/trademarks"
         return f"{base_url}/{page_number}/100/n1=PublicationDate&v1={date_range}&o1=AND&sf=ApplicationNumber&so=asc"
     
-    def wait_for_download(self, timeout=30):
-        """Wait for download to complete - handles both .xls and .xlsx"""
-        print(f"Checking for download in: {self.temp_download_dir}")
+    def page_path(self, page_number):
+        """Final path for a page export in the project downloads folder"""
+        date_str = self.current_date.strftime('%Y%m%d')
+        return os.path.join(self.download_dir, f'eu_trademarks_{date_str}_page_{page_number:03d}.xlsx')
+    
+    def wait_until(self, driver, description, condition, timeout=None):
+        """Wait for condition and log how long it took; returns None on timeout"""
+        timeout = timeout or self.wait_timeout
+        start = time.time()
+        try:
+            result = WebDriverWait(driver, timeout, poll_frequency=0.2).until(condition)
+            print(f"⏱️ {description}: {time.time() - start:.2f}s")
+            return result
+        except TimeoutException:
+            print(f"⚠️ Timeout after {time.time() - start:.2f}s waiting for {description}")
+            return None
+    
+    def find_select_all(self, driver):
+        """Return the first select-all control on the page, or None"""
+        for by, selector in SELECT_ALL_SELECTORS:
+            elements = driver.find_elements(by, selector)
+            if elements:
+                return elements[0]
+        return None
+    
+    def is_select_all_checked(self, driver):
+        """True if the select-all checkbox is ticked"""
+        checkboxes = driver.find_elements(By.CSS_SELECTOR, SELECT_ALL_CHECKBOX_SELECTOR)
+        return any(box.is_selected() for box in checkboxes)
+    
+    def get_result_count(self, driver):
+        """Read the total number of search results from the loaded page"""
+        try:
+            count_text = driver.find_element(By.CLASS_NAME, "results-count").text
+        except:
+            return None
         
-        # Give it a moment to start downloading
-        time.sleep(2)
+        # e.g. "1,735 results" or "Showing 1 - 100 of 1.735" -> 1735
+        numbers = [int(re.sub(r'[^0-9]', '', n)) for n in re.findall(r'\d[\d,.\s]*', count_text)]
+        return max(numbers) if numbers else None
+    
+    def wait_for_download(self, timeout=30, watcher=None):
+        """Wait for download to complete - handles both .xls and .xlsx
         
-        # Look for Excel files (BOTH .xls and .xlsx)
-        end_time = time.time() + timeout
-        while time.time() < end_time:
-            # Get all Excel files - BOTH FORMATS
-            xls_files = glob.glob(os.path.join(self.temp_download_dir, '*.xls'))
-            xlsx_files = glob.glob(os.path.join(self.temp_download_dir, '*.xlsx'))
-            excel_files = xls_files + xlsx_files
-            
-            if excel_files:
-                # Get the newest file (just downloaded)
-                newest_file = max(excel_files, key=os.path.getmtime)
-                
-                # Check if it was modified recently (within last minute)
-                if time.time() - os.path.getmtime(newest_file) < 60:
-                    print(f"✅ Found download: {os.path.basename(newest_file)}")
-                    time.sleep(1)  # Ensure it's fully written
-                    return newest_file
-            
-            print("⏳ Waiting for download...")
-            time.sleep(1)
+        Pass a watcher created before the export click so its completion
+        event cannot be missed; otherwise any complete file counts.
+        """
+        print(f"Checking for download in: {self.temp_download_dir}")
         
-        # Final check
-        xls_files = glob.glob(os.path.join(self.temp_download_dir, '*.xls'))
-        xlsx_files = glob.glob(os.path.join(self.temp_download_dir, '*.xlsx'))
-        excel_files = xls_files + xlsx_files
+        own_watcher = watcher is None
+        if own_watcher:
+            watcher = DownloadWatcher(self.temp_download_dir, ignore_existing=False)
         
-        if excel_files:
-            newest_file = max(excel_files, key=os.path.getmtime)
-            if time.time() - os.path.getmtime(newest_file) < 60:
-                print(f"✅ Found download: {os.path.basename(newest_file)}")
-                return newest_file
+        start = time.time()
+        try:
+            with self.timings.span('download'):
+                downloaded_file = watcher.wait(timeout)
+        finally:
+            if own_watcher:
+                watcher.close()
+        
+        if downloaded_file:
+            print(f"✅ Found download: {os.path.basename(downloaded_file)} "
+                  f"({time.time() - start:.2f}s, {watcher.mode})")
+            return downloaded_file
         
         print("❌ No Excel file found (.xls or .xlsx)")
         return None
     
+    def cleanup_temp_download_dir(self):
+        """Remove the private download folder if this scraper created it"""
+        if self.owns_temp_download_dir:
+            shutil.rmtree(self.temp_download_dir, ignore_errors=True)
+    
     def clear_old_downloads(self):
         """Clear old Excel files from Downloads folder"""
         # Clear both .xls and .xlsx files
@@ -112,39 +367,75 @@ class EUTrademarkScraper:
                     pass
     
     def scrape_page(self, driver, page_number, date_range):
-        """Scrape a single page and download the Excel file"""
+        """Scrape a single page and download the Excel file
+        
+        Returns the saved path, or None when the page has no results (end of
+        results). Raises PageScrapeError for failures worth retrying.
+        """
         url = self.build_url(page_number, date_range)
         print(f"\n{'='*60}")
         print(f"📄 SCRAPING PAGE {page_number}")
         print(f"🔗 {url[:80]}...")
         print('='*60)
         
-        # CRITICAL: Close and reopen tab for each page after page 1
-        if page_number > 1:
-            print("Opening new tab for fresh page load...")
-            driver.execute_script("window.open('');")  # Open new tab
-            old_window = driver.current_window_handle
-            driver.switch_to.window(driver.window_handles[-1])  # Switch to new tab
-            driver.switch_to.window(old_window)  # Go back to old tab
-            driver.close()  # Close old tab
-            driver.switch_to.window(driver.window_handles[-1])  # Switch to new tab
-            time.sleep(2)
-        
-        # Navigate to the page
-        driver.get(url)
-        print("⏳ Waiting for page to load...")
-        time.sleep(10)
-        
+        with self.timings.span('scrape_page', root=True, page=page_number, worker=self.worker_id):
+            network_log = NetworkLog(driver)
+            try:
+                final_path = self.scrape_page_phases(driver, page_number, url, network_log)
+                if final_path and not self.capture_exports:  # a capture records its own request
+                    network_log.read()
+                    self.record_export_request(find_export_request(network_log.events), page_number)
+                return final_path
+            except Exception as e:
+                print(f"❌ Error on page {page_number}: {e}")
+                try:
+                    driver.save_screenshot(f'error_page_{page_number}.png')
+                except Exception:
+                    pass  # the browser itself may be gone
+                if isinstance(e, PageScrapeError):
+                    raise
+                raise PageScrapeError(str(e)) from e
+            finally:
+                self.report_page_traffic(network_log, page_number)
+    
+    def record_export_request(self, request, page_number):
+        """Keep the export request Chrome just sent (if seen), for the HTTP backend to replay"""
+        if request is None:
+            return
         try:
-            wait = WebDriverWait(driver, 30)
-            
-            # Wait for results
+            if record_export_request(self.export_recording_path, request, page_number, self.current_date):
+                print(f"🎙️ Recorded export request: {request.get('method', 'GET')} {request['url'][:80]}")
+        except OSError as e:
+            print(f"⚠️ Could not record export request: {e}")
+    
+    def report_page_traffic(self, network_log, page_number):
+        """Print the bytes this page pulled over the network and record them on its span"""
+        if not network_log.available:
+            return
+        network_log.read()
+        traffic = summarize_traffic(network_log.events)
+        self.timings.annotate(bytes=traffic['bytes'], requests=traffic['requests'],
+                              blocked=traffic['blocked'])
+        heaviest = sorted(traffic['by_type'].items(), key=lambda item: -item[1])[:3]
+        print(f"📦 Page {page_number}: {traffic['bytes'] / 1024:.0f} KB in {traffic['requests']} requests, "
+              f"{traffic['blocked']} blocked"
+              + (f" ({', '.join(f'{t} {b / 1024:.0f} KB' for t, b in heaviest)})" if heaviest else ''))
+    
+    def scrape_page_phases(self, driver, page_number, url, network_log):
+        """The steps of scrape_page, each timed as its own span"""
+        span = self.timings.span
+        
+        # Navigate to the page (the pool hands the session over on about:blank,
+        # so this is always a full load of the app)
+        with span('navigate'):
+            driver.get(url)
+        
+        # Wait for the hit list (or the no-results banner) to render
+        with span('render'):
             print("🔍 Looking for results...")
-            try:
-                wait.until(lambda d: d.find_elements(By.CSS_SELECTOR, '.hit-list-item, .no-results, div[class*="result"]'))
+            if self.wait_until(driver, "hit list",
+                               EC.visibility_of_any_elements_located((By.CSS_SELECTOR, HIT_LIST_SELECTOR))):
                 print("✅ Page loaded")
-            except:
-                print("⚠️ Timeout waiting for results")
             
             # Check for no results
             try:
@@ -154,77 +445,91 @@ class EUTrademarkScraper:
                     return None
             except:
                 print("✅ Results found")
-            
-            time.sleep(5)  # Let JavaScript render
-            
-            # Click Select All
+        
+        # Click Select All
+        with span('select_all'):
             clicked = False
-            selectors = [
-                ('XPATH', '/html/body/div[1]/div/div/div/section[2]/div/div/div/div[4]/div[1]/div[3]/label/span'),
-                ('XPATH', '/html/body/div[1]/div/div/div/section[2]/div/div/div/div[4]/div[1]/div[3]/label'),
-                ('ID', 'selectAll_view145_top'),
-                ('CSS', 'input[name="selectAll"]'),
-            ]
-            
-            for selector_type, selector in selectors:
-                if clicked:
-                    break
+            element = self.wait_until(driver, "select-all control", self.find_select_all)
+            if element is not None:
+                was_checked = self.is_select_all_checked(driver)
                 try:
-                    if selector_type == 'XPATH':
-                        element = driver.find_element(By.XPATH, selector)
-                    elif selector_type == 'ID':
-                        element = driver.find_element(By.ID, selector)
-                    else:
-                        element = driver.find_element(By.CSS_SELECTOR, selector)
-                    
                     driver.execute_script("arguments[0].click();", element)
                     clicked = True
                     print(f"✅ Selected all items")
-                    break
                 except:
-                    continue
+                    pass
             
             if not clicked:
                 print("⚠️ Could not select all - trying export anyway")
-            
-            time.sleep(3)
-            
-            # Clear old downloads
-            self.clear_old_downloads()
+            elif driver.find_elements(By.CSS_SELECTOR, SELECT_ALL_CHECKBOX_SELECTOR):
+                self.wait_until(driver, "select-all checked",
+                                lambda d: self.is_select_all_checked(d) != was_checked)
+        
+        with span('export_ready'):
+            # Clear old downloads (captured exports never reach the folder)
+            if not self.capture_exports:
+                self.clear_old_downloads()
             
             # Click Export
-            try:
-                export_button = driver.find_element(By.CSS_SELECTOR, 'a.btn.exportXLSX')
-                driver.execute_script("arguments[0].click();", export_button)
-                print("✅ Export clicked")
-            except Exception as e:
-                print(f"❌ Could not click export: {e}")
-                return None
+            export_button = self.wait_until(driver, "export button",
+                                            EC.element_to_be_clickable((By.CSS_SELECTOR, EXPORT_BUTTON_SELECTOR)))
+            if export_button is None:
+                raise PageScrapeError("export button never became clickable")
+        
+        if self.capture_exports:
+            return self.capture_export(driver, export_button, page_number)
+        
+        # Start watching before the click so the download cannot slip past
+        with DownloadWatcher(self.temp_download_dir) as watcher:
+            with span('export_click'):
+                self.click_export(driver, export_button)
             
             # Wait for download
-            downloaded_file = self.wait_for_download(timeout=60)
-            
-            if downloaded_file:
-                # Create unique filename with date and page
-                date_str = self.current_date.strftime('%Y%m%d')
-                unique_filename = f'eu_trademarks_{date_str}_page_{page_number:03d}.xlsx'
-                final_path = os.path.join(self.download_dir, unique_filename)
-                
-                # Move file to project downloads folder
-                shutil.move(downloaded_file, final_path)
-                print(f"💾 Saved as: {unique_filename}")
-                return final_path
-            else:
-                print(f"❌ Download failed for page {page_number}")
-                return None
-                
+            downloaded_file = self.wait_for_download(timeout=60, watcher=watcher)
+        
+        if not downloaded_file:
+            raise PageScrapeError("download did not arrive")
+        
+        # Create unique filename with date and page, then move it to the project downloads folder
+        final_path = self.page_path(page_number)
+        with span('move'):
+            shutil.move(downloaded_file, final_path)
+        print(f"💾 Saved as: {os.path.basename(final_path)}")
+        return final_path
+    
+    def click_export(self, driver, export_button):
+        """Click Export through JS (overlays cannot intercept it)"""
+        try:
+            driver.execute_script("arguments[0].click();", export_button)
+            print("✅ Export clicked")
         except Exception as e:
-            print(f"❌ Error on page {page_number}: {e}")
-            driver.save_screenshot(f'error_page_{page_number}.png')
-            return None
+            raise PageScrapeError(f"could not click export: {e}")
     
-    def merge_excel_files(self, excel_files, output_file='merged_trademarks.xlsx'):
-        """Merge multiple Excel files into one"""
+    def capture_export(self, driver, export_button, page_number):
+        """Click Export and stream the intercepted response to the page path, skipping the download folder"""
+        final_path = self.page_path(page_number)
+        try:
+            # Interception starts before the click so the response cannot slip past
+            with export_capture.ExportCapture(driver, timeout=60) as capture:
+                with self.timings.span('export_click'):
+                    self.click_export(driver, export_button)
+                with self.timings.span('capture'):
+                    size = capture.save(final_path)
+        except export_capture.CaptureError as e:
+            raise PageScrapeError(f"export capture failed: {e}")
+        if size is None:
+            raise PageScrapeError("export response never arrived")
+        print(f"💾 Saved as: {os.path.basename(final_path)} ({size / 1024:.0f} KB intercepted)")
+        self.record_export_request(capture.request, page_number)
+        return final_path
+    
+    def merge_excel_files(self, excel_files, output_file='merged_trademarks.xlsx', streaming=False, workers=1):
+        """Merge multiple Excel files into one
+        
+        streaming=True reads one page at a time and appends it to the outputs,
+        so memory stays flat however many pages (or days) are merged.
+        workers > 1 parses pages in a process pool; page order is preserved.
+        """
         if not excel_files:
             print("No Excel files to merge")
             return None
@@ -233,150 +538,707 @@ class EUTrademarkScraper:
         print("📊 MERGING FILES...")
         print('='*60)
         
+        try:
+            with self.timings.span('merge', root=True, pages=len(excel_files)):
+                with self.timings.span('images'):
+                    image_refs = self.ingest_images(excel_files)
+                if streaming:
+                    return self.merge_excel_files_streaming(excel_files, workers, image_refs)
+                return self.merge_excel_files_in_memory(excel_files, workers, image_refs)
+        finally:
+            # A merge inside a larger timed run is reported with that run
+            if not self.timings.stack():
+                self.write_timing_report()
+    
+    def ingest_images(self, excel_files):
+        """Store the pages' mark images and hash new ones; returns {filing number: image ref}"""
+        data_root = os.path.join(self.project_dir, 'data')
+        image_refs = image_store.ingest_pages(excel_files, data_root, self.date_data_dir())
+        # Nothing ingested (unreadable pages): keep the day's indexed images
+        if image_refs:
+            with self.timings.span('image_hash'):
+                image_hash.update_index(data_root, self.current_date.strftime('%Y%m%d'), image_refs)
+        return image_refs
+    
+    def merge_excel_files_in_memory(self, excel_files, workers=1, image_refs=None):
+        """Merge all pages as one DataFrame, timing each output"""
+        span = self.timings.span
         dfs = []
-        for i, file in enumerate(excel_files):
-            try:
-                # Read the Excel file
-                df = pd.read_excel(file, header=1)  # Header is in row 2 (index 1)
-                
-                # Remove the metadata rows at the top
-                # The actual data starts after the header row
-                df = df[df['Filing number'].notna()]  # Remove rows where Filing number is NaN
-                
-                # Remove the search criteria columns (usually last 2-3 columns)
-                # Keep only the standard columns
-                expected_columns = [
-                    'Filing number', 'Graphic representation', 'Name', 'Basis', 'Type',
-                    'Application reference', 'Filing date/ Designation date', 
-                    'Registration date', 'Expiry date', 'Nice classes', 'Status',
-                    'Publications', 'Owner name', 'Owner ID', 'Owner country',
-                    'Representative name', 'Representative ID', 'Filing language',
-                    'Second language', 'Kind of mark', 'Acquired distinctiveness'
-                ]
-                
-                # Keep only columns that match expected names
-                valid_cols = [col for col in df.columns if any(exp in str(col) for exp in expected_columns)]
-                df = df[valid_cols]
-                
+        with span('read'):
+            for file, df, error in iter_page_frames(excel_files, workers):
+                if error:
+                    print(f"❌ Error reading {file}: {error}")
+                    continue
                 dfs.append(df)
                 print(f"✅ Loaded {os.path.basename(file)}: {len(df)} rows")
-            except Exception as e:
-                print(f"❌ Error reading {file}: {e}")
         
         if dfs:
-            # Concatenate all dataframes
-            merged_df = pd.concat(dfs, ignore_index=True)
-            
-            # Remove duplicates based on Filing number
-            merged_df = merged_df.drop_duplicates(subset=['Filing number'], keep='first')
-            
-            # Create data directory if it doesn't exist
-            data_dir = os.path.join(self.project_dir, 'data')
-            os.makedirs(data_dir, exist_ok=True)
+            with span('concat'):
+                # Concatenate all dataframes
+                merged_df = pd.concat(dfs, ignore_index=True)
+                
+                # Remove duplicates based on Filing number
+                merged_df = merged_df.drop_duplicates(subset=['Filing number'], keep='first')
+                if image_refs is not None:
+                    merged_df = image_store.attach_refs(merged_df, image_refs)
             
-            # Save with date in filename to data folder
-            date_str = self.current_date.strftime('%Y%m%d')
-            output_file = f'eu_trademarks_{date_str}.xlsx'
-            output_path = os.path.join(data_dir, output_file)
+            output_path = self.merged_output_path()
+            output_file = os.path.basename(output_path)
+            data_dir = os.path.dirname(output_path)
             
             # Save with proper formatting
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                merged_df.to_excel(writer, index=False, sheet_name='Trademarks')
+            with span('xlsx'):
+                with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+                    merged_df.to_excel(writer, index=False, sheet_name='Trademarks')
             
             print(f"\n🎉 Merged {len(dfs)} files → {output_file}")
             print(f"📊 Total unique records: {len(merged_df)}")
             
             # Also save as JSON in data folder
             json_path = output_path.replace('.xlsx', '.json')
-            merged_df.to_json(json_path, orient='records', date_format='iso')
+            with span('json'):
+                merged_df.to_json(json_path, orient='records', date_format='iso')
             print(f"📄 JSON saved: {os.path.basename(json_path)}")
             
+            # Typed, compressed Parquet partition for column-pruned reads
+            if parquet_store.is_available():
+                parquet_root = os.path.join(data_dir, 'parquet')
+                with span('parquet'):
+                    parquet_path = parquet_store.write_partition(merged_df, self.current_date, parquet_root)
+                print(f"🧱 Parquet saved: {os.path.relpath(parquet_path, data_dir)}")
+            else:
+                print("⚠️ pyarrow not installed - skipping Parquet output")
+            
+            # Fold the day into the cross-day name similarity index
+            with span('name_index'):
+                name_index.update_index(data_dir, self.current_date.strftime('%Y%m%d'), merged_df)
+            
+            scanner = self.watch_scanner()
+            if scanner:
+                with span('watch_list'):
+                    scanner.write(merged_df)
+                    scanner.close()
+            
+            # Upsert into the cross-day SQLite warehouse
+            with span('warehouse'):
+                with Warehouse(os.path.join(data_dir, DATABASE_FILENAME)) as warehouse:
+                    warehouse.load_day(merged_df, self.current_date)
+            
             return output_path
         
         return None
     
-    def scrape_all_pages(self, date=None, max_pages=100):
-        """Main method to scrape all pages for a given date"""
+    def merged_output_path(self):
+        """data/eu_trademarks_YYYYMMDD.xlsx for the current date (creates data/)"""
+        # Create data directory if it doesn't exist
+        data_dir = os.path.join(self.project_dir, 'data')
+        os.makedirs(data_dir, exist_ok=True)
+        
+        # Save with date in filename to data folder
+        date_str = self.current_date.strftime('%Y%m%d')
+        return os.path.join(data_dir, f'eu_trademarks_{date_str}.xlsx')
+    
+    def merge_excel_files_streaming(self, excel_files, workers=1, image_refs=None):
+        """Merge page by page, de-duplicating on Filing number with a compact seen-set"""
+        output_path = self.merged_output_path()
+        data_dir = os.path.dirname(output_path)
+        json_path = output_path.replace('.xlsx', '.json')
+        
+        span = self.timings.span
+        
+        def finish(name, sink):
+            """Exit callback: close the sink after a clean merge, abort it after an error"""
+            def exit_sink(exc_type, exc, tb):
+                if exc_type is None:
+                    with span(f'{name}_close'):
+                        sink.close()
+                else:
+                    sink.abort()
+            return exit_sink
+        
+        seen = set()
+        columns = None
+        loaded = 0
+        total = 0
+        parquet_writer = None
+        # Sinks close in reverse order of creation, each on its own: the output
+        # files are moved into place first and the warehouse commits last, so a
+        # failure anywhere rolls the day back and leaves earlier outputs as they were
+        try:
+            with ExitStack() as stack:
+                warehouse = Warehouse(os.path.join(data_dir, DATABASE_FILENAME))
+                stack.callback(warehouse.close)
+                
+                # (span name, sink) - each sink's writes and close are timed separately
+                sinks = []
+                def add_sink(name, sink):
+                    stack.push(finish(name, sink))
+                    sinks.insert(0, (name, sink))
+                
+                add_sink('warehouse', warehouse.day_loader(self.current_date))
+                add_sink('name_index', name_index.NameIndexWriter(data_dir, self.current_date.strftime('%Y%m%d')))
+                scanner = self.watch_scanner()
+                if scanner:
+                    add_sink('watch_list', scanner)
+                if parquet_store.is_available():
+                    parquet_writer = parquet_store.PartitionWriter(os.path.join(data_dir, 'parquet'), self.current_date)
+                    add_sink('parquet', parquet_writer)
+                else:
+                    print("⚠️ pyarrow not installed - skipping Parquet output")
+                add_sink('json', JsonArrayWriter(json_path))
+                add_sink('xlsx', XlsxRowWriter(output_path))
+                
+                try:
+                    for file, df, error in self.timings.iterate('read', iter_page_frames(excel_files, workers)):
+                        if error:
+                            print(f"❌ Error reading {file}: {error}")
+                            continue
+                        
+                        # The first page fixes the column layout for every sink
+                        if columns is None:
+                            columns = list(df.columns)
+                        df = df.reindex(columns=columns)
+                        
+                        with span('dedupe'):
+                            keys = [compact_key(f) for f in df['Filing number']]
+                            keep = []
+                            for key in keys:
+                                keep.append(key not in seen)
+                                seen.add(key)
+                            df = df[keep]
+                        if image_refs is not None:
+                            df = image_store.attach_refs(df, image_refs)
+                        
+                        for name, sink in sinks:
+                            with span(name):
+                                sink.write(df)
+                        loaded += 1
+                        total += len(df)
+                        print(f"✅ Loaded {os.path.basename(file)}: {len(df)} new rows")
+                    # Abort rather than replace the day's outputs with empty ones
+                    if not loaded:
+                        raise NoPagesLoaded()
+                except NoPagesLoaded:
+                    raise
+                except BaseException:
+                    print(f"❌ Merge failed after {loaded} files - warehouse rolled back, partial outputs removed")
+                    raise
+        except NoPagesLoaded:
+            print("❌ No page could be read - the day's existing outputs are left as they were")
+            return None
+        
+        print(f"\n🎉 Merged {loaded} files → {os.path.basename(output_path)}")
+        print(f"📊 Total unique records: {total}")
+        print(f"📄 JSON saved: {os.path.basename(json_path)}")
+        if parquet_writer:
+            print(f"🧱 Parquet saved: {os.path.relpath(parquet_writer.path, data_dir)}")
+        return output_path
+    
+    def watch_scanner(self):
+        """WatchScanner writing data/YYYYMMDD/watch_report.json, or None without a watch list"""
+        watch_list = WatchList.load(os.path.join(self.project_dir, WATCHLIST_FILENAME))
+        if watch_list is None:
+            return None
+        report_path = os.path.join(self.date_data_dir(), REPORT_FILENAME)
+        return WatchScanner(watch_list, report_path, self.current_date.strftime('%Y%m%d'))
+    
+    def make_worker(self, worker_id):
+        """Clone this scraper with a private Chrome download directory"""
+        worker = copy.copy(self)
+        worker.worker_id = worker_id
+        worker.temp_download_dir = tempfile.mkdtemp(prefix=f'.worker_{worker_id}_', dir=self.download_dir)
+        worker.owns_temp_download_dir = True
+        return worker
+    
+    def scrape_page_range(self, pages, date_range):
+        """Scrape a list of pages on pooled sessions, returning {page_number: file_path}
+        
+        Stops at the first failure; the caller retries whatever is missing.
+        """
+        results = {}
+        try:
+            for page_num in pages:
+                try:
+                    with self.pooled_driver() as driver:
+                        file_path = self.scrape_page(driver, page_num, date_range)
+                except PageScrapeError as e:
+                    print(f"⚠️ Page {page_num} failed ({e}) - leaving the rest of this range for a retry")
+                    break
+                if not file_path:
+                    print(f"📍 No results on page {page_num}")
+                    break
+                results[page_num] = file_path
+                if self.checkpoint is not None:
+                    self.checkpoint.mark_done(page_num, file_path)
+                print(f"✅ Page {page_num} complete")
+        finally:
+            if self.worker_id is not None:
+                self.cleanup_temp_download_dir()
+        return results
+    
+    def record_result_count(self, driver, max_pages):
+        """Read the result count from the loaded page and fix the last page in the checkpoint"""
+        total_results = self.get_result_count(driver)
+        if total_results is None:
+            return None
+        self.total_results = total_results
+        last_page = min(max_pages, math.ceil(total_results / RESULTS_PER_PAGE))
+        self.checkpoint.set_total_results(total_results, last_page)
+        return last_page
+    
+    def scrape_pages_http(self, date_range, max_pages):
+        """Export unfinished pages over HTTP; returns True if Selenium is still needed
+        
+        The end of results is the first page with fewer than RESULTS_PER_PAGE
+        rows (which also gives the result count), an empty page, or a 204/404.
+        """
+        checkpoint = self.checkpoint
+        for page_num in range(1, max_pages + 1):
+            if checkpoint.end_page is not None and page_num > checkpoint.end_page:
+                return False
+            if checkpoint.is_done(page_num):
+                continue
+            file_path = None
+            try:
+                with self.timings.span('http_export', page=page_num):
+                    file_path = self.http_client.export_page(page_num, self.current_date, self.page_path(page_num))
+                    rows = len(read_page_file(file_path)) if file_path else 0
+            except ExportError as e:
+                print(f"⚠️ {e} - falling back to Selenium")
+                return True
+            except Exception as e:
+                print(f"⚠️ Unreadable HTTP export for page {page_num} ({e}) - falling back to Selenium")
+                if file_path and os.path.exists(file_path):
+                    os.remove(file_path)
+                return True
+            
+            if not rows:
+                if file_path:
+                    os.remove(file_path)
+                print(f"📍 Reached end at page {page_num - 1}")
+                checkpoint.mark_end(page_num - 1)
+                return False
+            checkpoint.mark_done(page_num, file_path)
+            print(f"⚡ Page {page_num} exported over HTTP ({rows} rows)")
+            if rows < RESULTS_PER_PAGE:
+                self.total_results = (page_num - 1) * RESULTS_PER_PAGE + rows
+                checkpoint.set_total_results(self.total_results, page_num)
+                print(f"📍 Last page: {page_num} ({self.total_results} results)")
+                return False
+        
+        if checkpoint.end_page is None:
+            checkpoint.mark_end(max_pages)
+        return False
+    
+    def scrape_pages_serial(self, date_range, max_pages):
+        """Walk pages one at a time until the end of results, skipping finished ones
+        
+        Raises PageScrapeError on a transient failure; the checkpoint keeps
+        everything done so far.
+        """
+        checkpoint = self.checkpoint
+        page_num = 1
+        while page_num <= (checkpoint.end_page if checkpoint.end_page is not None else max_pages):
+            if checkpoint.is_done(page_num):
+                page_num += 1
+                continue
+            
+            with self.pooled_driver() as driver:
+                file_path = self.scrape_page(driver, page_num, date_range)
+                if file_path and page_num == 1:
+                    self.record_result_count(driver, max_pages)
+            if not file_path:
+                if page_num > 1:
+                    print(f"📍 Reached end at page {page_num - 1}")
+                else:
+                    print("❌ No results for this date")
+                checkpoint.mark_end(page_num - 1)
+                return
+            
+            checkpoint.mark_done(page_num, file_path)
+            print(f"✅ Page {page_num} complete")
+            page_num += 1
+            if page_num <= max_pages:
+                time.sleep(2)
+        
+        if checkpoint.end_page is None:
+            checkpoint.mark_end(max_pages)
+    
+    def scrape_pages_parallel(self, date_range, max_pages, workers):
+        """Size the run from page 1's result count, then fan out the unfinished pages"""
+        checkpoint = self.checkpoint
+        if checkpoint.end_page is None:
+            with self.pooled_driver() as driver:
+                if checkpoint.is_done(1):
+                    self.probe_result_count(driver, date_range)
+                else:
+                    first_file = self.scrape_page(driver, 1, date_range)
+                    if not first_file:
+                        print("❌ No results for this date")
+                        checkpoint.mark_end(0)
+                        return
+                    checkpoint.mark_done(1, first_file)
+                    print("✅ Page 1 complete")
+                last_page = self.record_result_count(driver, max_pages)
+            
+            if last_page is None:
+                print("⚠️ Could not read result count - continuing serially")
+                return self.scrape_pages_serial(date_range, max_pages)
+        
+        last_page = checkpoint.end_page
+        remaining = [p for p in range(1, last_page + 1) if not checkpoint.is_done(p)]
+        print(f"📊 {checkpoint.total_results} results → {last_page} pages, "
+              f"{len(remaining)} to go across {workers} workers")
+        if not remaining:
+            return
+        
+        # Disjoint, contiguous page ranges - one per worker
+        workers = min(workers, len(remaining))
+        chunk_size = math.ceil(len(remaining) / workers)
+        chunks = [remaining[i:i + chunk_size] for i in range(0, len(remaining), chunk_size)]
+        
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            futures = []
+            for worker_id, pages in enumerate(chunks):
+                worker = self.make_worker(worker_id)
+                print(f"👷 Worker {worker_id}: pages {pages[0]}-{pages[-1]}")
+                futures.append(pool.submit(worker.scrape_page_range, pages, date_range))
+            for future in futures:
+                future.result()
+        
+        missing = [p for p in range(1, last_page + 1) if not checkpoint.is_done(p)]
+        if missing:
+            print(f"⚠️ Missing pages: {missing}")
+    
+    def run_scrape_attempt(self, date_range, max_pages, workers):
+        """One pass over every page not yet in the checkpoint"""
+        if self.http_client and not self.scrape_pages_http(date_range, max_pages):
+            return
+        
+        # Sessions come from the pool; a crashed one is replaced on the next checkout
+        if workers > 1:
+            self.scrape_pages_parallel(date_range, max_pages, workers)
+        else:
+            self.scrape_pages_serial(date_range, max_pages)
+    
+    def date_data_dir(self):
+        """data/YYYYMMDD/ for the current date"""
+        return os.path.join(self.project_dir, 'data', self.current_date.strftime('%Y%m%d'))
+    
+    def load_manifest(self):
+        """Stored manifest for the current date, or None"""
+        manifest_path = os.path.join(self.date_data_dir(), 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def describe_page_file(self, path):
+        """Size, SHA-256 and row count of a page file for the manifest"""
+        # The export embeds a timestamp, so also hash the rows themselves
+        try:
+            df = read_page_file(path)
+            rows = len(df)
+            content_hash = hashlib.sha256(df.to_json(orient='records').encode()).hexdigest()
+        except Exception:
+            rows = None
+            content_hash = None
+        
+        return {
+            'filename': os.path.basename(path),
+            'size': os.path.getsize(path),
+            'sha256': file_sha256(path),
+            'rows': rows,
+            'content_hash': content_hash
+        }
+    
+    def verify_stored_pages(self, manifest):
+        """{page_number: path} for manifest files still on disk with matching size and hash"""
+        data_dir = self.date_data_dir()
+        details = {d['filename']: d for d in manifest.get('file_details', [])}
+        intact = {}
+        for filename in manifest.get('files', []):
+            path = os.path.join(data_dir, filename)
+            detail = details.get(filename)
+            if not detail or not os.path.exists(path) or os.path.getsize(path) != detail['size']:
+                continue
+            if file_sha256(path) != detail['sha256']:
+                continue
+            intact[page_number_from_filename(filename)] = path
+        return intact
+    
+    def probe_result_count(self, driver, date_range):
+        """Load page 1 just far enough to read the live result count"""
+        driver.get(self.build_url(1, date_range))
+        self.wait_until(driver, "hit list",
+                        EC.visibility_of_any_elements_located((By.CSS_SELECTOR, HIT_LIST_SELECTOR)))
+        return self.get_result_count(driver)
+    
+    def scrape_incremental(self, date_range, max_pages):
+        """Seed the checkpoint with the stored pages that can be kept
+        
+        Missing or corrupt pages are left for the normal attempt loop, and so
+        is every page when the result count changed. Returns (kept pages as
+        {page_number: path}, up_to_date), or None when there is no usable
+        manifest and a full scrape is needed.
+        """
+        manifest = self.load_manifest()
+        if not manifest or 'file_details' not in manifest:
+            print("ℹ️ No manifest with file details - running a full scrape")
+            return None
+        
+        intact = self.verify_stored_pages(manifest)
+        with self.pooled_driver() as driver:
+            total_results = self.probe_result_count(driver, date_range)
+        if total_results is None:
+            print("⚠️ Could not read live result count - running a full scrape")
+            return None
+        
+        last_page = min(max_pages, math.ceil(total_results / RESULTS_PER_PAGE))
+        if total_results == manifest.get('total_results'):
+            kept = {p: path for p, path in intact.items() if p <= last_page}
+            print(f"📊 {total_results} results, unchanged - {len(intact)} pages intact")
+        else:
+            # Results are sorted by application number, so a changed count
+            # can shift any page - fetch them all and compare content hashes
+            kept = {}
+            print(f"📊 Result count changed ({manifest.get('total_results')} → {total_results})")
+        
+        if len(kept) == last_page and len(intact) == len(manifest.get('files', [])):
+            return kept, True
+        
+        if self.checkpoint.total_results not in (None, total_results):
+            print("♻️ Result count moved since the interrupted run - starting its checkpoint over")
+            self.checkpoint = ScrapeCheckpoint(self.checkpoint_path(), self.current_date.strftime('%Y%m%d'))
+        self.checkpoint.set_total_results(total_results, last_page)
+        for page, path in kept.items():
+            if not self.checkpoint.is_done(page):
+                self.checkpoint.mark_done(page, path)
+        return kept, False
+    
+    def save_to_data_dir(self, downloaded_files, kept_files=()):
+        """Move downloaded pages into data/YYYYMMDD/ and write the manifest
+        
+        kept_files are pages already in data/YYYYMMDD/ that stay in the manifest.
+        """
+        print(f"\n{'='*60}")
+        print(f"✅ Downloaded {len(downloaded_files)} pages successfully")
+        print('='*60)
+        
+        # Move files to data folder organized by date
+        date_str = self.current_date.strftime('%Y%m%d')
+        data_dir = self.date_data_dir()
+        os.makedirs(data_dir, exist_ok=True)
+        
+        previous = self.load_manifest() or {}
+        previous_details = {d['filename']: d for d in previous.get('file_details', [])}
+        
+        final_files = list(kept_files)
+        for file in downloaded_files:
+            filename = os.path.basename(file)
+            new_path = os.path.join(data_dir, filename)
+            shutil.move(file, new_path)
+            final_files.append(new_path)
+            print(f"📁 Moved to: {new_path}")
+        final_files.sort(key=lambda f: page_number_from_filename(os.path.basename(f)))
+        
+        # Drop pages that are no longer part of the result set
+        keep_names = {os.path.basename(f) for f in final_files}
+        for filename in previous.get('files', []):
+            stale_path = os.path.join(data_dir, filename)
+            if filename not in keep_names and os.path.exists(stale_path):
+                os.remove(stale_path)
+                print(f"🗑️ Removed stale page: {filename}")
+        
+        file_details = []
+        with self.timings.span('describe_pages', pages=len(final_files)):
+            for path in final_files:
+                detail = self.describe_page_file(path)
+                old = previous_details.get(detail['filename'])
+                if old and path not in kept_files:
+                    changed = old.get('content_hash') != detail['content_hash']
+                    print(f"{'🔄 Changed' if changed else '✔️ Unchanged'}: {detail['filename']}")
+                file_details.append(detail)
+        
+        with self.timings.span('images'):
+            image_refs = self.ingest_images(final_files)
+        
+        with self.timings.span('search_index'):
+            index_path = self.write_search_index(final_files, data_dir, image_refs)
+        
+        # Create a manifest file with metadata
+        manifest = {
+            'date': date_str,
+            'total_pages': len(final_files),
+            'files': [os.path.basename(f) for f in final_files],
+            'scraped_at': datetime.now().isoformat(),
+            'total_results': self.total_results,
+            'file_details': file_details,
+            'search_index': os.path.basename(index_path) if index_path else None,
+            'images': image_store.DAY_INDEX_FILENAME,
+            'image_count': len(image_refs)
+        }
+        
+        manifest_path = os.path.join(data_dir, 'manifest.json')
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        print(f"📄 Manifest saved: {manifest_path}")
+        print(f"\n📁 All files saved in: {data_dir}")
+        
+        return data_dir
+    
+    def write_search_index(self, files, data_dir, image_refs=None):
+        """Build the record search index served by /api/trademarks/search"""
+        dfs = [df for file, df, error in iter_page_frames(files) if not error]
+        if not dfs:
+            return None
+        merged_df = pd.concat(dfs, ignore_index=True).drop_duplicates(subset=['Filing number'], keep='first')
+        if image_refs is not None:
+            merged_df = image_store.attach_refs(merged_df, image_refs)
+        index_path = search_index.write_index(merged_df, data_dir, self.current_date.strftime('%Y%m%d'))
+        print(f"🔎 Search index saved: {os.path.basename(index_path)} ({len(merged_df)} records)")
+        return index_path
+    
+    def checkpoint_path(self):
+        """Checkpoint journal for the current date, kept with the downloads"""
+        return os.path.join(self.download_dir, f"checkpoint_{self.current_date.strftime('%Y%m%d')}.json")
+    
+    def scrape_all_pages(self, date=None, max_pages=100, workers=1, incremental=False, max_attempts=3):
+        """Main method to scrape all pages for a given date
+        
+        With workers > 1, page 1 is used to find the last page and the rest
+        are split into disjoint ranges, each scraped on its own pooled Chrome session.
+        With incremental=True an existing manifest is checked against the live
+        result count and only missing or changed pages are downloaded again,
+        through the same checkpoint and retries; the manifest is only
+        rewritten once every page to the end has been fetched or kept.
+        
+        Finished pages are journaled in a checkpoint. A transient failure
+        resumes on a healthy session (up to max_attempts); an interrupted
+        run picks up from the checkpoint the next time it is started.
+        """
         date_range = self.get_date_range(date)
-        downloaded_files = []
+        date_str = self.current_date.strftime('%Y%m%d')
+        self.total_results = None
+        self.checkpoint = None
         
         print(f"\n{'='*60}")
         print(f"🚀 STARTING EU TRADEMARK SCRAPER")
         print(f"📅 Date: {self.current_date.strftime('%Y-%m-%d')}")
         print(f"📁 Output folder: {self.download_dir}")
+        if workers > 1:
+            print(f"👷 Workers: {workers}")
         print('='*60)
         
-        # Initialize driver
-        driver = webdriver.Chrome(options=self.chrome_options)
-        
         try:
-            for page_num in range(1, max_pages + 1):
-                file_path = self.scrape_page(driver, page_num, date_range)
+            with self.timings.span('scrape_all_pages', date=date_str, workers=workers, incremental=incremental):
+                self.checkpoint = ScrapeCheckpoint.load(self.checkpoint_path(), date_str)
+                kept = {}
+                if incremental:
+                    with self.timings.span('incremental'):
+                        result = self.scrape_incremental(date_range, max_pages)
+                    if result is not None:
+                        kept, up_to_date = result
+                        if up_to_date:
+                            print("✅ Already up to date - nothing to download")
+                            return self.date_data_dir()
                 
-                if file_path:
-                    downloaded_files.append(file_path)
-                    print(f"✅ Page {page_num} complete")
-                    if page_num < max_pages:
-                        time.sleep(2)
-                else:
-                    if page_num > 1:
-                        print(f"📍 Reached end at page {page_num - 1}")
-                        break
-                    else:
-                        print("❌ First page failed - stopping")
-                        break
-            
-            # Create a summary/manifest file instead of merging
-            if downloaded_files:
-                print(f"\n{'='*60}")
-                print(f"✅ Downloaded {len(downloaded_files)} pages successfully")
-                print('='*60)
-                
-                # Move files to data folder organized by date
-                date_str = self.current_date.strftime('%Y%m%d')
-                data_dir = os.path.join(self.project_dir, 'data', date_str)
-                os.makedirs(data_dir, exist_ok=True)
-                
-                final_files = []
-                for file in downloaded_files:
-                    filename = os.path.basename(file)
-                    new_path = os.path.join(data_dir, filename)
-                    shutil.move(file, new_path)
-                    final_files.append(new_path)
-                    print(f"📁 Moved to: {new_path}")
+                resumed = [p for p, path in self.checkpoint.completed.items() if kept.get(p) != path]
+                if resumed:
+                    print(f"♻️ Resuming from checkpoint: {len(resumed)} pages already done")
+                self.total_results = self.checkpoint.total_results
                 
-                # Create a manifest file with metadata
-                manifest = {
-                    'date': date_str,
-                    'total_pages': len(final_files),
-                    'files': [os.path.basename(f) for f in final_files],
-                    'scraped_at': datetime.now().isoformat()
-                }
-                
-                manifest_path = os.path.join(data_dir, 'manifest.json')
-                with open(manifest_path, 'w') as f:
-                    json.dump(manifest, f, indent=2)
+                for attempt in range(1, max_attempts + 1):
+                    try:
+                        with self.timings.span('attempt', attempt=attempt):
+                            self.run_scrape_attempt(date_range, max_pages, workers)
+                    except PageScrapeError as e:
+                        print(f"⚠️ Transient failure: {e}")
+                    
+                    if self.checkpoint.is_finished():
+                        break
+                    if attempt < max_attempts:
+                        print(f"🔁 Attempt {attempt}/{max_attempts} incomplete - resuming on a healthy browser")
                 
-                print(f"📄 Manifest saved: {manifest_path}")
-                print(f"\n📁 All files saved in: {data_dir}")
+                if not self.checkpoint.is_finished():
+                    print(f"❌ Run incomplete after {max_attempts} attempts - "
+                          f"{len(self.checkpoint.completed)} pages kept in {self.checkpoint.path}, run again to resume")
+                    return None
                 
+                # Create a summary/manifest file instead of merging - only now
+                # that every page up to the end is either fresh or kept
+                files = self.checkpoint.files()
+                kept_files = [f for f in files if f in kept.values()]
+                downloaded_files = [f for f in files if f not in kept_files]
+                if files:
+                    with self.timings.span('save_to_data_dir'):
+                        data_dir = self.save_to_data_dir(downloaded_files, kept_files)
+                else:
+                    print("❌ No files downloaded")
+                    data_dir = None
+                self.checkpoint.remove()
                 return data_dir
-            else:
-                print("❌ No files downloaded")
-                return None
-                
+        
         finally:
-            driver.quit()
-            print("\n✅ Browser closed")
+            self.cleanup_temp_download_dir()
+            self.write_timing_report()
+    
+    def write_timing_report(self):
+        """Write the current run's timings to downloads/timings/ (and the metrics textfile)"""
+        try:
+            return self.timings.write_reports(
+                os.path.join(self.download_dir, 'timings'),
+                metrics_textfile=self.metrics_textfile,
+                run_labels={'date': self.current_date.strftime('%Y%m%d'), 'total_results': self.total_results}
+            )
+        except OSError as e:
+            print(f"⚠️ Could not write timing report: {e}")
+            return None
+
+def file_sha256(path):
+    """Hex SHA-256 of a file, read in 1 MB chunks"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
 
-def run_daily_scrape():
-    """Function to run the daily scrape"""
+def page_number_from_filename(filename):
+    """eu_trademarks_20251210_page_003.xlsx -> 3"""
+    try:
+        return int(filename.split('_page_')[1].split('.')[0])
+    except (IndexError, ValueError):
+        return 0
+
+def run_daily_scrape(workers=1, incremental=False, metrics_textfile=None, dates=None, request_policy=None,
+                     capture_exports=False, backend='selenium', esearch_url=None):
+    """Function to run the daily scrape
+    
+    dates (datetimes, default today) are scraped in order on the same warm
+    browser sessions, e.g. for a backfill. request_policy defaults to
+    blocking images, fonts, media and analytics. capture_exports intercepts
+    exports in Chrome instead of using its downloads.
+    backend='http' exports over plain HTTP first (esearch_url overrides
+    the eSearch host, e.g. for esearch_standin.py).
+    """
     print("\n" + "="*60)
     print("🚀 EU TRADEMARK SCRAPER")
     print("="*60)
     
-    scraper = EUTrademarkScraper(headless=False)  # Keep False to see progress
-    result = scraper.scrape_all_pages(date=datetime.now(), max_pages=20)
+    http_client = None
+    if backend == 'http' and esearch_url:
+        http_client = ESearchHttpClient(base_url=esearch_url, results_per_page=RESULTS_PER_PAGE)
+    
+    with EUTrademarkScraper(headless=False, metrics_textfile=metrics_textfile,  # Keep False to see progress
+                            request_policy=request_policy, capture_exports=capture_exports,
+                            backend=backend, http_client=http_client) as scraper:
+        for date in dates or [datetime.now()]:
+            result = scraper.scrape_all_pages(date=date, max_pages=20, workers=workers,
+                                              incremental=incremental)
     
     if result:
         print(f"\n{'='*60}")
@@ -389,4 +1251,36 @@ def run_daily_scrape():
         return None
 
 if __name__ == "__main__":
-    run_daily_scrape()
+    import argparse
+    parser = argparse.ArgumentParser(description='Scrape today\'s EUIPO trademark publications')
+    parser.add_argument('--workers', type=int, default=1, help='Chrome instances to run in parallel')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only re-download pages missing or changed since the last run')
+    parser.add_argument('--metrics-textfile',
+                        help='Also write phase timings here in Prometheus text format '
+                             '(e.g. for node_exporter\'s textfile collector)')
+    parser.add_argument('--dates', nargs='+', metavar='YYYYMMDD',
+                        help='Publication dates to scrape instead of today, sharing warm browsers')
+    parser.add_argument('--allow-resources', default=','.join(DEFAULT_ALLOW), metavar='TYPES',
+                        help='Comma-separated resource types Chrome may load; the rest of '
+                             f'{",".join(RESOURCE_TYPES)} is blocked (default: %(default)s)')
+    parser.add_argument('--no-blocking', action='store_true', help='Load every resource (no request blocking)')
+    parser.add_argument('--capture-exports', action='store_true',
+                        help='Intercept each export response in Chrome instead of using its downloads folder')
+    parser.add_argument('--backend', choices=['selenium', 'http'], default='selenium',
+                        help='http replays the export request recorded by a Selenium run, '
+                             'falling back to Chrome when it fails')
+    parser.add_argument('--esearch-url', help='eSearch base URL for the http backend '
+                                              '(e.g. http://127.0.0.1:8765 for esearch_standin.py)')
+    args = parser.parse_args()
+    dates = [datetime.strptime(d, '%Y%m%d') for d in args.dates] if args.dates else None
+    if args.no_blocking:
+        request_policy = RequestPolicy.allow_all()
+    else:
+        try:
+            request_policy = RequestPolicy(allow=[t.strip() for t in args.allow_resources.split(',') if t.strip()])
+        except ValueError as e:
+            parser.error(str(e))
+    run_daily_scrape(workers=args.workers, incremental=args.incremental,
+                     metrics_textfile=args.metrics_textfile, dates=dates, request_policy=request_policy,
+                     capture_exports=args.capture_exports, backend=args.backend, esearch_url=args.esearch_url)
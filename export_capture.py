@@ -0,0 +1,233 @@
+"""
+Capture the eSearch export by intercepting its response in Chrome
+
+Instead of letting Chrome's download manager write the export into a
+download folder (and watching that folder for it), the export response is
+held at the response stage with the DevTools Fetch domain and its body is
+streamed straight to the page's final path:
+
+    1. Fetch.enable with response-stage patterns, just before Export is
+       clicked
+    2. Fetch.requestPaused for a response whose MIME type or attachment
+       filename marks a spreadsheet; every other paused response is
+       continued untouched
+    3. Fetch.takeResponseBodyAsStream, then IO.read until eof -> dest_path
+    4. Fetch.failRequest, so the download manager never gets the response
+
+The body is the response to whatever request the Export click made, so
+nothing is sent twice and no endpoint is assumed. execute_cdp_cmd cannot
+receive events, so the capture opens its own DevTools connection to the
+tab (at Chrome's debuggerAddress); that needs websocket-client. Downloads
+stay denied for sessions in this mode.
+"""
+
+import os
+import json
+import time
+import base64
+from collections import deque
+
+try:
+    import websocket
+except ImportError:  # export capture is optional
+    websocket = None
+
+from download_watcher import has_excel_signature
+from esearch_http import header, is_export_response
+
+# What the export can arrive as: a navigation, an XHR/fetch, or a download link
+PAUSED_RESOURCE_TYPES = ('Document', 'XHR', 'Fetch', 'Other')
+
+READ_CHUNK_SIZE = 1024 * 1024
+COMMAND_TIMEOUT = 10
+
+
+class CaptureError(Exception):
+    """The export response could not be captured"""
+
+
+def is_available():
+    """True if websocket-client is installed"""
+    return websocket is not None
+
+
+def prepare_session(driver):
+    """Deny downloads, so an export that gets past the capture is not written anywhere"""
+    driver.execute_cdp_cmd('Browser.setDownloadBehavior', {'behavior': 'deny'})
+
+
+def tab_websocket_url(driver):
+    """DevTools websocket URL of the driver's current tab"""
+    address = (driver.capabilities.get('goog:chromeOptions') or {}).get('debuggerAddress')
+    if not address:
+        raise CaptureError("Chrome did not report a debugger address")
+    # chromedriver's window handles are DevTools target ids
+    return f'ws://{address}/devtools/page/{driver.current_window_handle}'
+
+
+class DevToolsConnection:
+    """Commands and events over one DevTools websocket"""
+
+    def __init__(self, url, timeout=COMMAND_TIMEOUT):
+        try:
+            # Chrome refuses websocket clients whose Origin it was not told to allow
+            self.ws = websocket.create_connection(url, timeout=timeout, suppress_origin=True)
+        except (OSError, websocket.WebSocketException) as e:
+            raise CaptureError(f"could not connect to DevTools at {url}: {e}")
+        self.timeout = timeout
+        self.last_id = 0
+        self.events = deque()   # events that arrived while waiting for a command's result
+
+    def close(self):
+        self.ws.close()
+
+    def receive(self, timeout):
+        """The next message, or None after timeout seconds"""
+        self.ws.settimeout(max(timeout, 0.01))
+        try:
+            return json.loads(self.ws.recv())
+        except websocket.WebSocketTimeoutException:
+            return None
+        except (OSError, ValueError, websocket.WebSocketException) as e:
+            raise CaptureError(f"DevTools connection lost: {e}")
+
+    def send(self, method, params=None):
+        """Run a command and return its result"""
+        self.last_id += 1
+        command_id = self.last_id
+        try:
+            self.ws.send(json.dumps({'id': command_id, 'method': method, 'params': params or {}}))
+        except (OSError, websocket.WebSocketException) as e:
+            raise CaptureError(f"DevTools connection lost: {e}")
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            message = self.receive(deadline - time.time())
+            if message is None:
+                continue
+            if message.get('id') == command_id:
+                if 'error' in message:
+                    raise CaptureError(f"{method} failed: {message['error'].get('message')}")
+                return message.get('result', {})
+            if 'method' in message:
+                self.events.append(message)
+        raise CaptureError(f"{method} got no answer in {self.timeout}s")
+
+    def event(self, timeout):
+        """The next event, or None after timeout seconds"""
+        deadline = time.time() + timeout
+        while not self.events:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            message = self.receive(remaining)
+            if message is not None and 'method' in message:
+                self.events.append(message)
+        return self.events.popleft()
+
+
+class ExportCapture:
+    """Intercept the export response on the driver's tab and stream its body to a file
+
+        with ExportCapture(driver) as capture:
+            ...click Export...
+            capture.save(dest_path)
+
+    Responses are only intercepted inside the with block. Once save() has
+    found the export, capture.request is the request (a CDP Network.Request)
+    that produced it.
+    """
+
+    def __init__(self, driver, match=is_export_response, timeout=60):
+        self.driver = driver
+        self.match = match
+        self.timeout = timeout
+        self.connection = None
+        self.request = None
+
+    def __enter__(self):
+        if not is_available():
+            raise CaptureError("websocket-client is not installed")
+        self.connection = DevToolsConnection(tab_websocket_url(self.driver))
+        try:
+            self.connection.send('Fetch.enable', {'patterns': [
+                {'urlPattern': '*', 'resourceType': resource_type, 'requestStage': 'Response'}
+                for resource_type in PAUSED_RESOURCE_TYPES
+            ]})
+        except CaptureError:
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop intercepting (anything still paused is let through) and disconnect"""
+        if self.connection is None:
+            return
+        try:
+            self.connection.send('Fetch.disable')
+        except CaptureError:
+            pass  # dropping the connection ends the interception as well
+        self.connection.close()
+        self.connection = None
+
+    def save(self, dest_path):
+        """Wait for the export response and write its body to dest_path; returns the bytes written
+
+        Returns None if no export response arrived within the timeout.
+        Raises CaptureError for an HTTP error or a body that is not a spreadsheet.
+        """
+        deadline = time.time() + self.timeout
+        while True:
+            event = self.connection.event(deadline - time.time())
+            if event is None:
+                return None
+            if event['method'] != 'Fetch.requestPaused':
+                continue
+            paused = event['params']
+            headers = {h['name']: h['value'] for h in paused.get('responseHeaders') or []}
+            if paused.get('responseErrorReason') or not self.match(header(headers, 'content-type'), headers):
+                self.connection.send('Fetch.continueRequest', {'requestId': paused['requestId']})
+                continue
+            self.request = paused.get('request')
+            return self.write_body(paused, dest_path)
+
+    def write_body(self, paused, dest_path):
+        """Stream a paused response's body to dest_path, then fail the request in the page"""
+        request_id = paused['requestId']
+        partial_path = dest_path + '.part'
+        size = 0
+        try:
+            status = paused.get('responseStatusCode', 200)
+            if status >= 400:
+                raise CaptureError(f"export returned HTTP {status}")
+            stream = self.connection.send('Fetch.takeResponseBodyAsStream', {'requestId': request_id})['stream']
+            try:
+                with open(partial_path, 'wb') as f:
+                    while True:
+                        chunk = self.connection.send('IO.read', {'handle': stream, 'size': READ_CHUNK_SIZE})
+                        data = chunk.get('data', '')
+                        data = base64.b64decode(data) if chunk.get('base64Encoded') else data.encode('utf-8')
+                        f.write(data)
+                        size += len(data)
+                        if chunk.get('eof'):
+                            break
+            finally:
+                self.connection.send('IO.close', {'handle': stream})
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        finally:
+            # Once its body is taken the response cannot go on to the page
+            try:
+                self.connection.send('Fetch.failRequest', {'requestId': request_id, 'errorReason': 'Aborted'})
+            except CaptureError:
+                pass
+
+        if not has_excel_signature(partial_path):
+            os.remove(partial_path)
+            raise CaptureError("intercepted export is not an Excel file")
+        os.replace(partial_path, dest_path)
+        return size
@@ -0,0 +1,283 @@
+"""
+Perceptual-hash index over every stored mark image
+
+Figurative marks cannot be found by name, so each image in the image store
+(see image_store.py) gets a 64-bit pHash: the image is flattened onto white,
+greyed, shrunk to 32x32, and the signs of its 8x8 lowest DCT frequencies
+against their median give the bits. Visually similar images differ in few
+bits (Hamming distance), whatever their size or encoding.
+
+Lookups use multi-index hashing: each hash is cut into four 16-bit chunks
+with one bucket table per chunk. Two hashes within distance d agree to
+within d // 4 bits on at least one chunk, so probing every chunk value that
+close to the query's chunks yields every match, and only those candidates
+are compared in full.
+
+Stored as numpy arrays in data/image_hash_index.npz, growing by each day's
+new images:
+
+    hashes                   pHash per distinct image (uint64)
+    ref_blob, ref_offsets    image path under data/, UTF-8
+    occ_date, occ_image,     one row per mark published with an image
+    occ_filing
+
+Marks that only have eSearch's placeholder picture (see image_store.py) are
+not indexed, so they neither match each other nor have an image to query by.
+
+    python image_hash.py --backfill              index every day in data/
+    python image_hash.py logo.png [--max-distance 10]
+"""
+
+import os
+import json
+import glob
+import argparse
+from io import BytesIO
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:  # image hashing is optional
+    Image = None
+
+from image_store import DAY_INDEX_FILENAME, load_placeholders, ref_digest
+from name_index import pack_strings, unpack_strings
+
+INDEX_FILENAME = 'image_hash_index.npz'
+
+HASH_SIZE = 8          # 8x8 DCT coefficients -> 64 bits
+SAMPLE_SIZE = 32       # image is shrunk to 32x32 before the DCT
+CHUNKS = 4             # multi-index tables of 16 bits each
+CHUNK_BITS = 64 // CHUNKS
+DEFAULT_MAX_DISTANCE = 10
+MAX_DISTANCE = 20
+
+# Set bits per byte value, for Hamming distances over uint64 arrays
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def is_available():
+    """True if Pillow is installed"""
+    return Image is not None
+
+
+def dct_matrix(n):
+    """Orthonormal DCT-II matrix, so dct(x) = D @ x @ D.T for an n x n block"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT = dct_matrix(SAMPLE_SIZE)
+
+
+def phash(image_bytes):
+    """64-bit perceptual hash of an encoded image, as a Python int"""
+    image = Image.open(BytesIO(image_bytes))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Transparent backgrounds would otherwise turn black
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    pixels = np.asarray(image.convert('L').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS), dtype=np.float64)
+    low = (DCT @ pixels @ DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    bits = low > np.median(low[1:])  # the DC term would skew the median
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming(hashes, query):
+    """Hamming distance of each uint64 in hashes to query"""
+    diff = np.bitwise_xor(hashes, np.uint64(query))
+    return POPCOUNT[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def chunk_values(hashes, chunk):
+    """The chunk-th 16-bit slice of each hash"""
+    return ((hashes >> np.uint64(chunk * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.int64)
+
+
+def flip_masks(radius):
+    """Every 16-bit mask with at most radius bits set"""
+    values = np.arange(1 << CHUNK_BITS)
+    return values[POPCOUNT[values & 0xFF] + POPCOUNT[values >> 8] <= radius]
+
+
+class ImageHashIndex:
+    def __init__(self):
+        self.hashes = np.array([], dtype=np.uint64)
+        self.refs = []
+        self.ref_ids = {}
+        self.occ_date = np.array([], dtype=np.uint32)
+        self.occ_image = np.array([], dtype=np.uint32)
+        self.occ_filing = np.array([], dtype='S12')
+        self.tables = None
+
+    @classmethod
+    def load(cls, path):
+        """Load an index file, or start an empty index if there is none"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            index.hashes = data['hashes']
+            index.refs = unpack_strings(data['ref_blob'], data['ref_offsets'])
+            index.occ_date = data['occ_date']
+            index.occ_image = data['occ_image']
+            index.occ_filing = data['occ_filing']
+        index.ref_ids = {ref: i for i, ref in enumerate(index.refs)}
+        return index
+
+    def add_day(self, date_str, refs, data_root):
+        """Index (or re-index) one day's {filing number: image ref}; returns (marks, new images)
+
+        Only images not hashed on an earlier day are opened.
+        """
+        day = int(date_str)
+        keep = self.occ_date != day
+        self.occ_date = self.occ_date[keep]
+        self.occ_image = self.occ_image[keep]
+        self.occ_filing = self.occ_filing[keep]
+
+        new_hashes = []
+        images, filings = [], []
+        for filing_number, ref in sorted(refs.items()):
+            image_id = self.ref_ids.get(ref)
+            if image_id is None:
+                try:
+                    with open(os.path.join(data_root, ref), 'rb') as f:
+                        new_hashes.append(phash(f.read()))
+                except (OSError, ValueError, Image.UnidentifiedImageError, Image.DecompressionBombError) as e:
+                    print(f"⚠️ Could not hash {ref}: {e}")
+                    continue
+                image_id = len(self.refs)
+                self.refs.append(ref)
+                self.ref_ids[ref] = image_id
+            images.append(image_id)
+            filings.append(filing_number.encode())
+
+        self.hashes = np.concatenate([self.hashes, np.array(new_hashes, dtype=np.uint64)])
+        self.occ_date = np.concatenate([self.occ_date, np.full(len(images), day, dtype=np.uint32)])
+        self.occ_image = np.concatenate([self.occ_image, np.array(images, dtype=np.uint32)])
+        self.occ_filing = np.concatenate([self.occ_filing, np.array(filings, dtype='S12')])
+        self.tables = None
+        return len(images), len(new_hashes)
+
+    def drop_images(self, digests):
+        """Remove the marks of images stored under these digests; returns how many"""
+        ids = [image_id for image_id, ref in enumerate(self.refs) if ref_digest(ref) in digests]
+        drop = np.isin(self.occ_image, np.array(ids, dtype=np.uint32))
+        if drop.any():
+            self.occ_date = self.occ_date[~drop]
+            self.occ_image = self.occ_image[~drop]
+            self.occ_filing = self.occ_filing[~drop]
+        return int(drop.sum())
+
+    def build_tables(self):
+        """Per chunk, image ids grouped by chunk value (CSR over all 65536 values)"""
+        self.tables = []
+        for chunk in range(CHUNKS):
+            values = chunk_values(self.hashes, chunk)
+            offsets = np.zeros((1 << CHUNK_BITS) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(values, minlength=1 << CHUNK_BITS), out=offsets[1:])
+            self.tables.append((offsets, np.argsort(values, kind='stable').astype(np.uint32)))
+
+    def candidates(self, query, max_distance):
+        """Ids of every image that may be within max_distance of query"""
+        if self.tables is None:
+            self.build_tables()
+        masks = flip_masks(max_distance // CHUNKS)
+        query = np.array([query], dtype=np.uint64)
+        found = []
+        for chunk, (offsets, ids) in enumerate(self.tables):
+            probes = chunk_values(query, chunk)[0] ^ masks
+            starts, ends = offsets[probes], offsets[probes + 1]
+            sizes = ends - starts
+            if not sizes.sum():
+                continue
+            # Concatenate ids[start:end] for every probe without a Python loop
+            positions = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+            found.append(ids[positions])
+        return np.unique(np.concatenate(found)) if found else np.array([], dtype=np.uint32)
+
+    def search(self, query, max_distance=DEFAULT_MAX_DISTANCE, limit=20):
+        """[(distance, image id)] closest first, at most limit"""
+        candidates = self.candidates(query, max_distance)
+        if not len(candidates):
+            return []
+        distances = hamming(self.hashes[candidates], query)
+        close = distances <= max_distance
+        candidates, distances = candidates[close], distances[close]
+        order = np.lexsort((candidates, distances))[:limit]
+        return [(int(distances[i]), int(candidates[i])) for i in order]
+
+    def marks(self, image_id):
+        """[(date, filing number)] published with an image, newest first"""
+        rows = np.nonzero(self.occ_image == image_id)[0]
+        marks = [(int(self.occ_date[i]), self.occ_filing[i].decode()) for i in rows]
+        return sorted(marks, reverse=True)
+
+    def save(self, path):
+        """Write the index atomically"""
+        ref_blob, ref_offsets = pack_strings(self.refs)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            hashes=self.hashes, ref_blob=ref_blob, ref_offsets=ref_offsets,
+            occ_date=self.occ_date, occ_image=self.occ_image, occ_filing=self.occ_filing
+        )
+        os.replace(tmp_path, path)
+
+
+def update_index(data_dir, date_str, refs):
+    """Add date_str's images to data_dir/image_hash_index.npz; returns the path, None without Pillow"""
+    if not is_available():
+        print("⚠️ Pillow not installed - skipping image hash index")
+        return None
+    path = os.path.join(data_dir, INDEX_FILENAME)
+    index = ImageHashIndex.load(path)
+    # Days stored before the placeholder was known still list it
+    placeholders = load_placeholders(data_dir)
+    refs = {filing_number: ref for filing_number, ref in refs.items() if ref_digest(ref) not in placeholders}
+    dropped = index.drop_images(placeholders)
+    if dropped:
+        print(f"🧹 Image hash index: dropped {dropped} marks that only had the placeholder picture")
+    marks, new_images = index.add_day(date_str, refs, data_dir)
+    index.save(path)
+    print(f"🧩 Image hash index: {marks} marks for {date_str}, {new_images} new images, "
+          f"{len(index.refs)} images over {len(np.unique(index.occ_date))} days")
+    return path
+
+
+def backfill(data_dir):
+    """Index every day with an images.json, oldest first"""
+    for day_index in sorted(glob.glob(os.path.join(data_dir, '[0-9]' * 8, DAY_INDEX_FILENAME))):
+        with open(day_index) as f:
+            refs = json.load(f)
+        update_index(data_dir, os.path.basename(os.path.dirname(day_index)), refs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Perceptual-hash index of stored mark images')
+    parser.add_argument('image', nargs='?', help='Image file to find visually similar marks for')
+    parser.add_argument('--data-dir', default=os.path.join(os.getcwd(), 'data'))
+    parser.add_argument('--backfill', action='store_true', help='Index every scraped day in data/')
+    parser.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f'Largest Hamming distance to report (0-{MAX_DISTANCE})')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.backfill:
+        backfill(args.data_dir)
+    if args.image:
+        index = ImageHashIndex.load(os.path.join(args.data_dir, INDEX_FILENAME))
+        with open(args.image, 'rb') as f:
+            query = phash(f.read())
+        print(f"🧩 pHash {query:016x}")
+        for distance, image_id in index.search(query, min(args.max_distance, MAX_DISTANCE), args.limit):
+            marks = index.marks(image_id)
+            print(f"  {distance:2d}  {index.refs[image_id]}  "
+                  + ', '.join(f'{filing} ({date})' for date, filing in marks[:5])
+                  + (f' +{len(marks) - 5} more' if len(marks) > 5 else ''))
@@ -0,0 +1,184 @@
+"""
+Content-addressed store for the mark images embedded in page exports
+
+pd.read_excel drops the pictures in the Graphic representation column, so
+they are pulled out of the page files here, once. Each image is stored
+under its SHA-256:
+
+    data/images/3f/3f5c...e1.png
+
+so a logo published on many days (or a re-scraped page) is written only
+once. Each day gets data/YYYYMMDD/images.json mapping Filing number to the
+image path relative to data/, and merged records carry that path in their
+Graphic representation column.
+
+Word marks (and other marks without a picture) are exported with one
+shared stand-in picture. A picture shared by PLACEHOLDER_MIN_FILINGS or
+more filings in a day is taken to be that placeholder: it is not stored,
+its marks get no image ref, and its digest is remembered in
+data/images/placeholders.json so smaller days skip it as well.
+"""
+
+import os
+import json
+import hashlib
+from collections import Counter
+
+import biff_reader
+from trademark_schema import parse_filing_number
+
+IMAGES_DIRNAME = 'images'
+DAY_INDEX_FILENAME = 'images.json'
+IMAGE_COLUMN = 'Graphic representation'
+PLACEHOLDERS_FILENAME = 'placeholders.json'
+
+# No two real marks share a picture this often; the placeholder is on every
+# word mark (over a thousand on a normal day)
+PLACEHOLDER_MIN_FILINGS = 20
+
+
+class ImageStore:
+    def __init__(self, data_root):
+        self.data_root = data_root
+        self.known = set()      # refs already on disk, so repeats skip the stat
+        self.written = 0
+        self.written_bytes = 0
+        self.reused = 0
+
+    def ref(self, digest, extension):
+        """Path of an image relative to data/"""
+        return f'{IMAGES_DIRNAME}/{digest[:2]}/{digest}.{extension}'
+
+    def put(self, image, extension, digest=None):
+        """Store image bytes unless already present; returns the ref"""
+        ref = self.ref(digest or hashlib.sha256(image).hexdigest(), extension)
+        if ref in self.known:
+            self.reused += 1
+            return ref
+        path = os.path.join(self.data_root, ref)
+        if os.path.exists(path):
+            self.reused += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(image)
+            os.replace(tmp_path, path)
+            self.written += 1
+            self.written_bytes += len(image)
+        self.known.add(ref)
+        return ref
+
+
+def page_images(path):
+    """[(filing number, extension, bytes)] for the pictures of one page export"""
+    if biff_reader.sniff_format(path) == 'biff':
+        found = biff_reader.read_page_images(path, key_column='Filing number', header_row=1)
+    else:
+        found = xlsx_page_images(path)
+    return [(parse_filing_number(key), extension, image) for key, extension, image in found
+            if parse_filing_number(key)]
+
+
+def xlsx_page_images(path, header_row=1):
+    """page_images for a genuine .xlsx, through openpyxl's drawing support"""
+    from openpyxl import load_workbook
+
+    sheet = load_workbook(path).worksheets[0]
+    header = [cell.value for cell in sheet[header_row + 1]]
+    if 'Filing number' not in header:
+        return []
+    key_column = header.index('Filing number') + 1
+    found = []
+    for picture in sheet._images:
+        row = picture.anchor._from.row  # 0-based, like the BIFF anchors
+        if row <= header_row:
+            continue
+        key = sheet.cell(row=row + 1, column=key_column).value
+        image = picture._data()
+        extension = (picture.format or 'png').lower()
+        found.append((key, 'jpg' if extension == 'jpeg' else extension, image))
+    return found
+
+
+def ref_digest(ref):
+    """SHA-256 an image ref is stored under"""
+    return os.path.basename(ref).split('.')[0]
+
+
+def load_placeholders(data_root):
+    """Digests of the known placeholder pictures"""
+    path = os.path.join(data_root, IMAGES_DIRNAME, PLACEHOLDERS_FILENAME)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(json.load(f))
+
+
+def save_placeholders(data_root, digests):
+    path = os.path.join(data_root, IMAGES_DIRNAME, PLACEHOLDERS_FILENAME)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(sorted(digests), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def ingest_pages(files, data_root, day_dir):
+    """Store the images of a day's page files and write day_dir/images.json
+
+    Returns {filing number: ref}, leaving out marks that only have the
+    placeholder picture. Images already in the store are not written again.
+    If no page yields a picture (unreadable pages), the day's images.json is
+    left as it was and {} is returned.
+    """
+    digests = {}    # filing number -> digest of its (first) picture
+    pictures = {}   # digest -> (extension, bytes)
+    for path in files:
+        try:
+            images = page_images(path)
+        except Exception as e:
+            print(f"⚠️ Could not read images from {os.path.basename(path)}: {e}")
+            continue
+        for filing_number, extension, image in images:
+            if filing_number in digests:
+                continue
+            digest = hashlib.sha256(image).hexdigest()
+            digests[filing_number] = digest
+            pictures.setdefault(digest, (extension, image))
+    if not digests:
+        print("⚠️ Images: none found in the pages - keeping the day's existing images.json")
+        return {}
+
+    placeholders = load_placeholders(data_root)
+    shared = Counter(digests.values())
+    found = {digest for digest, count in shared.items() if count >= PLACEHOLDER_MIN_FILINGS} - placeholders
+    if found:
+        placeholders |= found
+        save_placeholders(data_root, placeholders)
+
+    store = ImageStore(data_root)
+    refs = {}
+    for filing_number, digest in digests.items():
+        if digest not in placeholders:
+            extension, image = pictures[digest]
+            refs[filing_number] = store.put(image, extension, digest)
+
+    os.makedirs(day_dir, exist_ok=True)
+    index_path = os.path.join(day_dir, DAY_INDEX_FILENAME)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(sorted(refs.items())), f, indent=2)
+    os.replace(tmp_path, index_path)
+
+    print(f"🖼️ Images: {len(refs)} marks, {store.written} new files "
+          f"({store.written_bytes / 1024:.0f} KB), {store.reused} already stored, "
+          f"{len(digests) - len(refs)} with only the placeholder")
+    return refs
+
+
+def attach_refs(df, refs):
+    """Copy of df with the Graphic representation column holding each mark's image ref (None without one)"""
+    df = df.copy()
+    df[IMAGE_COLUMN] = [refs.get(parse_filing_number(f)) for f in df['Filing number']]
+    return df
@@ -0,0 +1,259 @@
+"""
+Trigram index over mark names across every scraped day
+
+Used for similar-mark clearance searches (/api/trademarks/similar). Names
+are folded to lower-case ASCII words and split into pg_trgm-style trigrams
+('yale' -> '  y', ' ya', 'yal', 'ale', 'le '). Each distinct name gets an
+id; a trigram's posting list holds the ids of the names containing it.
+
+Ids are only ever appended, so adding a day only appends to posting lists
+and they stay sorted. Re-merging a day replaces that day's occurrences;
+names no longer published on any day are left without occurrences.
+
+Stored as numpy arrays in one file (data/name_index.npz) so the API can
+load years of names in well under a second:
+
+    grams, gram_offsets, postings     CSR posting lists (uint32 name ids)
+    name_blob, name_offsets           normalized names, UTF-8
+    trigram_counts                    distinct trigrams per name
+    occ_date, occ_name, occ_filing,   one row per published mark; classes
+    occ_classes, occ_display_blob,    is a bitmask (bit c-1 = Nice class c)
+    occ_display_offsets
+"""
+
+import os
+
+import numpy as np
+
+from trademark_schema import parse_filing_number, parse_nice_classes, clean_text, fold_text
+
+INDEX_FILENAME = 'name_index.npz'
+
+
+def normalize_name(name):
+    """Lower-case, accent-free words joined by single spaces (see trademark_schema.fold_text)"""
+    return fold_text(name)
+
+
+def trigrams(normalized):
+    """pg_trgm-style trigram set of a normalized name"""
+    grams = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def class_mask(classes):
+    """[9, 35] -> bitmask with bits 8 and 34 set"""
+    mask = 0
+    for nice_class in classes:
+        if 1 <= nice_class <= 64:
+            mask |= 1 << (nice_class - 1)
+    return mask
+
+
+def pack_strings(strings):
+    """List of str -> (UTF-8 blob, offsets)"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(blob, offsets):
+    """Inverse of pack_strings"""
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[a:b].decode('utf-8') for a, b in zip(bounds, bounds[1:])]
+
+
+class NameIndex:
+    def __init__(self):
+        self.names = []             # name id -> normalized name
+        self.name_ids = {}          # normalized name -> name id
+        self.trigram_counts = []
+
+        # Stored posting lists, plus (gram, id) pairs for names added since loading
+        self.grams = np.array([], dtype='<U3')
+        self.gram_offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.array([], dtype=np.uint32)
+        self.new_pairs = []
+
+        self.occ_date = np.array([], dtype=np.uint32)
+        self.occ_name = np.array([], dtype=np.uint32)
+        self.occ_filing = np.array([], dtype='S12')
+        self.occ_classes = np.array([], dtype=np.uint64)
+        self.occ_display = []
+        self.new_occurrences = []   # batches from add_records not yet in the occ_* arrays
+
+    @classmethod
+    def load(cls, path):
+        """Load an index file, or start an empty index if there is none"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            index.names = unpack_strings(data['name_blob'], data['name_offsets'])
+            index.trigram_counts = data['trigram_counts'].tolist()
+            index.grams = data['grams']
+            index.gram_offsets = data['gram_offsets']
+            index.postings = data['postings']
+            index.occ_date = data['occ_date']
+            index.occ_name = data['occ_name']
+            index.occ_filing = data['occ_filing']
+            index.occ_classes = data['occ_classes']
+            index.occ_display = unpack_strings(data['occ_display_blob'], data['occ_display_offsets'])
+        index.name_ids = {name: i for i, name in enumerate(index.names)}
+        return index
+
+    def name_id(self, normalized):
+        """Id of a normalized name, adding it (and its trigrams) if new"""
+        name_id = self.name_ids.get(normalized)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(normalized)
+            self.name_ids[normalized] = name_id
+            grams = trigrams(normalized)
+            self.trigram_counts.append(len(grams))
+            self.new_pairs.extend((gram, name_id) for gram in grams)
+        return name_id
+
+    def add_day(self, date_str, df):
+        """Index (or re-index) one day's merged records; returns the number of marks added"""
+        self.drop_day(date_str)
+        added = self.add_records(date_str, df)
+        self.flush_records()
+        return added
+
+    def drop_day(self, date_str):
+        """Remove a day's occurrences before it is indexed again"""
+        self.flush_records()
+        keep = self.occ_date != int(date_str)
+        self.occ_date = self.occ_date[keep]
+        self.occ_name = self.occ_name[keep]
+        self.occ_filing = self.occ_filing[keep]
+        self.occ_classes = self.occ_classes[keep]
+        self.occ_display = [name for name, k in zip(self.occ_display, keep.tolist()) if k]
+
+    def add_records(self, date_str, df):
+        """Append a batch of a day's records (after drop_day); returns the number of marks added
+
+        Batches are kept as small arrays until flush_records, so adding a
+        day page by page does not copy the whole index per page.
+        """
+        names, filings, masks, displays = [], [], [], []
+        for filing, name, classes in zip(df['Filing number'], df['Name'], df['Nice classes']):
+            normalized = normalize_name(name)
+            if not normalized:
+                continue
+            names.append(self.name_id(normalized))
+            filings.append((parse_filing_number(filing) or '').encode())
+            masks.append(class_mask(parse_nice_classes(classes)))
+            displays.append(clean_text(name))
+
+        self.new_occurrences.append((
+            np.full(len(names), int(date_str), dtype=np.uint32),
+            np.array(names, dtype=np.uint32),
+            np.array(filings, dtype='S12'),
+            np.array(masks, dtype=np.uint64),
+        ))
+        self.occ_display.extend(displays)
+        return len(names)
+
+    def flush_records(self):
+        """Fold batches from add_records into the occurrence arrays"""
+        if not self.new_occurrences:
+            return
+        dates, names, filings, masks = zip(*self.new_occurrences)
+        self.occ_date = np.concatenate([self.occ_date, *dates])
+        self.occ_name = np.concatenate([self.occ_name, *names])
+        self.occ_filing = np.concatenate([self.occ_filing, *filings])
+        self.occ_classes = np.concatenate([self.occ_classes, *masks])
+        self.new_occurrences = []
+
+    def merged_postings(self):
+        """Fold names added since loading into the CSR posting lists
+
+        New ids are larger than every stored id, so a stable sort by gram
+        keeps each list sorted.
+        """
+        if not self.new_pairs:
+            return self.grams, self.gram_offsets, self.postings
+
+        new_grams = np.array([gram for gram, _ in self.new_pairs], dtype='<U3')
+        new_ids = np.array([name_id for _, name_id in self.new_pairs], dtype=np.uint32)
+        grams = np.union1d(self.grams, new_grams)
+
+        old_rows = np.repeat(np.searchsorted(grams, self.grams), np.diff(self.gram_offsets))
+        rows = np.concatenate([old_rows, np.searchsorted(grams, new_grams)])
+        ids = np.concatenate([self.postings, new_ids])
+        order = np.argsort(rows, kind='stable')
+
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(grams)), out=offsets[1:])
+        return grams, offsets, ids[order]
+
+    def save(self, path):
+        """Write the index atomically"""
+        self.flush_records()
+        self.grams, self.gram_offsets, self.postings = self.merged_postings()
+        self.new_pairs = []
+        name_blob, name_offsets = pack_strings(self.names)
+        display_blob, display_offsets = pack_strings(self.occ_display)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            grams=self.grams, gram_offsets=self.gram_offsets, postings=self.postings,
+            name_blob=name_blob, name_offsets=name_offsets,
+            trigram_counts=np.array(self.trigram_counts, dtype=np.uint16),
+            occ_date=self.occ_date, occ_name=self.occ_name, occ_filing=self.occ_filing,
+            occ_classes=self.occ_classes,
+            occ_display_blob=display_blob, occ_display_offsets=display_offsets
+        )
+        os.replace(tmp_path, path)
+
+
+def update_index(data_dir, date_str, df):
+    """Add date_str's records to data_dir/name_index.npz; returns the path"""
+    path = os.path.join(data_dir, INDEX_FILENAME)
+    index = NameIndex.load(path)
+    added = index.add_day(date_str, df)
+    index.save(path)
+    print(f"🔤 Name index: {added} marks for {date_str}, "
+          f"{len(index.names)} distinct names over {len(np.unique(index.occ_date))} days")
+    return path
+
+
+class NameIndexWriter:
+    """Streaming-merge sink that indexes a day's records as they are written
+
+    Only the compact index arrays grow, never the merged DataFrames; the
+    index is saved on close.
+    """
+
+    def __init__(self, data_dir, date_str):
+        self.path = os.path.join(data_dir, INDEX_FILENAME)
+        self.date_str = date_str
+        self.index = NameIndex.load(self.path)
+        self.index.drop_day(date_str)
+        self.batches = 0
+        self.added = 0
+
+    def write(self, df):
+        self.added += self.index.add_records(self.date_str, df)
+        self.batches += 1
+
+    def close(self):
+        """Save the index, unless nothing was written"""
+        if not self.batches:
+            return None
+        self.index.save(self.path)
+        print(f"🔤 Name index: {self.added} marks for {self.date_str}, "
+              f"{len(self.index.names)} distinct names over {len(np.unique(self.index.occ_date))} days")
+        return self.path
+
+    def abort(self):
+        """Leave the saved index as it was"""
+        self.index = None
@@ -0,0 +1,134 @@
+"""
+Columnar Parquet store for merged trademark data
+
+Each publication day is written as one hive partition:
+
+    data/parquet/publication_date=2025-12-10/part-0.parquet
+
+Dates are real date32 columns and Nice classes a list<int16>, so readers can
+prune columns and push date/class predicates down instead of parsing Excel.
+"""
+
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = ds = pq = None
+
+from trademark_schema import (
+    EXPECTED_COLUMNS, DATE_COLUMNS, ID_COLUMNS, BOOL_COLUMNS, LIST_COLUMNS,
+    parse_date, parse_nice_classes, parse_id, parse_bool, parse_filing_number, clean_text
+)
+
+PARTITION_COLUMN = 'publication_date'
+PARQUET_FILENAME = 'part-0.parquet'
+COMPRESSION = 'zstd'
+
+
+def is_available():
+    """True if pyarrow is installed"""
+    return pa is not None
+
+
+def column_type(column):
+    """Arrow type for one of EXPECTED_COLUMNS"""
+    if column in DATE_COLUMNS:
+        return pa.date32()
+    if column in ID_COLUMNS:
+        return pa.int64()
+    if column in BOOL_COLUMNS:
+        return pa.bool_()
+    if column in LIST_COLUMNS:
+        return pa.list_(pa.int16())
+    return pa.string()
+
+
+def get_schema():
+    """Arrow schema for a partition file (the partition column lives in the path)"""
+    return pa.schema([(column, column_type(column)) for column in EXPECTED_COLUMNS])
+
+
+def get_partitioning():
+    """Hive partitioning with a typed publication_date key"""
+    return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.date32())]), flavor='hive')
+
+
+def convert_value(column, value):
+    """Convert one raw spreadsheet cell to its typed Python value"""
+    if column == 'Filing number':
+        return parse_filing_number(value)
+    if column in DATE_COLUMNS:
+        return parse_date(value)
+    if column in ID_COLUMNS:
+        return parse_id(value)
+    if column in BOOL_COLUMNS:
+        return parse_bool(value)
+    if column in LIST_COLUMNS:
+        return parse_nice_classes(value)
+    return clean_text(value)
+
+
+def to_arrow_table(df):
+    """Build a typed Arrow table from a merged DataFrame (missing columns are null)"""
+    schema = get_schema()
+    arrays = []
+    for field in schema:
+        if field.name in df.columns:
+            values = [convert_value(field.name, v) for v in df[field.name].tolist()]
+        else:
+            values = [None] * len(df)
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def partition_dir(root, publication_date):
+    """Directory holding one day's partition"""
+    return os.path.join(root, f"{PARTITION_COLUMN}={publication_date.strftime('%Y-%m-%d')}")
+
+
+def write_partition(df, publication_date, root):
+    """Write (or replace) the partition for publication_date; returns the file path"""
+    part_dir = partition_dir(root, publication_date)
+    os.makedirs(part_dir, exist_ok=True)
+    path = os.path.join(part_dir, PARQUET_FILENAME)
+    pq.write_table(to_arrow_table(df), path, compression=COMPRESSION)
+    return path
+
+
+def read_trademarks(root, columns=None, filters=None):
+    """Read the dataset with column pruning and predicate pushdown
+
+    filters use pyarrow's DNF form, e.g.
+    [('publication_date', '>=', date(2025, 12, 1)), ('Owner country', '=', 'SE')]
+    """
+    return pq.read_table(root, columns=columns, filters=filters, partitioning=get_partitioning())
+
+
+class PartitionWriter:
+    """Append DataFrame chunks to one day's partition as separate row groups"""
+
+    def __init__(self, root, publication_date):
+        part_dir = partition_dir(root, publication_date)
+        os.makedirs(part_dir, exist_ok=True)
+        self.path = os.path.join(part_dir, PARQUET_FILENAME)
+        # Dot-prefixed, so dataset scans skip it until close() moves it into place
+        self.partial_path = os.path.join(part_dir, f'.{PARQUET_FILENAME}.part')
+        self.writer = pq.ParquetWriter(self.partial_path, get_schema(), compression=COMPRESSION)
+
+    def write(self, df):
+        """Append a chunk"""
+        if len(df):
+            self.writer.write_table(to_arrow_table(df))
+
+    def close(self):
+        """Finish the file footer"""
+        self.writer.close()
+        os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """Drop the partial file, keeping any earlier partition"""
+        self.writer.close()
+        os.remove(self.partial_path)
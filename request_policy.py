@@ -0,0 +1,138 @@
+"""
+Request blocking for eSearch page loads, plus per-page traffic accounting
+
+The scraper only needs the eSearch app's scripts, its API calls and the
+export; images, fonts, media and analytics are dead weight on every page
+load. A RequestPolicy blocks them by resource type:
+
+    image       Chrome's image content setting (covers CSS and <img>), plus
+                URL patterns for the common extensions
+    font        *.woff, *.woff2, *.ttf, ...
+    media       *.mp4, *.webm, ...
+    analytics   known tracker hosts
+    stylesheet  *.css (allowed by default - layout decides what is clickable)
+
+Patterns are applied with CDP Network.setBlockedURLs when a session starts.
+Documents, scripts and XHR/fetch (the hit list and the export) are never
+blocked.
+
+Bytes per page come from Chrome's performance log (Network.loadingFinished
+encodedDataLength), which counts every response, cross-origin or not.
+"""
+
+import json
+
+
+def extension_patterns(*extensions):
+    """CDP wildcard patterns for URLs ending in the extensions, with or without a query string"""
+    return [pattern for ext in extensions for pattern in (f'*.{ext}', f'*.{ext}?*')]
+
+
+# Resource type -> URL patterns blocked for it
+RESOURCE_PATTERNS = {
+    'image': extension_patterns('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'bmp'),
+    'font': extension_patterns('woff', 'woff2', 'ttf', 'otf', 'eot'),
+    'media': extension_patterns('mp4', 'webm', 'ogg', 'mp3', 'wav'),
+    'analytics': ['*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+                  '*/matomo.js*', '*/piwik.js*', '*hotjar.com*', '*webanalytics*'],
+    'stylesheet': extension_patterns('css'),
+}
+RESOURCE_TYPES = sorted(RESOURCE_PATTERNS)
+DEFAULT_ALLOW = ('stylesheet',)
+
+# Chrome content setting: 2 = block
+BLOCK_IMAGES_PREF = 'profile.managed_default_content_settings.images'
+
+
+class RequestPolicy:
+    def __init__(self, allow=DEFAULT_ALLOW, extra_patterns=()):
+        """Block every resource type in RESOURCE_TYPES that is not in allow"""
+        unknown = set(allow) - set(RESOURCE_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown resource types: {', '.join(sorted(unknown))} "
+                             f"(choose from {', '.join(RESOURCE_TYPES)})")
+        self.blocked = [t for t in RESOURCE_TYPES if t not in allow]
+        self.extra_patterns = list(extra_patterns)
+
+    @classmethod
+    def allow_all(cls):
+        """A policy that blocks nothing"""
+        return cls(allow=RESOURCE_TYPES)
+
+    def patterns(self):
+        return [p for t in self.blocked for p in RESOURCE_PATTERNS[t]] + self.extra_patterns
+
+    def chrome_prefs(self):
+        """Profile prefs to merge into the Chrome options"""
+        return {BLOCK_IMAGES_PREF: 2} if 'image' in self.blocked else {}
+
+    def apply(self, driver):
+        """Install the URL patterns on the session's current tab; False if CDP is unavailable"""
+        patterns = self.patterns()
+        if not patterns:
+            return True
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+        except Exception as e:
+            print(f"⚠️ Could not install request blocking: {e}")
+            return False
+        return True
+
+
+def read_network_events(driver):
+    """Drain the performance log into a list of (method, params) Network events
+
+    Returns None when the session was not started with performance logging.
+    """
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return None
+    events = []
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message.get('method', '').startswith('Network.'):
+            events.append((message['method'], message.get('params', {})))
+    return events
+
+
+class NetworkLog:
+    """Network events of one page, drained from the performance log as they are needed
+
+    Creating it drops events left over from earlier pages. Everything read
+    is kept in events, so several readers (the export capture, the traffic
+    report) see the whole page.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.events = []
+        self.available = read_network_events(driver) is not None
+
+    def read(self):
+        """Drain new events into self.events and return them"""
+        events = read_network_events(self.driver) or []
+        self.events.extend(events)
+        return events
+
+
+def summarize_traffic(events):
+    """{'bytes', 'requests', 'blocked', 'by_type': {type: bytes}} for a page's Network events"""
+    types = {}
+    traffic = {'bytes': 0, 'requests': 0, 'blocked': 0, 'by_type': {}}
+    for method, params in events:
+        if method == 'Network.responseReceived':
+            types[params.get('requestId')] = params.get('type', 'Other')
+        elif method == 'Network.loadingFinished':
+            size = int(params.get('encodedDataLength') or 0)
+            resource_type = types.get(params.get('requestId'), 'Other')
+            traffic['bytes'] += size
+            traffic['requests'] += 1
+            traffic['by_type'][resource_type] = traffic['by_type'].get(resource_type, 0) + size
+        elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+            traffic['blocked'] += 1
+    return traffic
@@ -0,0 +1,94 @@
+"""
+Checkpoint journal for multi-page scrapes
+
+Records every finished page (and where the results end) in a small JSON file
+next to the downloads, rewritten atomically after each page. A restarted run
+for the same date loads it, skips the pages already on disk and carries on.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+
+class ScrapeCheckpoint:
+    def __init__(self, path, date_str):
+        self.path = path
+        self.date = date_str
+        self.completed = {}        # page number -> downloaded file path
+        self.end_page = None       # last page with results, once known
+        self.total_results = None
+        self.lock = threading.Lock()  # parallel workers share one journal
+
+    @classmethod
+    def load(cls, path, date_str):
+        """Load the journal for date_str, dropping pages whose files are gone"""
+        checkpoint = cls(path, date_str)
+        if not os.path.exists(path):
+            return checkpoint
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return checkpoint
+        if data.get('date') != date_str:
+            return checkpoint
+
+        checkpoint.completed = {int(page): file for page, file in data.get('completed', {}).items()
+                                if os.path.exists(file)}
+        checkpoint.end_page = data.get('end_page')
+        checkpoint.total_results = data.get('total_results')
+        return checkpoint
+
+    def save(self):
+        """Rewrite the journal atomically (caller holds the lock)"""
+        data = {
+            'date': self.date,
+            'completed': {str(page): file for page, file in sorted(self.completed.items())},
+            'end_page': self.end_page,
+            'total_results': self.total_results,
+            'updated_at': datetime.now().isoformat()
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def mark_done(self, page_number, file_path):
+        """Record a finished page"""
+        with self.lock:
+            self.completed[page_number] = file_path
+            self.save()
+
+    def mark_end(self, last_page):
+        """Record the last page that has results (0 if there are none)"""
+        with self.lock:
+            self.end_page = last_page
+            self.save()
+
+    def set_total_results(self, total_results, last_page):
+        """Record the result count and the last page it implies"""
+        with self.lock:
+            self.total_results = total_results
+            self.end_page = last_page
+            self.save()
+
+    def is_done(self, page_number):
+        return page_number in self.completed
+
+    def is_finished(self):
+        """True once the end is known and every page up to it is on disk"""
+        if self.end_page is None:
+            return False
+        return all(page in self.completed for page in range(1, self.end_page + 1))
+
+    def files(self):
+        """Downloaded files in page order"""
+        return [self.completed[page] for page in sorted(self.completed)
+                if self.end_page is None or page <= self.end_page]
+
+    def remove(self):
+        """Delete the journal once the run has been saved"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,214 @@
+"""
+Timing spans for scrape runs
+
+    with timings.span('navigate', page=3):
+        driver.get(url)
+
+Spans nest per thread (the inner one is recorded as 'scrape_page/navigate',
+with the outer span's labels) and are safe to record from parallel workers.
+root=True starts a fresh path, so a page's phases are named the same whether
+it ran in the main thread or in a worker. At the end of a run (a scrape or
+a merge) they are written as below; each report covers the spans recorded
+since the previous one, so one Timings lasts for the whole process:
+
+    timings_YYYYMMDD_HHMMSS.json   every span plus per-phase summary
+    timings_YYYYMMDD_HHMMSS.csv    every span, one row each
+    a Prometheus textfile          per-phase count/sum/max, optional, for
+                                   node_exporter's textfile collector
+"""
+
+import os
+import csv
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+METRIC_PREFIX = 'eu_trademark_scrape'
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Timings:
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def stack(self):
+        """This thread's open spans as (path, labels) pairs"""
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    @contextmanager
+    def span(self, name, root=False, **labels):
+        """Time the enclosed block; exceptions are recorded and re-raised"""
+        stack = self.stack()
+        labels = {key: value for key, value in labels.items() if value is not None}
+        if stack and not root:
+            parent_path, parent_labels = stack[-1]
+            path = f'{parent_path}/{name}'
+            labels = {**parent_labels, **labels}
+        else:
+            path = name
+        stack.append((path, labels))
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            self.add(path, start - self.origin, duration, status, labels)
+
+    def annotate(self, **labels):
+        """Add labels (e.g. bytes=...) to this thread's innermost open span"""
+        stack = self.stack()
+        if stack:
+            stack[-1][1].update(labels)
+
+    def iterate(self, name, iterable, **labels):
+        """Yield from iterable, timing each step as a span (for lazy readers)"""
+        iterator = iter(iterable)
+        while True:
+            with self.span(name, **labels):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add(self, path, start, duration, status='ok', labels=None):
+        """Record a span measured elsewhere"""
+        with self.lock:
+            self.spans.append({
+                'phase': path,
+                'start': round(start, 4),
+                'seconds': round(duration, 4),
+                'status': status,
+                'thread': threading.current_thread().name,
+                **(labels or {})
+            })
+
+    def summary(self):
+        """{phase: count, total, mean, p50, p95, max, errors[, bytes]}
+
+        bytes is the sum of the spans' bytes labels, for phases that have them.
+        """
+        with self.lock:
+            spans = list(self.spans)
+        by_phase = {}
+        for span in spans:
+            by_phase.setdefault(span['phase'], []).append(span)
+        summary = {}
+        for phase, phase_spans in sorted(by_phase.items()):
+            seconds = sorted(s['seconds'] for s in phase_spans)
+            summary[phase] = {
+                'count': len(seconds),
+                'total': round(sum(seconds), 4),
+                'mean': round(sum(seconds) / len(seconds), 4),
+                'p50': percentile(seconds, 0.5),
+                'p95': percentile(seconds, 0.95),
+                'max': seconds[-1],
+                'errors': sum(1 for s in phase_spans if s['status'] != 'ok')
+            }
+            sizes = [s['bytes'] for s in phase_spans if s.get('bytes') is not None]
+            if sizes:
+                summary[phase]['bytes'] = sum(sizes)
+        return summary
+
+    def write_reports(self, report_dir, metrics_textfile=None, run_labels=None):
+        """Write the JSON and CSV reports (and the Prometheus textfile if given); returns the JSON path"""
+        os.makedirs(report_dir, exist_ok=True)
+        stem = os.path.join(report_dir, f"timings_{self.started_at.strftime('%Y%m%d_%H%M%S')}")
+        # Reports flushed within the same second (a short scrape, then its merge) get a suffix
+        suffix = 1
+        base = stem
+        while os.path.exists(stem + '.json'):
+            suffix += 1
+            stem = f'{base}_{suffix}'
+        with self.lock:
+            spans = list(self.spans)
+        summary = self.summary()
+
+        with open(stem + '.json', 'w') as f:
+            json.dump({
+                'started_at': self.started_at.isoformat(),
+                'run': run_labels or {},
+                'summary': summary,
+                'spans': spans
+            }, f, indent=2)
+
+        label_keys = sorted({key for span in spans for key in span} - {'phase', 'start', 'seconds', 'status', 'thread'})
+        with open(stem + '.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['phase', 'start', 'seconds', 'status', 'thread'] + label_keys)
+            writer.writeheader()
+            writer.writerows(spans)
+
+        if metrics_textfile:
+            self.write_textfile(metrics_textfile, summary)
+        print(f"⏱️ Timing report: {stem}.json / .csv")
+        self.flush(len(spans))
+        return stem + '.json'
+
+    def flush(self, written):
+        """Drop the first written spans and start the next report's clock"""
+        with self.lock:
+            del self.spans[:written]
+            self.started_at = datetime.now()
+            self.origin = time.perf_counter()
+
+    def write_textfile(self, path, summary=None):
+        """Prometheus text exposition of per-phase counts and durations, written atomically"""
+        summary = summary or self.summary()
+        lines = [
+            f'# HELP {METRIC_PREFIX}_phase_seconds_total Time spent per scrape phase in the last run',
+            f'# TYPE {METRIC_PREFIX}_phase_seconds_total gauge',
+        ]
+        lines += [f'{METRIC_PREFIX}_phase_seconds_total{{phase="{phase}"}} {s["total"]}' for phase, s in summary.items()]
+        lines += [
+            f'# HELP {METRIC_PREFIX}_phase_count Spans per scrape phase in the last run',
+            f'# TYPE {METRIC_PREFIX}_phase_count gauge',
+        ]
+        lines += [f'{METRIC_PREFIX}_phase_count{{phase="{phase}"}} {s["count"]}' for phase, s in summary.items()]
+        lines += [
+            f'# HELP {METRIC_PREFIX}_phase_max_seconds Slowest span per scrape phase in the last run',
+            f'# TYPE {METRIC_PREFIX}_phase_max_seconds gauge',
+        ]
+        lines += [f'{METRIC_PREFIX}_phase_max_seconds{{phase="{phase}"}} {s["max"]}' for phase, s in summary.items()]
+        lines += [
+            f'# HELP {METRIC_PREFIX}_phase_errors Failed spans per scrape phase in the last run',
+            f'# TYPE {METRIC_PREFIX}_phase_errors gauge',
+        ]
+        lines += [f'{METRIC_PREFIX}_phase_errors{{phase="{phase}"}} {s["errors"]}' for phase, s in summary.items()]
+        lines += [
+            f'# HELP {METRIC_PREFIX}_phase_bytes Bytes transferred per scrape phase in the last run',
+            f'# TYPE {METRIC_PREFIX}_phase_bytes gauge',
+        ]
+        lines += [f'{METRIC_PREFIX}_phase_bytes{{phase="{phase}"}} {s["bytes"]}'
+                  for phase, s in summary.items() if 'bytes' in s]
+        lines += [
+            f'# HELP {METRIC_PREFIX}_last_run_timestamp_seconds Start of the last scrape run',
+            f'# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge',
+            f'{METRIC_PREFIX}_last_run_timestamp_seconds {self.started_at.timestamp():.0f}',
+        ]
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
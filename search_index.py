@@ -0,0 +1,103 @@
+"""
+Prebuilt search index for one day of trademarks
+
+Built once at scrape time and published next to manifest.json, so the API
+can answer record queries without opening a single spreadsheet:
+
+    records   one row of display fields per mark, sorted by filing number
+              (Graphic representation is the image path under data/, see image_store)
+    tokens    inverted index: {'name'|'owner': {token: [record ids]}}
+    country   {owner country: [record ids]}
+    status    {status (lower case): [record ids]}
+    classes   {Nice class: [record ids]}
+    dates     [[filing date, record id], ...] sorted by date for range queries
+
+Record ids are positions in records, so every posting list is sorted.
+"""
+
+import os
+import json
+from collections import defaultdict
+
+from parquet_store import convert_value
+from trademark_schema import fold_words
+
+INDEX_FILENAME = 'search_index.json'
+INDEX_VERSION = 1
+
+# Fields returned by the search endpoint
+RECORD_FIELDS = [
+    'Filing number', 'Graphic representation', 'Name', 'Type', 'Kind of mark', 'Filing date/ Designation date',
+    'Registration date', 'Nice classes', 'Status', 'Owner name', 'Owner ID',
+    'Owner country', 'Representative name'
+]
+
+# Query parameter -> column whose words are indexed
+TOKEN_FIELDS = {'name': 'Name', 'owner': 'Owner name'}
+
+FILING_DATE_COLUMN = 'Filing date/ Designation date'
+
+
+def tokenize(text):
+    """Lower-case, accent-free alphanumeric words ('Café-Bär GmbH' -> ['cafe', 'bar', 'gmbh'])"""
+    return fold_words(text)
+
+
+def json_value(value):
+    """Typed values as JSON-friendly ones (dates become ISO strings)"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def build_index(df, date_str):
+    """Build the index dict for one day's merged DataFrame"""
+    rows = []
+    for row in df.to_dict('records'):
+        record = [json_value(convert_value(field, row.get(field))) for field in RECORD_FIELDS]
+        if record[0] is not None:
+            rows.append(record)
+    rows.sort(key=lambda r: r[0])
+
+    position = {field: i for i, field in enumerate(RECORD_FIELDS)}
+    tokens = {key: defaultdict(list) for key in TOKEN_FIELDS}
+    country = defaultdict(list)
+    status = defaultdict(list)
+    classes = defaultdict(list)
+    dates = []
+
+    for record_id, record in enumerate(rows):
+        for key, column in TOKEN_FIELDS.items():
+            for token in sorted(set(tokenize(record[position[column]]))):
+                tokens[key][token].append(record_id)
+        if record[position['Owner country']]:
+            country[record[position['Owner country']].upper()].append(record_id)
+        if record[position['Status']]:
+            status[record[position['Status']].lower()].append(record_id)
+        for nice_class in sorted(set(record[position['Nice classes']] or [])):
+            classes[str(nice_class)].append(record_id)
+        if record[position[FILING_DATE_COLUMN]]:
+            dates.append([record[position[FILING_DATE_COLUMN]], record_id])
+    dates.sort()
+
+    return {
+        'version': INDEX_VERSION,
+        'date': date_str,
+        'fields': RECORD_FIELDS,
+        'records': rows,
+        'tokens': {key: dict(postings) for key, postings in tokens.items()},
+        'country': dict(country),
+        'status': dict(status),
+        'classes': dict(classes),
+        'dates': dates
+    }
+
+
+def write_index(df, data_dir, date_str):
+    """Write data_dir/search_index.json; returns the path"""
+    path = os.path.join(data_dir, INDEX_FILENAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(build_index(df, date_str), f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,92 @@
+"""
+Incremental sinks for merging page files without holding them all in memory
+
+Each sink accepts one DataFrame chunk at a time, so peak memory is bounded by
+the largest page rather than the whole day (or a months-long backfill).
+Sinks are finished with close(), or abort() if the merge failed, which
+leaves any earlier output in place.
+"""
+
+import os
+import math
+
+from openpyxl import Workbook
+
+
+def compact_key(filing_number):
+    """Filing numbers are 9-digit strings; keep ints in the seen-set where possible"""
+    text = str(filing_number).strip()
+    return int(text) if text.isdigit() else text
+
+
+class JsonArrayWriter:
+    """Write records as one JSON array, chunk by chunk (same output as to_json(orient='records'))"""
+
+    def __init__(self, path):
+        self.path = path
+        self.partial_path = path + '.part'
+        self.f = open(self.partial_path, 'w')
+        self.f.write('[')
+        self.first = True
+
+    def write(self, df):
+        """Append a chunk of records"""
+        if not len(df):
+            return
+        body = df.to_json(orient='records', date_format='iso')[1:-1]
+        if not self.first:
+            self.f.write(',')
+        self.f.write(body)
+        self.first = False
+
+    def close(self):
+        try:
+            self.f.write(']')
+            self.f.close()
+        except Exception:
+            self.abort()
+            raise
+        os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """Drop the partial file"""
+        self.f.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+class XlsxRowWriter:
+    """Append rows to an .xlsx using openpyxl's write-only mode"""
+
+    def __init__(self, path, sheet_name='Trademarks'):
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(sheet_name)
+        self.columns = None
+
+    def write(self, df):
+        """Append a chunk; the first chunk fixes the header"""
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.sheet.append(self.columns)
+        for row in df.itertuples(index=False, name=None):
+            self.sheet.append([None if isinstance(v, float) and math.isnan(v) else v for v in row])
+
+    def close(self):
+        if self.columns is None:
+            self.sheet.append([])
+        self.save(self.path + '.part')
+        os.replace(self.path + '.part', self.path)
+
+    def abort(self):
+        """Drop the rows written so far (saving is what removes openpyxl's temp file)"""
+        self.save(self.path + '.part')
+        os.remove(self.path + '.part')
+
+    def save(self, partial_path):
+        try:
+            self.workbook.save(partial_path)
+        except Exception:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+HTTP export backend test against the local eSearch stand-in
+
+Replays the recorded page exports in data/20251210 through esearch_standin.py,
+so it runs without Chrome or EUIPO:
+
+    python -m pytest -q test_http_backend.py
+"""
+
+import os
+import shutil
+from datetime import datetime
+
+from esearch_http import ESearchHttpClient, find_export_request, load_recording, record_export_request
+from esearch_standin import StandIn
+from eu_trademark_scraper import EUTrademarkScraper, RESULTS_PER_PAGE
+from scrape_checkpoint import ScrapeCheckpoint
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', '20251210')
+DATE = datetime(2025, 12, 10)
+
+# Shape of a recorded export request; the stand-in serves whatever path and
+# page field the recording names
+RECORDED_REQUEST = {
+    'url': 'https://euipo.europa.eu/copla/trademark/data/export/xls'
+           '?page=2&size=100&v1=10%2F12%2F2025+-+10%2F12%2F2025&sf=ApplicationNumber',
+    'method': 'GET',
+    'headers': {'Accept': '*/*', 'Cookie': 'JSESSIONID=recorded', ':authority': 'euipo.europa.eu'},
+}
+
+
+def network_events(request):
+    """Network events of a page whose Export click sent request"""
+    return [
+        ('Network.requestWillBeSent', {'requestId': '1', 'request': {'url': 'https://euipo.europa.eu/eSearch/'}}),
+        ('Network.responseReceived', {'requestId': '1', 'response': {'mimeType': 'text/html'}}),
+        ('Network.requestWillBeSent', {'requestId': '7', 'request': request}),
+        ('Network.responseReceived', {'requestId': '7', 'response': {
+            'mimeType': 'application/octet-stream',
+            'headers': {'Content-Disposition': 'attachment; filename="resultsxls.xls"'}}}),
+    ]
+
+
+def make_recording(directory):
+    path = os.path.join(directory, 'esearch_export_request.json')
+    request = find_export_request(network_events(RECORDED_REQUEST))
+    assert request is RECORDED_REQUEST
+    assert record_export_request(path, request, 2, DATE)
+    return path
+
+
+def make_scraper(tmp_path, base_url, recording_path):
+    client = ESearchHttpClient(base_url=base_url, recording_path=recording_path,
+                               results_per_page=RESULTS_PER_PAGE)
+    scraper = EUTrademarkScraper(download_dir=str(tmp_path / 'downloads'), backend='http', http_client=client)
+    scraper.get_date_range(DATE)
+    scraper.checkpoint = ScrapeCheckpoint(scraper.checkpoint_path(), '20251210')
+    return scraper
+
+
+def test_recording_is_replayed_with_page_and_date_swapped(tmp_path):
+    path = make_recording(str(tmp_path))
+    recording = load_recording(path)
+    assert 'Cookie' not in recording['headers'] and ':authority' not in recording['headers']
+
+    # A page-1 recording never replaces a later page's, an identical one is not rewritten
+    assert not record_export_request(path, RECORDED_REQUEST, 1, DATE)
+    assert not record_export_request(path, RECORDED_REQUEST, 2, DATE)
+
+    client = ESearchHttpClient(base_url='http://standin', recording_path=path)
+    request = client.build_export_request(7, datetime(2026, 1, 5))
+    assert request['method'] == 'GET'
+    assert request['url'] == 'http://standin/copla/trademark/data/export/xls'
+    assert dict(request['params']) == {'page': '7', 'size': '100', 'v1': '05/01/2026 - 05/01/2026',
+                                       'sf': 'ApplicationNumber'}
+
+
+def test_http_backend_stops_at_the_short_last_page(tmp_path):
+    recording_path = make_recording(str(tmp_path))
+    with StandIn(PAGES_DIR, load_recording(recording_path)) as standin:
+        scraper = make_scraper(tmp_path, standin.url, recording_path)
+        try:
+            assert scraper.scrape_pages_http(scraper.get_date_range(DATE), max_pages=100) is False
+        finally:
+            scraper.close()
+
+    checkpoint = scraper.checkpoint
+    assert checkpoint.is_finished() and checkpoint.end_page == 20
+    assert checkpoint.total_results == 19 * RESULTS_PER_PAGE + 93
+    # One landing page visit, then exactly one request per page - never past the end
+    assert [page for _, _, page in standin.requests] == [None] + list(range(1, 21))
+    for page, path in checkpoint.completed.items():
+        with open(path, 'rb') as f, open(os.path.join(PAGES_DIR, os.path.basename(path)), 'rb') as g:
+            assert f.read() == g.read(), page
+
+
+def test_http_backend_stops_at_an_empty_sheet(tmp_path):
+    # Three full pages, then the endpoint answers with valid but empty sheets
+    pages_dir = tmp_path / 'pages'
+    pages_dir.mkdir()
+    for page in (1, 2, 3):
+        name = f'eu_trademarks_20251210_page_{page:03d}.xlsx'
+        shutil.copy(os.path.join(PAGES_DIR, name), pages_dir / name)
+
+    recording_path = make_recording(str(tmp_path))
+    with StandIn(str(pages_dir), load_recording(recording_path), past_end='empty') as standin:
+        scraper = make_scraper(tmp_path, standin.url, recording_path)
+        try:
+            assert scraper.scrape_pages_http(scraper.get_date_range(DATE), max_pages=20) is False
+        finally:
+            scraper.close()
+
+    assert scraper.checkpoint.end_page == 3 and scraper.checkpoint.is_finished()
+    assert sorted(scraper.checkpoint.completed) == [1, 2, 3]
+    assert not os.path.exists(scraper.page_path(4))
+    assert [page for _, _, page in standin.requests] == [None, 1, 2, 3, 4]
+
+
+def test_http_backend_needs_a_recording(tmp_path):
+    scraper = make_scraper(tmp_path, 'http://127.0.0.1:9', str(tmp_path / 'missing.json'))
+    try:
+        assert scraper.scrape_pages_http(scraper.get_date_range(DATE), max_pages=20) is True
+    finally:
+        scraper.close()
+    assert not scraper.checkpoint.completed
@@ -0,0 +1,110 @@
+"""
+Column layout of EUIPO eSearch exports and helpers to type their values
+"""
+
+import re
+import unicodedata
+from datetime import datetime
+
+# Standard columns of an eSearch export (header is on the second row)
+EXPECTED_COLUMNS = [
+    'Filing number', 'Graphic representation', 'Name', 'Basis', 'Type',
+    'Application reference', 'Filing date/ Designation date',
+    'Registration date', 'Expiry date', 'Nice classes', 'Status',
+    'Publications', 'Owner name', 'Owner ID', 'Owner country',
+    'Representative name', 'Representative ID', 'Filing language',
+    'Second language', 'Kind of mark', 'Acquired distinctiveness'
+]
+
+# eSearch writes dates as d/m/yyyy text, e.g. 1/4/1996 is 1 April 1996
+DATE_COLUMNS = ['Filing date/ Designation date', 'Registration date', 'Expiry date']
+DATE_FORMAT = '%d/%m/%Y'
+
+ID_COLUMNS = ['Owner ID', 'Representative ID']
+BOOL_COLUMNS = ['Acquired distinctiveness']
+LIST_COLUMNS = ['Nice classes']
+
+
+def is_missing(value):
+    """True for None, NaN and blank strings"""
+    if value is None:
+        return True
+    if isinstance(value, float) and value != value:
+        return True
+    return isinstance(value, str) and not value.strip()
+
+
+def fold_words(text):
+    """Lower-case, accent-free alphanumeric words ('Café-Bär GmbH' -> ['cafe', 'bar', 'gmbh'])
+
+    The one normalisation shared by name search, the full-text search index
+    and watch-list matching, so they always agree on what a word is.
+    """
+    if is_missing(text):
+        return []
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+
+def fold_text(text):
+    """fold_words joined by single spaces ('' if there are none)"""
+    return ' '.join(fold_words(text))
+
+
+def parse_date(value):
+    """Parse an eSearch d/m/yyyy date (or a datetime) into a date, None if blank"""
+    if is_missing(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if hasattr(value, 'year') and hasattr(value, 'month'):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def parse_nice_classes(value):
+    """Turn '6, 7, 9, 20' into [6, 7, 9, 20]"""
+    if is_missing(value):
+        return []
+    if isinstance(value, (int, float)):
+        return [int(value)]
+    return [int(n) for n in re.findall(r'\d+', str(value))]
+
+
+def parse_id(value):
+    """Owner/representative IDs come back as floats (69421.0); return an int or None"""
+    if is_missing(value):
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_bool(value):
+    """Parse True/False cells that may arrive as bools or text"""
+    if is_missing(value):
+        return None
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1')
+    return bool(value)
+
+
+def parse_filing_number(value):
+    """Filing numbers are 9-digit text; re-pad any that were read as numbers"""
+    if is_missing(value):
+        return None
+    if isinstance(value, (int, float)):
+        return str(int(value)).zfill(9)
+    return str(value).strip()
+
+
+def clean_text(value):
+    """Return a stripped string, or None if blank"""
+    if is_missing(value):
+        return None
+    return str(value).strip()
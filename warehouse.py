@@ -0,0 +1,298 @@
+"""
+Local SQLite warehouse of every scraped day
+
+One row per Filing number in trademarks, holding the mark as of the latest
+publication day it appeared on, plus:
+
+    publications       (filing_number, publication_date) for every day a mark appeared
+    trademark_classes  (filing_number, nice_class) for class lookups
+
+    trademark_changes  (filing_number, publication_date, field, old_value, new_value)
+                       whenever a later day changes status, registration date or owner
+
+Indexed on publication date, owner ID, representative ID and Nice class.
+Each current row carries tracked_hash, a 64-bit hash of the tracked fields,
+so a day's ingest only diffs the rows it brings (one primary-key lookup
+each) against their current versions - never the history.
+
+A day is bulk-loaded into temporary staging tables with executemany and
+merged with set-based upserts inside one transaction, so re-loading a day is
+safe and an older day never overwrites a newer one.
+
+    python warehouse.py                 # load every data/eu_trademarks_YYYYMMDD.json
+    sqlite3 data/trademarks.db "SELECT name, status FROM trademarks WHERE owner_id = 69421"
+"""
+
+import os
+import re
+import glob
+import hashlib
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from parquet_store import convert_value
+
+DATABASE_FILENAME = 'trademarks.db'
+
+# (eSearch column, SQL column, SQL type); Nice classes live in trademark_classes
+COLUMNS = [
+    ('Filing number', 'filing_number', 'TEXT PRIMARY KEY'),
+    ('Name', 'name', 'TEXT'),
+    ('Basis', 'basis', 'TEXT'),
+    ('Type', 'type', 'TEXT'),
+    ('Application reference', 'application_reference', 'TEXT'),
+    ('Filing date/ Designation date', 'filing_date', 'TEXT'),
+    ('Registration date', 'registration_date', 'TEXT'),
+    ('Expiry date', 'expiry_date', 'TEXT'),
+    ('Nice classes', 'nice_classes', 'TEXT'),
+    ('Status', 'status', 'TEXT'),
+    ('Publications', 'publications', 'TEXT'),
+    ('Owner name', 'owner_name', 'TEXT'),
+    ('Owner ID', 'owner_id', 'INTEGER'),
+    ('Owner country', 'owner_country', 'TEXT'),
+    ('Representative name', 'representative_name', 'TEXT'),
+    ('Representative ID', 'representative_id', 'INTEGER'),
+    ('Filing language', 'filing_language', 'TEXT'),
+    ('Second language', 'second_language', 'TEXT'),
+    ('Kind of mark', 'kind_of_mark', 'TEXT'),
+    ('Acquired distinctiveness', 'acquired_distinctiveness', 'INTEGER'),
+]
+SQL_COLUMNS = [sql for _, sql, _ in COLUMNS] + ['publication_date', 'tracked_hash']
+
+# Fields whose changes across days are logged in trademark_changes
+TRACKED_COLUMNS = ['status', 'registration_date', 'owner_name', 'owner_id', 'owner_country']
+
+COLUMN_DEFINITIONS = ', '.join(f'{sql} {sql_type}' for _, sql, sql_type in COLUMNS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS trademarks (
+    {COLUMN_DEFINITIONS},
+    publication_date TEXT NOT NULL,
+    tracked_hash INTEGER
+);
+CREATE TABLE IF NOT EXISTS publications (
+    filing_number TEXT NOT NULL,
+    publication_date TEXT NOT NULL,
+    PRIMARY KEY (filing_number, publication_date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trademark_classes (
+    filing_number TEXT NOT NULL,
+    nice_class INTEGER NOT NULL,
+    PRIMARY KEY (filing_number, nice_class)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trademark_changes (
+    filing_number TEXT NOT NULL,
+    publication_date TEXT NOT NULL,
+    field TEXT NOT NULL,
+    old_value,
+    new_value
+);
+CREATE INDEX IF NOT EXISTS idx_trademarks_publication_date ON trademarks (publication_date);
+CREATE INDEX IF NOT EXISTS idx_trademarks_owner_id ON trademarks (owner_id);
+CREATE INDEX IF NOT EXISTS idx_trademarks_representative_id ON trademarks (representative_id);
+CREATE INDEX IF NOT EXISTS idx_publications_date ON publications (publication_date);
+CREATE INDEX IF NOT EXISTS idx_classes_class ON trademark_classes (nice_class, filing_number);
+CREATE INDEX IF NOT EXISTS idx_changes_filing_number ON trademark_changes (filing_number);
+CREATE INDEX IF NOT EXISTS idx_changes_date ON trademark_changes (publication_date);
+"""
+
+TRACKED_POSITIONS = [SQL_COLUMNS.index(c) for c in TRACKED_COLUMNS]
+
+
+def tracked_hash(row):
+    """Signed 64-bit hash of a row's tracked fields (fits an SQLite INTEGER)"""
+    text = '\x1f'.join('' if row[i] is None else str(row[i]) for i in TRACKED_POSITIONS)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def sql_value(column, value):
+    """Typed value ready for SQLite (dates as ISO text, classes as '9, 35')"""
+    value = convert_value(column, value)
+    if column == 'Nice classes':
+        return ', '.join(str(c) for c in value) if value else None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def convert_column(column, values, sql=True):
+    """sql_value (or convert_value) over a column, converting each distinct cell once"""
+    convert = sql_value if sql else convert_value
+    cache = {}
+    out = []
+    for value in values:
+        try:
+            out.append(cache[value])
+        except KeyError:
+            cache[value] = converted = convert(column, value)
+            out.append(converted)
+        except TypeError:  # unhashable cell
+            out.append(convert(column, value))
+    return out
+
+
+class DayLoader:
+    """Stage one publication day chunk by chunk, then merge it in on close()"""
+
+    def __init__(self, warehouse, publication_date):
+        self.conn = warehouse.conn
+        self.publication_date = publication_date.strftime('%Y-%m-%d')
+        self.rows = 0
+        self.changes = 0
+        self.conn.execute('BEGIN')
+        self.conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS staging "
+                          f"({COLUMN_DEFINITIONS}, publication_date TEXT, tracked_hash INTEGER)")
+        self.conn.execute("""CREATE TEMP TABLE IF NOT EXISTS staging_classes (
+            filing_number TEXT, nice_class INTEGER, PRIMARY KEY (filing_number, nice_class))""")
+        self.conn.execute("DELETE FROM staging")
+        self.conn.execute("DELETE FROM staging_classes")
+        self.insert_row = f"INSERT OR REPLACE INTO staging ({', '.join(SQL_COLUMNS)}) VALUES ({', '.join('?' * len(SQL_COLUMNS))})"
+
+    def write(self, df):
+        """Stage a chunk of merged records"""
+        # Convert column by column, memoising repeated cells (dates, statuses, countries...)
+        columns = [convert_column(column, df[column].tolist()) if column in df.columns else [None] * len(df)
+                   for column, _, _ in COLUMNS]
+        class_lists = convert_column('Nice classes', df['Nice classes'].tolist(), sql=False) \
+            if 'Nice classes' in df.columns else [[]] * len(df)
+        
+        rows = []
+        classes = []
+        for row, class_list in zip(zip(*columns), class_lists):
+            if row[0] is None:
+                continue
+            row = list(row)
+            row.append(self.publication_date)
+            row.append(tracked_hash(row))
+            rows.append(row)
+            classes.extend((row[0], c) for c in class_list)
+        self.conn.executemany(self.insert_row, rows)
+        self.conn.executemany("INSERT OR IGNORE INTO staging_classes VALUES (?, ?)", classes)
+        self.rows += len(rows)
+
+    def close(self):
+        """Log changes, upsert the staged day and commit; a day with nothing staged is rolled back"""
+        if not self.rows:
+            self.abort()
+            print(f"⚠️ Warehouse: nothing staged for {self.publication_date} - left unchanged")
+            return
+        try:
+            # Only rows whose hash differs from a strictly older current row are compared field by field
+            changed = """
+                FROM staging s JOIN trademarks t ON t.filing_number = s.filing_number
+                WHERE s.tracked_hash IS NOT t.tracked_hash AND s.publication_date > t.publication_date
+            """
+            self.conn.execute(
+                "INSERT INTO trademark_changes (filing_number, publication_date, field, old_value, new_value) "
+                + " UNION ALL ".join(
+                    f"SELECT s.filing_number, s.publication_date, '{c}', t.{c}, s.{c} {changed} AND s.{c} IS NOT t.{c}"
+                    for c in TRACKED_COLUMNS))
+            self.changes = self.conn.execute("SELECT changes()").fetchone()[0]
+            
+            updates = ', '.join(f'{c} = excluded.{c}' for c in SQL_COLUMNS[1:])
+            self.conn.execute(f"""
+                INSERT INTO trademarks ({', '.join(SQL_COLUMNS)})
+                SELECT {', '.join(SQL_COLUMNS)} FROM staging WHERE true
+                ON CONFLICT (filing_number) DO UPDATE SET {updates}
+                WHERE excluded.publication_date >= trademarks.publication_date
+            """)
+            # Classes follow the current row, so only replace them where this day won
+            self.conn.execute("""
+                DELETE FROM trademark_classes WHERE filing_number IN (
+                    SELECT s.filing_number FROM staging s
+                    JOIN trademarks t ON t.filing_number = s.filing_number
+                    WHERE t.publication_date = s.publication_date)
+            """)
+            self.conn.execute("""
+                INSERT OR IGNORE INTO trademark_classes
+                SELECT c.filing_number, c.nice_class FROM staging_classes c
+                JOIN staging s ON s.filing_number = c.filing_number
+                JOIN trademarks t ON t.filing_number = s.filing_number
+                WHERE t.publication_date = s.publication_date
+            """)
+            self.conn.execute("""
+                INSERT OR IGNORE INTO publications
+                SELECT filing_number, publication_date FROM staging
+            """)
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        print(f"🗄️ Warehouse: {self.rows} records for {self.publication_date}, {self.changes} field changes logged")
+
+    def abort(self):
+        """Discard the staged day"""
+        self.conn.execute('ROLLBACK')
+
+
+class Warehouse:
+    def __init__(self, path):
+        self.path = path
+        # Transactions are managed explicitly (BEGIN/COMMIT in DayLoader)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute('PRAGMA temp_store = MEMORY')
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(trademarks)')}
+        if 'tracked_hash' not in columns:  # databases created before change tracking
+            self.conn.execute('ALTER TABLE trademarks ADD COLUMN tracked_hash INTEGER')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def day_loader(self, publication_date):
+        return DayLoader(self, publication_date)
+
+    def load_day(self, df, publication_date):
+        """Upsert one day's merged DataFrame"""
+        loader = self.day_loader(publication_date)
+        try:
+            loader.write(df)
+        except Exception:
+            loader.abort()
+            raise
+        loader.close()
+        return loader.rows
+
+    def history(self, filing_number):
+        """Logged field changes for one mark, oldest first"""
+        return self.query("SELECT * FROM trademark_changes WHERE filing_number = ? ORDER BY publication_date, rowid",
+                          (filing_number,))
+
+    def query(self, sql, params=()):
+        """Run a read query and return a DataFrame"""
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+
+def backfill(data_dir, database_path=None):
+    """Load every data/eu_trademarks_YYYYMMDD.json into the warehouse, oldest first"""
+    database_path = database_path or os.path.join(data_dir, DATABASE_FILENAME)
+    paths = sorted(glob.glob(os.path.join(data_dir, 'eu_trademarks_*.json')))
+    with Warehouse(database_path) as warehouse:
+        for path in paths:
+            match = re.search(r'eu_trademarks_(\d{8})\.json$', path)
+            if not match:
+                continue
+            df = pd.read_json(path, orient='records', dtype=False, convert_dates=False)
+            warehouse.load_day(df, datetime.strptime(match.group(1), '%Y%m%d'))
+    return database_path
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Load merged daily JSON files into the SQLite warehouse')
+    parser.add_argument('--data-dir', default=os.path.join(os.getcwd(), 'data'))
+    parser.add_argument('--db', default=None, help=f'Database path (default: <data-dir>/{DATABASE_FILENAME})')
+    args = parser.parse_args()
+    print(f"📁 Warehouse: {backfill(args.data_dir, args.db)}")
@@ -0,0 +1,180 @@
+"""
+Watch-list matching run after each merge
+
+A watch list (watchlist.json in the project folder) names the marks and
+owners we monitor:
+
+    [
+      {"id": "client-yale", "names": ["yale"], "owners": ["assa abloy"], "classes": [6, 9]},
+      {"id": "acme-any", "names": ["acme"], "contains": true}
+    ]
+
+names are matched against the mark name, owners against the owner name.
+Matching is on whole words of the accent-folded text unless "contains" is
+set. classes, when given, require at least one shared Nice class, and
+countries restrict the owner country.
+
+Every term of every watch is compiled into one Aho-Corasick automaton, so a
+day's records are scanned once however many watches there are. Hits are
+written to data/YYYYMMDD/watch_report.json next to the manifest.
+"""
+
+import os
+import json
+from collections import deque
+from datetime import datetime
+
+from trademark_schema import parse_filing_number, parse_nice_classes, clean_text, fold_text
+
+WATCHLIST_FILENAME = 'watchlist.json'
+REPORT_FILENAME = 'watch_report.json'
+
+# Watch field -> record column it is matched against
+FIELDS = {'names': 'Name', 'owners': 'Owner name'}
+
+
+class Automaton:
+    """Aho-Corasick automaton over str patterns, each carrying a payload"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+    def add(self, pattern, payload):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(payload)
+
+    def build(self):
+        """Compute failure links breadth-first; outputs are merged along them"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, text):
+        """Yield the payload of every pattern occurrence in text"""
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield from output[state]
+
+
+class WatchList:
+    def __init__(self, watches):
+        self.watches = []
+        self.automaton = Automaton()
+        for watch in watches:
+            watch_index = len(self.watches)
+            self.watches.append({
+                'id': str(watch.get('id', watch_index)),
+                'classes': set(watch.get('classes') or []),
+                'countries': {c.upper() for c in watch.get('countries') or []},
+            })
+            for field in FIELDS:
+                for term in watch.get(field) or []:
+                    folded = fold_text(term)
+                    if not folded:
+                        continue
+                    # Texts are scanned as ' words ', so padding a term anchors it to word boundaries
+                    pattern = folded if watch.get('contains') else f' {folded} '
+                    self.automaton.add(pattern, (field, watch_index, term))
+        self.automaton.build()
+
+    @classmethod
+    def load(cls, path):
+        """Load a watch list file; None if it does not exist"""
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def match(self, record):
+        """{watch index: [(field, term), ...]} for one record dict"""
+        matched = {}
+        for field, column in FIELDS.items():
+            text = fold_text(record.get(column))
+            if not text:
+                continue
+            for hit_field, watch_index, term in self.automaton.search(f' {text} '):
+                if hit_field == field:
+                    matched.setdefault(watch_index, set()).add((field, term))
+        if not matched:
+            return {}
+
+        classes = set(parse_nice_classes(record.get('Nice classes')))
+        country = (clean_text(record.get('Owner country')) or '').upper()
+        hits = {}
+        for watch_index, terms in matched.items():
+            watch = self.watches[watch_index]
+            if watch['classes'] and not watch['classes'] & classes:
+                continue
+            if watch['countries'] and country not in watch['countries']:
+                continue
+            hits[watch_index] = sorted(terms)
+        return hits
+
+
+class WatchScanner:
+    """Scan merged chunks against a watch list and write the day's report"""
+
+    def __init__(self, watch_list, report_path, date_str):
+        self.watch_list = watch_list
+        self.report_path = report_path
+        self.date = date_str
+        self.scanned = 0
+        self.hits = {watch['id']: [] for watch in watch_list.watches}
+
+    def write(self, df):
+        """Scan a chunk of records"""
+        for record in df.to_dict('records'):
+            self.scanned += 1
+            for watch_index, terms in self.watch_list.match(record).items():
+                self.hits[self.watch_list.watches[watch_index]['id']].append({
+                    'filing_number': parse_filing_number(record.get('Filing number')),
+                    'name': clean_text(record.get('Name')),
+                    'owner_name': clean_text(record.get('Owner name')),
+                    'owner_country': clean_text(record.get('Owner country')),
+                    'nice_classes': parse_nice_classes(record.get('Nice classes')),
+                    'matched': [{'field': field, 'term': term} for field, term in terms]
+                })
+
+    def close(self):
+        """Write the report"""
+        os.makedirs(os.path.dirname(self.report_path), exist_ok=True)
+        report = {
+            'date': self.date,
+            'generated_at': datetime.now().isoformat(),
+            'records_scanned': self.scanned,
+            'watches': len(self.hits),
+            'watches_hit': sum(1 for hits in self.hits.values() if hits),
+            'hits': {watch_id: hits for watch_id, hits in self.hits.items() if hits}
+        }
+        with open(self.report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"👀 Watch list: {report['watches_hit']}/{report['watches']} watches hit "
+              f"in {self.scanned} records → {os.path.basename(self.report_path)}")
+
+    def abort(self):
+        """Leave the previous report in place"""
+        self.hits = {}